@@ -68,8 +68,13 @@ def act_run_ingest_transform_publish(score: float = 0.65):
         
         # Exécuter la séquence pipeline
         ingest_result = job_ingest()
-        transform_result = job_transform() 
-        publish_result = job_publish()
+        if settings.PIPELINE_HANDOFF:
+            # Les nouveaux assets sont déjà passés au transform puis au publish (pipeline_events)
+            transform_result = {"handoff": True}
+            publish_result = {"handoff": True}
+        else:
+            transform_result = job_transform()
+            publish_result = job_publish()
         
         _log_action("RUN_PIPELINE_PASS", None, {
             "ingest": ingest_result,
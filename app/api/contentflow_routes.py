@@ -134,9 +134,10 @@ async def get_niche_metrics():
         logger.error(f"Failed to get niche metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/ffmpeg-recipe")
 @router.get("/ffmpeg/{format_type}")
 async def get_ffmpeg_recipe(format_type: str = "shorts_9_16"):
-    """Get FFmpeg configuration for video processing"""
+    """Get FFmpeg configuration for video processing (/ffmpeg-recipe?format_type=..., default shorts_9_16)"""
     try:
         config = get_config()
         recipe = config.get_ffmpeg_recipe(format_type)
@@ -220,6 +220,58 @@ class Settings(BaseSettings):
     SERPAPI_GL: str = "FR"
     SERPAPI_CACHE_TTL: int = 3600
     SERPAPI_MAX_RESULTS: int = 10
+    SERPAPI_CACHE_STALE_TTL: int = 86400  # serve expired results this much longer while refreshing
+    SERPAPI_CACHE_MAX_ENTRIES: int = 5000
+    SERPAPI_CACHE_PATH: str = "/tmp/contentflow_serp_cache.sqlite"  # used when REDIS_URL is unset
+    SERPAPI_RATE_PER_SEC: float = 1.0
+    SERPAPI_BURST: int = 5
+    SERPAPI_CONCURRENCY: int = 5  # in-flight async queries
+    SERPAPI_MONTHLY_QUOTA: int = 0  # billed searches per month, 0 = unlimited
+    SERPAPI_QUOTA_RESERVE: float = 0.05  # below this share of the quota, serve cache only
+
+    # --- Ingestion / Dedup ---
+    PHASH_DUP_THRESHOLD: int = 5  # max Hamming distance considered a near-duplicate
+    PHASH_INDEX_REFRESH_SEC: float = 2.0  # how often lookups pull rows inserted by other workers
+    PHASH_INDEX_OVERLAP_IDS: int = 2000  # ids below the highest seen re-read on refresh (late commits)
+    INGEST_CONCURRENCY: int = 20  # global cap on in-flight feed/thumbnail requests
+    INGEST_PER_HOST_CONCURRENCY: int = 4
+    INGEST_HTTP_TIMEOUT: float = 15.0
+    INGEST_COMMIT_BATCH: int = 100  # assets per transaction
+    PHASH_CACHE_PATH: str = "/tmp/contentflow_phash_cache.sqlite"  # "" = memory only
+    PHASH_CACHE_MEMORY_SIZE: int = 10000  # in-process LRU entries
+    PHASH_CACHE_MAX_ENTRIES: int = 200000  # on-disk entries
+    PHASH_CACHE_TTL: int = 604800  # 7 days
+    PHASH_WORKERS: int = 0  # hashing processes, 0 = one per CPU, 1 = in-process
+    POLL_MIN_INTERVAL_MIN: int = 30  # fastest per-source poll interval (the ingest job period)
+    POLL_MAX_INTERVAL_MIN: int = 1440  # slowest, reached after repeated empty polls
+    POLL_DISABLE_AFTER_EMPTY: int = 10  # disable spawned serp sources after N empty polls, 0 = never
+
+    # --- Transform ---
+    TRANSFORM_WORKERS: int = 0  # concurrent FFmpeg jobs, 0 = half the CPUs
+    TRANSFORM_BATCH_SIZE: int = 0  # assets claimed per job_transform run, 0 = 2 x workers
+    TRANSFORM_MODE: str = "single"  # single (one file for every platform) | renditions (one per platform, one decode)
+    TRANSFORM_DEADLINE_S: float = 0  # target encode time per asset, picks faster profiles when exceeded; 0 = none
+    TRANSFORM_STREAM_COPY: bool = True  # trim vertical H.264/AAC sources without overlays by stream copy
+    TRANSFORM_BURN_OVERLAYS: bool = True  # draw hook / CTA / attribution on the video; false = plain trims (stream-copyable)
+    PROBE_SNAP_TOLERANCE_S: float = 1.0  # move segment starts back to a keyframe this close; 0 = off
+    RENDER_CACHE_DIR: str = "/tmp/contentflow_render_cache"  # "" = disabled
+    RENDER_CACHE_MAX_BYTES: int = 5 * 1024 ** 3  # LRU-trimmed above this size
+
+    # --- Job queue ---
+    JOB_LEASE_SECONDS: int = 300  # a running job not heartbeated for this long is re-leased
+    JOB_POLL_INTERVAL_S: float = 5.0  # idle queue worker sleep between lease attempts
+    JOB_RETRY_DELAY_S: int = 60  # retry backoff base, doubled per attempt (full jitter)
+    JOB_RETRY_MAX_S: int = 3600  # retry backoff cap
+    MAX_JOB_ATTEMPTS: int = 3  # then the job goes to the DLQ
+    PUBLISH_CLAIM_TIMEOUT_S: int = 1800  # a post 'publishing' this long lost its worker: retried by the watchdog
+    PUBLISH_RETRY_BASE_S: int = 0  # publish retry backoff base for every platform; 0 = per-platform defaults
+    PIPELINE_HANDOFF: bool = False  # committed assets queue their transform, transforms queue their publish
+    PIPELINE_MAX_QUEUED_TRANSFORM: int = 20  # handoff skipped above this many waiting jobs (sweeps catch up)
+    PIPELINE_MAX_QUEUED_PUBLISH: int = 50
+    CELERY_ENABLED: bool = False  # jobs and autopilot run as Celery tasks (app.workers.tasks), not in the web process
+    LOCK_BACKEND: str = "auto"  # auto | postgres | redis | file (see app.utils.locks)
+    LOCK_TTL_S: int = 60  # lock lease, renewed while held (Redis)
+    LOCK_DIR: str = "/tmp/contentflow_locks"  # file backend: one host only
 
     # --- Meta / Instagram Graph API ---
     META_APP_ID: str = ""
@@ -307,6 +359,9 @@ class Settings(BaseSettings):
     # --- Logging ---
     LOG_LEVEL: str = "INFO"
 
+    # --- Queue / Cache ---
+    REDIS_URL: str = ""
+
     # --- CORS ---
     CORS_ORIGINS: List[str] = ["*"]
 
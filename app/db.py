@@ -94,6 +94,114 @@ async def init_db():
                 add_column("jobs", ts_col, "DATETIME", "TIMESTAMP", 
                           "CURRENT_TIMESTAMP" if ts_col == "created_at" else None)
 
+    # sources: conditional fetch validators
+    if insp.has_table("sources"):
+        for col, coltype in (
+            ("etag", "VARCHAR(255)"),
+            ("last_modified", "VARCHAR(64)"),
+            ("content_hash", "VARCHAR(64)"),
+            ("last_seen_key", "VARCHAR(40)"),
+        ):
+            if not has_column("sources", col):
+                add_column("sources", col, coltype, coltype)
+        if not has_column("sources", "last_fetched_at"):
+            add_column("sources", "last_fetched_at", "DATETIME", "TIMESTAMP")
+
+    # sources: adaptive polling schedule
+    if insp.has_table("sources"):
+        for col, type_sqlite, type_pg, default_sql in (
+            ("poll_interval_min", "INTEGER", "INTEGER", None),
+            ("next_poll_at", "DATETIME", "TIMESTAMP", None),
+            ("last_polled_at", "DATETIME", "TIMESTAMP", None),
+            ("empty_polls", "INTEGER", "INTEGER", "0"),
+        ):
+            if not has_column("sources", col):
+                add_column("sources", col, type_sqlite, type_pg, default_sql)
+        with engine.begin() as conn:
+            try:
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_sources_next_poll_at ON sources (next_poll_at)"))
+            except Exception as e:
+                logger.warning(f"Could not create next_poll_at index: {e}")
+
+    # assets: transform claim heartbeat (stale claims go back to 'new')
+    if insp.has_table("assets") and not has_column("assets", "claimed_at"):
+        add_column("assets", "claimed_at", "DATETIME", "TIMESTAMP")
+        with engine.begin() as conn:
+            try:
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_assets_claimed_at ON assets (claimed_at)"))
+            except Exception as e:
+                logger.warning(f"Could not create claimed_at index: {e}")
+
+    # posts: per-platform rendition file
+    if insp.has_table("posts") and not has_column("posts", "media_path"):
+        add_column("posts", "media_path", "VARCHAR(500)", "VARCHAR(500)")
+
+    # posts: publish claim, fencing and retry state
+    if insp.has_table("posts"):
+        for col, type_sqlite, type_pg, default_sql in (
+            ("claimed_at", "DATETIME", "TIMESTAMP", None),
+            ("fence_token", "BIGINT", "BIGINT", None),
+            ("publish_attempts", "INTEGER", "INTEGER", "0"),
+            ("next_attempt_at", "DATETIME", "TIMESTAMP", None),
+            ("last_error", "TEXT", "TEXT", None),
+        ):
+            if not has_column("posts", col):
+                add_column("posts", col, type_sqlite, type_pg, default_sql)
+        with engine.begin() as conn:
+            try:
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_posts_next_attempt_at ON posts (next_attempt_at)"))
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_posts_claimed_at ON posts (claimed_at)"))
+            except Exception as e:
+                logger.warning(f"Could not create next_attempt_at index: {e}")
+
+    # jobs: queue columns (priority, delayed run, lease)
+    if insp.has_table("jobs"):
+        for col, type_sqlite, type_pg, default_sql in (
+            ("priority", "INTEGER", "INTEGER", "5"),
+            ("run_at", "DATETIME", "TIMESTAMP", None),
+            ("locked_by", "VARCHAR(100)", "VARCHAR(100)", None),
+            ("lease_expires_at", "DATETIME", "TIMESTAMP", None),
+            ("result", "JSON", "JSON", None),
+        ):
+            if not has_column("jobs", col):
+                add_column("jobs", col, type_sqlite, type_pg, default_sql)
+        with engine.begin() as conn:
+            try:
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_jobs_status_priority ON jobs (status, priority, run_at)"))
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_jobs_lease_expires_at ON jobs (lease_expires_at)"))
+            except Exception as e:
+                logger.warning(f"Could not create job queue indexes: {e}")
+
+    # assets: integer phash for the near-duplicate index. The backfill is a
+    # one-time migration step, run when the column is added (not every startup)
+    if insp.has_table("assets"):
+        if not has_column("assets", "phash_int"):
+            add_column("assets", "phash_int", "BIGINT", "BIGINT")
+            with engine.begin() as conn:
+                try:
+                    conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_assets_phash_int ON assets (phash_int)"))
+                except Exception as e:
+                    logger.warning(f"Could not create phash_int index: {e}")
+            try:
+                backfill_asset_phash_int(engine)
+            except Exception as e:
+                logger.warning(f"[schema] phash_int backfill failed: {e}")
+
+    # assets: unique external key (canonical link / video id) for dedup,
+    # backfilled once when the column is added
+    if insp.has_table("assets"):
+        if not has_column("assets", "external_key"):
+            add_column("assets", "external_key", "VARCHAR(40)", "VARCHAR(40)")
+            with engine.begin() as conn:
+                try:
+                    conn.execute(sa.text("CREATE UNIQUE INDEX IF NOT EXISTS ix_assets_external_key ON assets (external_key)"))
+                except Exception as e:
+                    logger.warning(f"Could not create external_key index: {e}")
+            try:
+                backfill_asset_external_key(engine)
+            except Exception as e:
+                logger.warning(f"[schema] external_key backfill failed: {e}")
+
 # --- Schema hotfixes ---
 def ensure_schema_metric_events(bind_engine):
     """Ensure metric_events.metadata_json exists (Postgres/SQLite-compatible)."""
@@ -124,5 +232,89 @@ def ensure_schema_metric_events(bind_engine):
     except Exception as e:
         logger.warning(f"[schema] metric_events ensure failed: {e}")
 
+
+def backfill_asset_phash_int(bind_engine, batch_size: int = 1000) -> int:
+    """Fill assets.phash_int from the hex phash for rows ingested before the column existed.
+
+    Run by init_db when it adds the column; safe to re-run by hand after an
+    interrupted migration.
+    """
+    from app.utils.dedupe import phash_to_int
+
+    updated = 0
+    last_id = 0
+    while True:
+        with bind_engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, phash FROM assets "
+                    "WHERE phash IS NOT NULL AND phash_int IS NULL AND id > :last_id "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+            params = [
+                {"id": row_id, "v": phash_to_int(phash)}
+                for row_id, phash in rows
+                if phash_to_int(phash) is not None
+            ]
+            if params:
+                conn.execute(text("UPDATE assets SET phash_int = :v WHERE id = :id"), params)
+                updated += len(params)
+            last_id = rows[-1][0]
+    if updated:
+        logger.info(f"[schema] backfilled assets.phash_int for {updated} rows")
+    return updated
+
+
+def backfill_asset_external_key(bind_engine, batch_size: int = 1000) -> int:
+    """Fill assets.external_key from meta_json; later duplicates of a key stay NULL.
+
+    Run by init_db when it adds the column; safe to re-run by hand after an
+    interrupted migration.
+    """
+    import json
+    from app.utils.dedupe import asset_external_key
+
+    with bind_engine.connect() as conn:
+        seen = {
+            key for (key,) in conn.execute(
+                text("SELECT external_key FROM assets WHERE external_key IS NOT NULL")
+            )
+        }
+
+    updated = 0
+    last_id = 0
+    while True:
+        with bind_engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, meta_json FROM assets "
+                    "WHERE external_key IS NULL AND id > :last_id "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+            params = []
+            for row_id, meta_json in rows:
+                try:
+                    key = asset_external_key(json.loads(meta_json or "{}"))
+                except (TypeError, ValueError):
+                    continue
+                if key and key not in seen:
+                    seen.add(key)
+                    params.append({"id": row_id, "k": key})
+            if params:
+                conn.execute(text("UPDATE assets SET external_key = :k WHERE id = :id"), params)
+                updated += len(params)
+            last_id = rows[-1][0]
+    if updated:
+        logger.info(f"[schema] backfilled assets.external_key for {updated} rows")
+    return updated
+
 # Backward-compat alias for older routes expecting get_session
 get_session = get_db
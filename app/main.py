@@ -41,17 +41,28 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.exception(f"❌ DB init failed: {e}")
 
+    # Near-duplicate phash index (kept up to date incrementally by ingest)
+    try:
+        from app.services.phash_index import build_phash_index
+        build_phash_index()
+        logger.info("✅ Phash index ready")
+    except Exception as e:
+        logger.warning(f"Phash index build failed: {e}")
+
     # Autopilot scheduler
     app.state.autopilot_task = None
     try:
-        if getattr(settings, "FEATURE_AUTOPILOT", False):
+        if getattr(settings, "FEATURE_AUTOPILOT", False) and settings.CELERY_ENABLED:
+            logger.info("▶️ Autopilot runs from Celery beat (CELERY_ENABLED)")
+        elif getattr(settings, "FEATURE_AUTOPILOT", False):
             interval_sec = max(60, int(settings.AI_TICK_INTERVAL_MIN) * 60)
             logger.info(f"▶️ Starting Autopilot every {interval_sec}s")
 
             async def _autopilot_loop():
                 while True:
                     try:
-                        res: dict[str, Any] = ai_tick(dry_run=settings.AI_DRY_RUN)
+                        # Jobs are blocking: keep them off the event loop
+                        res: dict[str, Any] = await asyncio.to_thread(ai_tick, dry_run=settings.AI_DRY_RUN)
                         status = "ok" if res.get("ok") else f"err:{res.get('reason') or res.get('error')}"
                         logger.info(
                             f"[Autopilot] tick={status} dry={res.get('dry_run')} "
@@ -71,6 +82,11 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("🛑 Shutting down ContentFlow…")
+    try:
+        from app.services.phash_cache import phash_pool
+        phash_pool.shutdown()
+    except Exception:
+        pass
     task = getattr(app.state, "autopilot_task", None)
     if task:
         task.cancel()
@@ -118,7 +134,7 @@ class SPAFallbackMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.excluded_prefixes = [
             "/api", "/docs", "/redoc", "/openapi.json",
-            "/static", "/assets", "/health", "/healthz", "/readyz", "/__feature_flags",
+            "/static", "/assets", "/health", "/healthz", "/readyz", "/metrics", "/__feature_flags",
         ]
         candidates = [
             Path("app/static"),
@@ -231,6 +247,7 @@ def _include(module: str, **opts):
 # Core Routers
 for mod, opts in [
     ("app.routes.ui", {}),
+    ("app.routes.prometheus", {"tags": ["health"]}),
     ("app.routes.sources", {"prefix": "/api"}),
     ("app.routes.assets", {"prefix": "/api"}),
     ("app.routes.posts", {"prefix": "/api"}),
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, JSON, Index, func
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, Float, JSON, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from uuid import uuid4
@@ -18,6 +18,17 @@ class Source(Base):
     categories = Column(String(500))  # CSV categories
     min_duration = Column(Integer, default=10)  # seconds
     language = Column(String(10), default="fr")
+    # Conditional fetch validators (RSS): skip unchanged feeds
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(64), nullable=True)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the last fetched body
+    last_seen_key = Column(String(40), nullable=True)  # external_key of the newest entry fetched
+    last_fetched_at = Column(DateTime, nullable=True)
+    # Adaptive polling (app.services.poll_schedule)
+    poll_interval_min = Column(Integer, nullable=True)  # current interval, minutes
+    next_poll_at = Column(DateTime, nullable=True, index=True)
+    last_polled_at = Column(DateTime, nullable=True)
+    empty_polls = Column(Integer, default=0)  # consecutive polls without new assets
     created_at = Column(DateTime, default=datetime.utcnow)
     
     assets = relationship("Asset", back_populates="source")
@@ -28,13 +39,16 @@ class Asset(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     source_id = Column(Integer, ForeignKey("sources.id"))
-    status = Column(String(20), default="new")  # new, ready, failed
+    status = Column(String(20), default="new")  # new, transforming, ready, transformed, failed
+    claimed_at = Column(DateTime, nullable=True, index=True)  # 'transforming' since / last heartbeat
     meta_json = Column(Text)
     s3_key = Column(String(500))
     duration = Column(Float)
     lang = Column(String(10))
     phash = Column(String(64), nullable=True, index=True)  # perceptual hash for dedup
+    phash_int = Column(BigInteger, nullable=True, index=True)  # signed 64-bit phash for the near-dup index
     keywords = Column(String(500), index=True)  # extracted keywords
+    external_key = Column(String(40), nullable=True, unique=True, index=True)  # sha1 of canonical link / platform:video_id
     created_at = Column(DateTime, default=datetime.utcnow)
     
     source = relationship("Source", back_populates="assets")
@@ -50,7 +64,13 @@ class Post(Base):
     title = Column(Text)
     description = Column(Text)
     shortlink = Column(String(500))
-    status = Column(String(20), default="draft")  # draft, queued, posted, failed
+    media_path = Column(String(500), nullable=True)  # platform rendition; falls back to asset.s3_key
+    status = Column(String(20), default="draft")  # draft, queued, publishing, retry, posted, failed
+    claimed_at = Column(DateTime, nullable=True, index=True)  # 'publishing' since
+    fence_token = Column(BigInteger, nullable=True)  # fencing token of the last publish lock holder
+    publish_attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True, index=True)  # when a 'retry' post is due again
+    last_error = Column(Text, nullable=True)
     metrics_json = Column(Text)
     language = Column(String(10), index=True)
     hashtags = Column(String(500), index=True)
@@ -133,6 +153,12 @@ class Job(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    # Queue (app.services.job_queue)
+    priority = Column(Integer, default=5)  # lower runs first, see get_job_priorities
+    run_at = Column(DateTime, nullable=True, index=True)  # not before; None = now
+    locked_by = Column(String(100), nullable=True)  # worker holding the lease
+    lease_expires_at = Column(DateTime, nullable=True, index=True)  # re-leased by another worker after this
+    result = Column(JSON, nullable=True)
 
 
 class Rule(Base):
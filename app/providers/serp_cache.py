@@ -0,0 +1,372 @@
+"""Shared SerpAPI response cache.
+
+Every SerpAPI query is billed, so responses are cached in a store shared by
+all uvicorn/celery workers: Redis when ``REDIS_URL`` is configured, otherwise
+a local SQLite file. On top of the store:
+
+- entries are fresh for the caller's TTL, then served stale for up to
+  ``SERPAPI_CACHE_STALE_TTL`` more seconds while one caller refreshes them
+  in the background (stale-while-revalidate);
+- concurrent misses for the same key are coalesced (single-flight): one
+  caller queries the API, the others wait for its result. Within a process
+  this is a per-key lock; across processes a short lease in the store;
+- the store is bounded to ``SERPAPI_CACHE_MAX_ENTRIES`` (oldest evicted; the
+  SQLite file is trimmed every 100 writes).
+
+The same store keeps the monthly count of billed API calls (see
+``serpapi_provider.quota_exhausted``).
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import logger
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+Entry = Tuple[float, Dict[str, Any]]  # (stored_at, response)
+
+# How long a process may hold the cross-process fetch lease / others wait for it
+FETCH_LEASE_SEC = 30
+WAIT_POLL_SEC = 0.2
+LOCK_STRIPES = 64  # in-process single-flight locks, shared by keys of the same stripe
+
+
+def _count(result: str):
+    try:
+        from app.routes.health import increment_serpapi_cache_metric
+        increment_serpapi_cache_metric(result)
+    except Exception:
+        pass
+
+
+class SQLiteBackend:
+    """Cache store in a local SQLite file (shared by the workers on one host)."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._sets = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS serp_cache (
+                key TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_serp_cache_stored_at ON serp_cache (stored_at);
+            CREATE TABLE IF NOT EXISTS serp_cache_leases (
+                key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS serp_usage (
+                month TEXT PRIMARY KEY,
+                calls INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, data FROM serp_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, key: str, entry: Entry, expire_after: float):
+        stored_at, data = entry
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO serp_cache (key, stored_at, data) VALUES (?, ?, ?)",
+                (key, stored_at, json.dumps(data)),
+            )
+            self._sets += 1
+            if self._sets % 100 == 0:
+                self._evict(time.time() - expire_after)
+            self._conn.commit()
+
+    def _evict(self, expired_before: float):
+        self._conn.execute("DELETE FROM serp_cache WHERE stored_at < ?", (expired_before,))
+        (total,) = self._conn.execute("SELECT COUNT(*) FROM serp_cache").fetchone()
+        if total > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM serp_cache WHERE key IN "
+                "(SELECT key FROM serp_cache ORDER BY stored_at LIMIT ?)",
+                (total - self.max_entries,),
+            )
+
+    def acquire(self, key: str, lease: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM serp_cache_leases WHERE expires_at < ?", (now,))
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO serp_cache_leases (key, expires_at) VALUES (?, ?)",
+                (key, now + lease),
+            )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def release(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM serp_cache_leases WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def incr_usage(self, month: str) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO serp_usage (month, calls) VALUES (?, 1) "
+                "ON CONFLICT(month) DO UPDATE SET calls = calls + 1",
+                (month,),
+            )
+            self._conn.commit()
+            return self._conn.execute("SELECT calls FROM serp_usage WHERE month = ?", (month,)).fetchone()[0]
+
+    def get_usage(self, month: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT calls FROM serp_usage WHERE month = ?", (month,)).fetchone()
+        return row[0] if row else 0
+
+
+class RedisBackend:
+    """Cache store in Redis (shared by every worker); a sorted set bounds its size."""
+
+    prefix = "cf:serp:"
+
+    def __init__(self, url: str, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._redis = redis.Redis.from_url(url)
+        self._index = self.prefix + "index"
+
+    def get(self, key: str) -> Optional[Entry]:
+        raw = self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        payload = json.loads(raw)
+        return payload["stored_at"], payload["data"]
+
+    def set(self, key: str, entry: Entry, expire_after: float):
+        stored_at, data = entry
+        pipe = self._redis.pipeline()
+        pipe.set(self.prefix + key, json.dumps({"stored_at": stored_at, "data": data}), ex=max(1, int(expire_after)))
+        pipe.zadd(self._index, {key: stored_at})
+        pipe.zcard(self._index)
+        total = pipe.execute()[-1]
+        if total > self.max_entries:
+            oldest = self._redis.zrange(self._index, 0, total - self.max_entries - 1)
+            if oldest:
+                self._redis.delete(*(self.prefix + k.decode() for k in oldest))
+                self._redis.zrem(self._index, *oldest)
+
+    def acquire(self, key: str, lease: float) -> bool:
+        return bool(self._redis.set(self.prefix + "lock:" + key, "1", nx=True, px=int(lease * 1000)))
+
+    def release(self, key: str):
+        self._redis.delete(self.prefix + "lock:" + key)
+
+    def incr_usage(self, month: str) -> int:
+        usage_key = self.prefix + "usage:" + month
+        pipe = self._redis.pipeline()
+        pipe.incr(usage_key)
+        pipe.expire(usage_key, 40 * 86400)
+        return int(pipe.execute()[0])
+
+    def get_usage(self, month: str) -> int:
+        return int(self._redis.get(self.prefix + "usage:" + month) or 0)
+
+
+def make_backend():
+    """Redis when REDIS_URL is configured and reachable, else the SQLite file."""
+    if settings.REDIS_URL and REDIS_AVAILABLE:
+        try:
+            backend = RedisBackend(settings.REDIS_URL, settings.SERPAPI_CACHE_MAX_ENTRIES)
+            backend._redis.ping()
+            return backend
+        except Exception as e:
+            logger.warning(f"SerpAPI cache: Redis unavailable ({e}), using SQLite")
+    return SQLiteBackend(settings.SERPAPI_CACHE_PATH, settings.SERPAPI_CACHE_MAX_ENTRIES)
+
+
+class SerpCache:
+    """TTL cache with single-flight fetches and stale-while-revalidate."""
+
+    def __init__(self, backend_factory: Callable[[], Any], stale_ttl: float):
+        self._factory = backend_factory
+        self._backend = None
+        self.stale_ttl = stale_ttl
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._locks_guard = threading.Lock()
+        self._refreshing: set = set()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._factory()
+        return self._backend
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        # A fixed pool: a lock per key would be kept for every query ever made
+        return self._locks[hash(key) % LOCK_STRIPES]
+
+    def _lookup(self, key: str) -> Optional[Entry]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"SerpAPI cache read failed: {e}")
+            return None
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response regardless of age (used when the API budget is spent)."""
+        entry = self._lookup(key)
+        _count("degraded" if entry else "degraded_miss")
+        return entry[1] if entry else None
+
+    def _store(self, key: str, data: Dict[str, Any], ttl: float):
+        _count("miss")
+        # Errors (empty from _run, or a raw SerpAPI {"error": ...}) must not be pinned for a TTL
+        if data and not data.get("error"):
+            try:
+                self.backend.set(key, (time.time(), data), ttl + self.stale_ttl)
+            except Exception as e:
+                logger.warning(f"SerpAPI cache write failed: {e}")
+
+    def _fetch_and_store(self, key: str, fetch: Callable[[], Dict[str, Any]], ttl: float) -> Dict[str, Any]:
+        data = fetch()
+        self._store(key, data, ttl)
+        return data
+
+    def _acquire(self, key: str) -> bool:
+        try:
+            return self.backend.acquire(key, FETCH_LEASE_SEC)
+        except Exception as e:
+            logger.warning(f"SerpAPI cache lease failed: {e}")
+            return True  # store is down: just query the API
+
+    def _release(self, key: str):
+        try:
+            self.backend.release(key)
+        except Exception:
+            pass
+
+    def _refresh(self, key: str, fetch: Callable[[], Dict[str, Any]], ttl: float):
+        try:
+            if self.backend.acquire(key, FETCH_LEASE_SEC):
+                try:
+                    self._fetch_and_store(key, fetch, ttl)
+                finally:
+                    self.backend.release(key)
+        except Exception as e:
+            logger.warning(f"SerpAPI background refresh failed for {key}: {e}")
+        finally:
+            with self._locks_guard:
+                self._refreshing.discard(key)
+
+    def _revalidate(self, key: str, fetch: Callable[[], Dict[str, Any]], ttl: float):
+        with self._locks_guard:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, fetch, ttl), daemon=True).start()
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Dict[str, Any]], ttl: float) -> Dict[str, Any]:
+        entry = self._lookup(key)
+        if entry:
+            age = time.time() - entry[0]
+            if age < ttl:
+                _count("hit")
+                return entry[1]
+            if age < ttl + self.stale_ttl:
+                _count("stale")
+                self._revalidate(key, fetch, ttl)
+                return entry[1]
+
+        with self._key_lock(key):
+            # Another thread may have filled it while we waited for the lock
+            entry = self._lookup(key)
+            if entry and time.time() - entry[0] < ttl:
+                _count("coalesced")
+                return entry[1]
+
+            leased = self._acquire(key)
+            if leased:
+                try:
+                    return self._fetch_and_store(key, fetch, ttl)
+                finally:
+                    self._release(key)
+
+        # Another process is querying this key: wait for its result, or for its
+        # lease to go away without one (error response, crash). Outside the
+        # stripe lock, which would otherwise stall unrelated keys for the wait
+        deadline = time.time() + FETCH_LEASE_SEC
+        while not leased and time.time() < deadline:
+            time.sleep(WAIT_POLL_SEC)
+            entry = self._lookup(key)
+            if entry and time.time() - entry[0] < ttl:
+                _count("coalesced")
+                return entry[1]
+            leased = self._acquire(key)
+
+        try:
+            return self._fetch_and_store(key, fetch, ttl)
+        finally:
+            if leased:
+                self._release(key)
+
+    async def aget_or_fetch(
+        self,
+        key: str,
+        afetch: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: float,
+        refresh: Optional[Callable[[], Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """Async get_or_fetch: store calls run in threads, the API call on the loop.
+
+        Stale entries are refreshed in a background thread with the blocking
+        `refresh` fetcher, since a task would not outlive a short-lived loop.
+        Callers dedupe identical keys within a batch themselves.
+        """
+        entry = await asyncio.to_thread(self._lookup, key)
+        if entry:
+            age = time.time() - entry[0]
+            if age < ttl:
+                _count("hit")
+                return entry[1]
+            if age < ttl + self.stale_ttl:
+                _count("stale")
+                if refresh is not None:
+                    self._revalidate(key, refresh, ttl)
+                return entry[1]
+
+        leased = await asyncio.to_thread(self._acquire, key)
+        deadline = time.time() + FETCH_LEASE_SEC
+        while not leased and time.time() < deadline:
+            await asyncio.sleep(WAIT_POLL_SEC)
+            entry = await asyncio.to_thread(self._lookup, key)
+            if entry and time.time() - entry[0] < ttl:
+                _count("coalesced")
+                return entry[1]
+            leased = await asyncio.to_thread(self._acquire, key)
+
+        try:
+            data = await afetch()
+            await asyncio.to_thread(self._store, key, data, ttl)
+            return data
+        finally:
+            if leased:
+                await asyncio.to_thread(self._release, key)
+
+
+serp_cache = SerpCache(make_backend, settings.SERPAPI_CACHE_STALE_TTL)
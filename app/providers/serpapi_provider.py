@@ -1,10 +1,21 @@
-"""SerpAPI provider for content discovery and trends monitoring."""
+"""SerpAPI provider for content discovery and trends monitoring.
 
+Every call goes through a token bucket (``SERPAPI_RATE_PER_SEC`` /
+``SERPAPI_BURST``) and is counted against ``SERPAPI_MONTHLY_QUOTA``; once the
+remaining budget drops below ``SERPAPI_QUOTA_RESERVE`` only cached results
+are served. ``search_many`` / ``youtube_search_many`` issue queries
+concurrently over one async client.
+"""
+
+import asyncio
+import threading
 import time
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from functools import lru_cache
 
+import httpx
+
 try:
     from serpapi import GoogleSearch
     SERPAPI_AVAILABLE = True
@@ -13,6 +24,49 @@ except ImportError:
     GoogleSearch = None
 
 from app.config import settings
+from app.providers.serp_cache import serp_cache
+from app.utils.datetime import utcnow
+from app.utils.logger import logger
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and sleep for the returned delay.
+
+    Reservations may drive the balance negative, which queues callers fairly
+    without holding a lock (or an event loop) while they wait.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; seconds the caller must wait before using it."""
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def wait(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+rate_limiter = TokenBucket(settings.SERPAPI_RATE_PER_SEC, settings.SERPAPI_BURST)
 
 
 def _enabled() -> bool:
@@ -20,22 +74,79 @@ def _enabled() -> bool:
     return bool(settings.SERPAPI_KEY) and SERPAPI_AVAILABLE
 
 
+def _month() -> str:
+    return utcnow().strftime("%Y-%m")
+
+
+def quota_used() -> int:
+    """Billed SerpAPI calls this calendar month (shared across workers)."""
+    try:
+        return serp_cache.backend.get_usage(_month())
+    except Exception:
+        return 0
+
+
+def quota_exhausted() -> bool:
+    """True once the monthly budget is within the reserve (0 quota = unlimited)."""
+    quota = settings.SERPAPI_MONTHLY_QUOTA
+    if quota <= 0:
+        return False
+    return quota_used() >= quota * (1 - settings.SERPAPI_QUOTA_RESERVE)
+
+
+def _record_call():
+    try:
+        used = serp_cache.backend.incr_usage(_month())
+        from app.routes.health import set_serpapi_quota_used
+        set_serpapi_quota_used(used)
+    except Exception:
+        pass
+
+
+def _params(engine: str, **kw) -> Dict[str, Any]:
+    params = {
+        "engine": engine,
+        "api_key": settings.SERPAPI_KEY,
+        "hl": settings.SERPAPI_HL,
+        "gl": settings.SERPAPI_GL,
+    }
+    params.update({k: v for k, v in kw.items() if v is not None})
+    return params
+
+
 def _run(engine: str, **kw) -> Dict[str, Any]:
     """Execute SerpAPI query with fallback."""
     if not _enabled():
         return {}
     
     try:
-        params = {
-            "engine": engine,
-            "api_key": settings.SERPAPI_KEY,
-            "hl": settings.SERPAPI_HL,
-            "gl": settings.SERPAPI_GL,
-        }
-        params.update({k: v for k, v in kw.items() if v is not None})
-        return GoogleSearch(params).get_dict()
+        rate_limiter.wait()
+        data = GoogleSearch(_params(engine, **kw)).get_dict()
+        if data.get("error"):
+            logger.warning(f"SerpAPI error for {engine}: {data['error']}")
+            return {}
+        if data:
+            _record_call()
+        return data
     except Exception as e:
-        print(f"SerpAPI error: {e}")
+        logger.warning(f"SerpAPI error for {engine}: {e}")
+        return {}
+
+
+async def _run_async(client: httpx.AsyncClient, engine: str, **kw) -> Dict[str, Any]:
+    """Execute one SerpAPI query on the async client; {} on errors like _run."""
+    try:
+        await rate_limiter.wait_async()
+        response = await client.get(SERPAPI_URL, params=_params(engine, **kw))
+        data = response.json()
+        if data.get("error"):
+            logger.warning(f"SerpAPI error for {engine}: {data['error']}")
+            return {}
+        response.raise_for_status()
+        await asyncio.to_thread(_record_call)
+        return data
+    except Exception as e:
+        logger.warning(f"SerpAPI error for {engine}: {e}")
         return {}
 
 
@@ -45,24 +156,49 @@ def _cache_key(engine: str, **kw) -> str:
     return engine + "|" + "|".join(f"{k}={kw[k]}" for k in sorted(kw))
 
 
-_cache: Dict[str, tuple[float, Dict[str, Any]]] = {}
+def _degraded(key: str) -> Dict[str, Any]:
+    """Budget nearly spent: answer from cache at any age, never from the API."""
+    return serp_cache.peek(key) or {}
 
 
 def _cached(engine: str, ttl: int, **kw) -> Dict[str, Any]:
-    """Execute cached SerpAPI query."""
+    """Execute cached SerpAPI query (shared cache, see app.providers.serp_cache)."""
+    # Results prefetched by search_many are served even without the serpapi package
+    if not settings.SERPAPI_KEY:
+        return {}
     key = _cache_key(engine, **kw)
-    now = time.time()
-    
-    # Check cache
-    if key in _cache:
-        ts, data = _cache[key]
-        if now - ts < ttl:
-            return data
-    
-    # Execute and cache
-    data = _run(engine, **kw)
-    _cache[key] = (now, data)
-    return data
+    if quota_exhausted():
+        return _degraded(key)
+    return serp_cache.get_or_fetch(key, lambda: _run(engine, **kw), ttl)
+
+
+async def search_many(engine: str, queries: List[Dict[str, Any]], ttl: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Run several queries of one engine concurrently (cached, rate limited, quota aware).
+
+    Identical queries are sent once; results come back in the order of `queries`.
+    """
+    if not settings.SERPAPI_KEY or not queries:
+        return [{} for _ in queries]
+    ttl = ttl or settings.SERPAPI_CACHE_TTL
+    keys = [_cache_key(engine, **kw) for kw in queries]
+    unique: Dict[str, Dict[str, Any]] = dict(zip(keys, queries))
+    exhausted = await asyncio.to_thread(quota_exhausted)
+    semaphore = asyncio.Semaphore(max(1, settings.SERPAPI_CONCURRENCY))
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def one(key: str, kw: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            if exhausted:
+                return key, await asyncio.to_thread(_degraded, key)
+
+            async def fetch() -> Dict[str, Any]:
+                async with semaphore:
+                    return await _run_async(client, engine, **kw)
+
+            refresh = (lambda: _run(engine, **kw)) if _enabled() else None
+            return key, await serp_cache.aget_or_fetch(key, fetch, ttl, refresh)
+
+        results = dict(await asyncio.gather(*(one(k, kw) for k, kw in unique.items())))
+    return [results[k] for k in keys]
 
 
 # High-level API functions
@@ -74,6 +210,16 @@ def youtube_search(q: str, max_results: int = None) -> List[Dict[str, Any]]:
     return res[:max_results]
 
 
+async def youtube_search_many(queries: List[str], max_results: int = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Search YouTube for several queries concurrently; {query: results}."""
+    max_results = max_results or settings.SERPAPI_MAX_RESULTS
+    responses = await search_many("youtube", [{"search_query": q} for q in queries])
+    return {
+        q: ((d.get("video_results") or d.get("items") or [])[:max_results])
+        for q, d in zip(queries, responses)
+    }
+
+
 def youtube_video(video_id: str) -> Dict[str, Any]:
     """Get YouTube video details via SerpAPI."""
     return _cached("youtube_video", settings.SERPAPI_CACHE_TTL, v=video_id)
@@ -2,9 +2,9 @@
 
 import time
 import psutil
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram
 
 from app.db import get_db
 from app.models import Job, Post, MetricEvent
@@ -16,6 +16,13 @@ cf_jobs_total = Counter('cf_jobs_total', 'Total ContentFlow jobs processed', ['k
 cf_posts_published_total = Counter('cf_posts_published_total', 'Total posts published', ['platform'])
 cf_clicks_total = Counter('cf_clicks_total', 'Total link clicks', ['platform'])
 cf_request_duration = Histogram('cf_request_duration_seconds', 'Request duration')
+cf_phash_cache_total = Counter('cf_phash_cache_total', 'Thumbnail phash cache lookups', ['result'])
+cf_render_cache_total = Counter('cf_render_cache_total', 'Transform render cache lookups', ['result'])
+cf_pipeline_handoff_total = Counter('cf_pipeline_handoff_total', 'Stage-to-stage job handoffs', ['stage', 'result'])
+cf_serpapi_cache_total = Counter('cf_serpapi_cache_total', 'SerpAPI cache lookups', ['result'])
+cf_serpapi_calls_saved_total = Counter('cf_serpapi_calls_saved_total', 'SerpAPI queries answered from cache')
+cf_serpapi_quota_used = Gauge('cf_serpapi_quota_used', 'Billed SerpAPI calls this month',
+                              multiprocess_mode='mostrecent')
 
 @router.get("/health")
 async def health_check():
@@ -44,20 +51,6 @@ async def health_db(db: Session = Depends(get_db)):
             "error": str(e)
         }
 
-@router.get("/metrics")
-async def metrics_endpoint():
-    """Prometheus metrics endpoint."""
-    # Update metrics from database
-    try:
-        # This is a lightweight way to expose metrics without heavy DB queries
-        # In production, these would be updated by the actual job processes
-        pass
-    except Exception:
-        # Fail silently to not break metrics collection
-        pass
-    
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
-
 @router.get("/health/system")
 async def system_health():
     """System resource health check."""
@@ -93,4 +86,30 @@ def increment_publish_metric(platform: str):
 
 def increment_click_metric(platform: str):
     """Increment click counter metric."""
-    cf_clicks_total.labels(platform=platform).inc()
\ No newline at end of file
+    cf_clicks_total.labels(platform=platform).inc()
+
+def increment_phash_cache_metric(result: str):
+    """Increment phash cache counter (hit_memory, hit_disk, hit_content, miss)."""
+    cf_phash_cache_total.labels(result=result).inc()
+
+def increment_render_cache_metric(result: str):
+    """Increment render cache counter (hit, miss)."""
+    cf_render_cache_total.labels(result=result).inc()
+
+def increment_handoff_metric(stage: str, result: str):
+    """Increment pipeline handoff counter (queued, backpressure, error)."""
+    cf_pipeline_handoff_total.labels(stage=stage, result=result).inc()
+
+def increment_serpapi_cache_metric(result: str):
+    """Increment SerpAPI cache counter (hit, stale, coalesced, degraded, degraded_miss, miss).
+
+    Only lookups answered from the cache saved a paid call: a miss queried the
+    API, a degraded_miss (budget spent, nothing cached) returned nothing.
+    """
+    cf_serpapi_cache_total.labels(result=result).inc()
+    if result in ("hit", "stale", "coalesced", "degraded"):
+        cf_serpapi_calls_saved_total.inc()
+
+def set_serpapi_quota_used(calls: int):
+    """Record this month's billed SerpAPI calls."""
+    cf_serpapi_quota_used.set(calls)
\ No newline at end of file
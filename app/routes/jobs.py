@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
+from app.config import settings
 from app.db import get_db
 from app.models import Job
+from app.services.job_queue import queue_stats
 from app.services.scheduler import (
     run_job_by_kind, 
     get_scheduler_status,
@@ -31,25 +34,37 @@ async def list_jobs(skip: int = 0, limit: int = 50, db: Session = Depends(get_db
             "created_at": job.created_at,
             "attempts": job.attempts,
             "last_error": job.last_error,
+            "priority": job.priority,
+            "run_at": job.run_at,
+            "locked_by": job.locked_by,
         }
         for job in jobs
     ]
 
 
 @router.post("/jobs/{job_kind}/run")
-async def trigger_job(job_kind: str, background_tasks: BackgroundTasks):
-    """Manually trigger a job"""
-    
-    def run_job():
+async def trigger_job(job_kind: str, priority: Optional[int] = None, delay_s: int = 0):
+    """Queue a job: Celery when CELERY_ENABLED, else the jobs table (python -m app.workers.queue_worker)"""
+    if settings.CELERY_ENABLED:
+        from app.workers.tasks import dispatch
         try:
-            result = run_job_by_kind(job_kind)
-            logger.info(f"Job {job_kind} completed: {result}")
-        except Exception as e:
-            logger.error(f"Job {job_kind} failed: {e}")
+            task = dispatch(job_kind, countdown=delay_s)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return {"message": f"Job {job_kind} sent to Celery", "status": "queued", "task_id": task.id}
     
-    background_tasks.add_task(run_job)
+    result = await run_in_threadpool(run_job_by_kind, job_kind, priority, delay_s)
+    if not result["success"]:
+        raise HTTPException(status_code=404, detail=result["error"])
     
-    return {"message": f"Job {job_kind} triggered", "status": "running"}
+    return {"message": result["message"], "status": result["status"], "job_id": result["job_id"],
+            "priority": result["priority"], "run_at": result["run_at"]}
+
+
+@router.get("/jobs/queue")
+async def jobs_queue(db: Session = Depends(get_db)):
+    """Queue depth per kind and status, oldest due job, expired leases"""
+    return queue_stats(db)
 
 
 @router.get("/jobs/status")
@@ -72,7 +87,7 @@ async def get_available_jobs():
 async def run_ingest_job():
     """Manually trigger ingest job"""
     try:
-        result = job_ingest()
+        result = await run_in_threadpool(job_ingest)
         return {"message": "Ingest job completed", "success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -82,7 +97,7 @@ async def run_ingest_job():
 async def run_transform_job():
     """Manually trigger transform job"""
     try:
-        result = job_transform()
+        result = await run_in_threadpool(job_transform)
         return {"message": "Transform job completed", "success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -92,7 +107,7 @@ async def run_transform_job():
 async def run_publish_job():
     """Manually trigger publish job"""
     try:
-        result = job_publish()
+        result = await run_in_threadpool(job_publish)
         return {"message": "Publish job completed", "success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -102,7 +117,7 @@ async def run_publish_job():
 async def run_metrics_job():
     """Manually trigger metrics collection job"""
     try:
-        result = job_metrics()
+        result = await run_in_threadpool(job_metrics)
         return {"message": "Metrics job completed", "success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,35 @@
+"""Prometheus scrape endpoint.
+
+Only /metrics is mounted on the public app; the counters live in
+app.routes.health. Ingest, transforms and publishes run in queue workers and
+Celery processes, so their counts only reach this endpoint in
+prometheus_client's multiprocess mode: set ``PROMETHEUS_MULTIPROC_DIR`` to
+the same directory for the web process and every worker (start.sh and
+docker-compose do). Without it, /metrics only shows what the web process
+counted itself.
+"""
+
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client import multiprocess
+
+import app.routes.health  # noqa: F401  registers the cf_* counters
+
+router = APIRouter()
+
+
+def _registry():
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return None  # the default, in-process registry
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics endpoint, aggregated over every process sharing PROMETHEUS_MULTIPROC_DIR."""
+    registry = _registry()
+    return Response(generate_latest(registry) if registry else generate_latest(), media_type=CONTENT_TYPE_LATEST)
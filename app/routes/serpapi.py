@@ -104,12 +104,17 @@ def trigger_serp_ingest(source_id: int, db: Session = Depends(get_db)):
 def serpapi_status():
     """Check SerpAPI provider status."""
     try:
-        from app.providers.serpapi_provider import _enabled
+        from app.providers.serpapi_provider import _enabled, quota_exhausted, quota_used
         from app.config import settings
         
         return {
             "enabled": _enabled(),
             "api_key_configured": bool(settings.SERPAPI_KEY),
+            "quota": {
+                "monthly": settings.SERPAPI_MONTHLY_QUOTA,
+                "used": quota_used(),
+                "cache_only": quota_exhausted()
+            },
             "config": {
                 "hl": settings.SERPAPI_HL,
                 "gl": settings.SERPAPI_GL,
@@ -26,6 +26,7 @@ class PostBase(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     shortlink: Optional[str] = None
+    media_path: Optional[str] = None
     status: str = "draft"
     metrics_json: Optional[str] = None
 
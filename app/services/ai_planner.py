@@ -3,6 +3,7 @@ import logging
 import re
 import os
 from typing import Dict, Any, List
+from app.config import settings
 from app.models import Asset, Post, Experiment
 from sqlalchemy.orm import Session
 
@@ -32,7 +33,11 @@ def generate_plan_heuristic(asset: Asset) -> Dict[str, Any]:
     """
     Generate AI plan using heuristic approach.
     
-    Returns plan with segments, overlays, hashtags, language, quality_score
+    Returns plan with segments, overlays, hashtags, language, quality_score.
+    The overlay texts are always planned (compliance and post titles use
+    them); plan["burn_overlays"] (TRANSFORM_BURN_OVERLAYS) says whether the
+    transform draws them on the video. Plans that don't are plain trims,
+    which can be stream-copied (see utils.ffmpeg.can_stream_copy).
     """
     try:
         meta = json.loads(asset.meta_json) if asset.meta_json else {}
@@ -79,6 +84,7 @@ def generate_plan_heuristic(asset: Asset) -> Dict[str, Any]:
         plan = {
             "segments": segments,
             "overlays": overlays,
+            "burn_overlays": settings.TRANSFORM_BURN_OVERLAYS,
             "hashtags": hashtags,
             "language": language,
             "quality_score": quality_score,
@@ -95,6 +101,7 @@ def generate_plan_heuristic(asset: Asset) -> Dict[str, Any]:
         return {
             "segments": [{"start": 0, "end": 15}],
             "overlays": {"hook_text": "Découvrez ce contenu!", "cta_text": "Suivez-nous!", "attribution": "ContentFlow"},
+            "burn_overlays": settings.TRANSFORM_BURN_OVERLAYS,
             "hashtags": ["#tech", "#innovation"],
             "language": "fr",
             "quality_score": 0.5
@@ -1,89 +1,78 @@
 import json
 import os
-import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from sqlalchemy.orm import Session
 from app.models import Asset, Post
-from utils.ffmpeg import make_vertical, create_demo_vertical_video
+from app.services.text_analysis import analyze_text, analyze_texts
+from app.config import settings
+from app.services.encoding_profiles import EncodingProfile, record_encode, select_profile
+from app.services.probe import audio_stream, probe_meta, snap_segments
+from app.services.render_cache import cached_render
+from utils.ffmpeg import (RENDITIONS, can_stream_copy, copy_segment, create_demo_vertical_video,
+                          make_renditions, make_vertical)
 from app.utils.logger import logger
 
 
-def analyze_asset(asset: Asset) -> Dict[str, Any]:
-    """Analyze asset to extract duration, language, keywords."""
-    try:
-        meta = json.loads(asset.meta_json) if asset.meta_json else {}
-        title = meta.get('title', '')
-        description = meta.get('description', '')
-        
+def analyze_assets(assets: List[Asset]) -> List[Dict[str, Any]]:
+    """Analyze a batch of assets (duration, language, keywords) in one pass."""
+    metas = []
+    for asset in assets:
+        try:
+            metas.append(json.loads(asset.meta_json) if asset.meta_json else {})
+        except Exception as e:
+            logger.error(f"Error analyzing asset {asset.id}: {e}")
+            metas.append(None)
+
+    texts = [f"{m.get('title', '')} {m.get('description', '')}" if m is not None else "" for m in metas]
+    results = []
+    for asset, meta, analysis in zip(assets, metas, analyze_texts(texts)):
+        if meta is None:
+            results.append({'duration': 30, 'language': 'fr', 'keywords': []})
+            continue
+
         # Extract duration from metadata or estimate
         duration = meta.get('duration', asset.duration)
         if not duration:
             # Estimate based on content length
-            content_length = len(title) + len(description)
+            content_length = len(meta.get('title', '')) + len(meta.get('description', ''))
             duration = max(15, min(60, content_length / 10))  # Rough estimate
-        
-        # Detect probable language
-        text = f"{title} {description}".lower()
-        lang = detect_language_simple(text)
-        
-        # Extract keywords using simple regex
-        keywords = extract_keywords_simple(text)
-        
-        analysis = {
-            'duration': duration,
-            'language': lang,
-            'keywords': keywords,
-            'word_count': len(text.split()),
-            'has_numbers': bool(re.search(r'\d+', text)),
-            'has_urls': bool(re.search(r'http[s]?://', text))
-        }
-        
-        logger.info(f"Analyzed asset {asset.id}: duration={duration}s, lang={lang}")
-        return analysis
-        
-    except Exception as e:
-        logger.error(f"Error analyzing asset {asset.id}: {e}")
-        return {'duration': 30, 'language': 'fr', 'keywords': []}
+
+        analysis['duration'] = duration
+        logger.info(f"Analyzed asset {asset.id}: duration={duration}s, lang={analysis['language']}")
+        results.append(analysis)
+    return results
+
+
+def analyze_asset(asset: Asset) -> Dict[str, Any]:
+    """Analyze asset to extract duration, language, keywords."""
+    return analyze_assets([asset])[0]
 
 
 def detect_language_simple(text: str) -> str:
     """Simple language detection based on keywords."""
-    french_indicators = ['le', 'la', 'les', 'de', 'du', 'des', 'et', 'ou', 'est', 'sont', 
-                        'avec', 'pour', 'dans', 'sur', 'par', 'cette', 'ces', 'nous', 'vous']
-    english_indicators = ['the', 'and', 'or', 'is', 'are', 'with', 'for', 'in', 'on', 'by',
-                         'this', 'these', 'we', 'you', 'that', 'have', 'has', 'will']
-    
-    words = text.lower().split()
-    french_count = sum(1 for word in words if word in french_indicators)
-    english_count = sum(1 for word in words if word in english_indicators)
-    
-    return 'fr' if french_count >= english_count else 'en'
+    return analyze_text(text)['language']
 
 
 def extract_keywords_simple(text: str) -> List[str]:
-    """Extract keywords using simple pattern matching."""
-    # Remove common words and extract meaningful terms
-    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-    
-    # Tech-related keyword boost
-    tech_keywords = ['tech', 'innovation', 'startup', 'digital', 'intelligence', 'artificielle',
-                    'machine', 'learning', 'blockchain', 'crypto', 'fintech', 'saas', 'api']
-    
-    keywords = []
-    for word in words:
-        if word in tech_keywords:
-            keywords.append(word)
-        elif len(word) > 6 and words.count(word) == 1:  # Unique longer words
-            keywords.append(word)
-    
-    return list(set(keywords))[:10]
-
-
-def transform_asset(asset: Asset, db: Session) -> bool:
-    """Transform asset using FFmpeg with vertical video output."""
+    """Extract keywords, tech terms first."""
+    return analyze_text(text)['keywords']
+
+
+def transform_asset(asset: Asset, db: Session, analysis: Optional[Dict[str, Any]] = None,
+                    profile: Optional[EncodingProfile] = None) -> bool:
+    """Transform asset using FFmpeg with vertical video output.
+
+    `analysis` is the asset's entry from analyze_assets when the caller
+    analysed a whole batch up front; `profile` the encoding profile picked
+    by the caller (otherwise chosen from the current transform backlog).
+    Encode fps and output size are recorded in meta_json["encode"], the
+    input's ffprobe result in meta_json["probe"] and the path taken (stream
+    copy, encode, renditions, demo) in meta_json["transform_path"].
+    """
     try:
         # Analyze asset first
-        analysis = analyze_asset(asset)
+        if analysis is None:
+            analysis = analyze_asset(asset)
         
         # Update asset with analysis
         if analysis.get('duration'):
@@ -93,30 +82,73 @@ def transform_asset(asset: Asset, db: Session) -> bool:
         if analysis.get('keywords'):
             asset.keywords = ','.join(analysis['keywords'])
         
-        # Generate AI plan
-        from app.services.ai_planner import generate_plan_heuristic
-        plan = generate_plan_heuristic(asset)
-        
         # Get input path - for demo, create a sample video
         meta = json.loads(asset.meta_json or "{}")
         input_path = meta.get("url", "")
         
+        # Probe once per input file (persisted in meta["probe"]); the real duration beats the estimate
+        probe = probe_meta(meta, input_path) if input_path and os.path.exists(input_path) else None
+        if probe and probe.get('duration'):
+            asset.duration = probe['duration']
+        
+        # Generate AI plan
+        from app.services.ai_planner import generate_plan_heuristic
+        plan = generate_plan_heuristic(asset)
+        if probe:
+            plan = snap_segments(plan, probe)
+            if not audio_stream(probe):
+                plan["audio_enabled"] = False  # silent input: no audio map, filter or encoder
+        
         # Create output path
         output_filename = f"asset_{asset.id}_vertical.mp4"
         output_path = f"/tmp/{output_filename}"
         
+        if profile is None:
+            backlog = db.query(Asset).filter(Asset.status == "new").count()
+            profile = select_profile(backlog, duration_s=asset.duration,
+                                     deadline_s=settings.TRANSFORM_DEADLINE_S or None)
+        encoding = profile.as_encoding()
+        stats: Dict[str, Any] = {}
+        
         # Transform video to vertical format
         success = False
+        renditions = {}
         if input_path and os.path.exists(input_path):
-            success = make_vertical(input_path, plan, output_path)
+            if settings.TRANSFORM_MODE != "renditions" and settings.TRANSFORM_STREAM_COPY \
+                    and can_stream_copy(plan, probe):
+                # Already a vertical H.264/AAC file and the plan is a plain trim: no re-encode
+                transform_path = "copy"
+                success = cached_render(input_path, plan, {"vertical": output_path},
+                                        lambda: copy_segment(input_path, plan, output_path, stats=stats),
+                                        {"copy": True})
+            elif settings.TRANSFORM_MODE == "renditions":
+                transform_path = "renditions"
+                # One decode, one file per platform; the first is the asset's main output
+                renditions = {platform: f"/tmp/asset_{asset.id}_{platform}.mp4" for platform in RENDITIONS}
+                success = cached_render(input_path, plan, renditions,
+                                        lambda: make_renditions(input_path, plan, renditions,
+                                                                encoding=encoding, stats=stats),
+                                        encoding)
+                output_path = next(iter(renditions.values()))
+            else:
+                transform_path = "encode"
+                success = cached_render(input_path, plan, {"vertical": output_path},
+                                        lambda: make_vertical(input_path, plan, output_path,
+                                                              encoding=encoding, stats=stats),
+                                        encoding)
         else:
             # Create demo video for testing
             logger.info(f"Creating demo video for asset {asset.id}")
-            success = create_demo_vertical_video(output_path)
+            # A placeholder: keep the demo's own fast settings, out of the profile's fps average
+            transform_path = "demo"
+            profile = EncodingProfile(name="demo", preset="ultrafast", crf=28)
+            encoding = None
+            success = create_demo_vertical_video(output_path, stats=stats)
         
         if not success or not os.path.exists(output_path):
             logger.error(f"Video transformation failed for asset {asset.id}")
             asset.status = "failed"
+            asset.meta_json = json.dumps(meta)  # keep the probe for the retry
             db.commit()
             return False
         
@@ -130,8 +162,21 @@ def transform_asset(asset: Asset, db: Session) -> bool:
             "processed": True,
             "plan": plan,
             "output_path": output_path,
-            "analysis": analysis
+            "analysis": analysis,
+            "transform_path": transform_path,  # copy, encode, renditions or demo
         })
+        if renditions:
+            meta["renditions"] = renditions
+        if transform_path in ("encode", "renditions"):
+            record_encode(profile.name, stats.get("fps"))
+        meta["encode"] = {
+            "profile": profile.name if transform_path in ("encode", "renditions") else transform_path,
+            **(profile.as_encoding() if transform_path != "copy" else {}),  # a copy has no preset / CRF
+            "cached": not stats,  # served by the render cache
+            "fps": stats.get("fps"),
+            "seconds": stats.get("seconds"),
+            "output_bytes": sum(os.path.getsize(p) for p in (renditions or {"vertical": output_path}).values()),
+        }
         asset.meta_json = json.dumps(meta)
         
         db.commit()
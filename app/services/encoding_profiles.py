@@ -0,0 +1,170 @@
+"""Encoding profiles and the adaptive encoding ladder.
+
+Profiles (x264 preset / crf / threads) and the ladder that picks one come
+from the ``profiles`` and ``ladder`` keys of the ``shorts_9_16`` recipe in
+contentflow_pack.json (served by ``/api/contentflow/ffmpeg-recipe``), with
+built-in defaults. Each ladder rung applies up to a transform backlog size
+(assets waiting in ``new``): an idle pipeline gets slower presets and better
+compression, a deep backlog faster presets.
+
+Deadline pressure: when a per-asset deadline is given
+(``TRANSFORM_DEADLINE_S``), the encode fps measured for each profile is used
+to estimate the encode time, and faster profiles are tried until one fits.
+Measured speeds are an EWMA per profile. Each transform batch stores its
+per-profile fps on its ``transform_batch`` Job row (``profile_fps``), and
+every process rebuilds the average from the latest batches every
+``_FPS_RELOAD_S``, so speeds are shared between workers and survive restarts.
+
+Unset threads are sized so the concurrent transform workers share the CPUs
+instead of each x264 instance claiming all of them.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.utils.logger import logger
+
+RECIPE = "shorts_9_16"
+
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "quality": {"preset": "slow", "crf": 23},
+    "balanced": {"preset": "medium", "crf": 23},
+    "fast": {"preset": "veryfast", "crf": 24},
+    "rush": {"preset": "ultrafast", "crf": 26},
+}
+DEFAULT_LADDER: List[Dict[str, Any]] = [
+    {"max_backlog": 5, "profile": "quality"},
+    {"max_backlog": 25, "profile": "balanced"},
+    {"max_backlog": 100, "profile": "fast"},
+    {"profile": "rush"},
+]
+
+_EWMA_ALPHA = 0.3
+_FPS_RELOAD_S = 300
+_FPS_HISTORY_BATCHES = 50
+
+
+@dataclass
+class EncodingProfile:
+    name: str
+    preset: str
+    crf: int
+    threads: int = 0
+
+    def as_encoding(self) -> Dict[str, Any]:
+        """Options for utils.ffmpeg (make_vertical / make_renditions)."""
+        return {"preset": self.preset, "crf": self.crf, "threads": self.threads}
+
+
+def _recipe() -> Dict[str, Any]:
+    try:
+        from app.services.contentflow_config import get_config
+        return get_config().get_ffmpeg_recipe(RECIPE) or {}
+    except Exception as e:
+        logger.warning(f"Could not load ffmpeg recipe '{RECIPE}': {e}")
+        return {}
+
+
+def load_profiles() -> Dict[str, Dict[str, Any]]:
+    return {**DEFAULT_PROFILES, **(_recipe().get("profiles") or {})}
+
+
+def load_ladder() -> List[Dict[str, Any]]:
+    profiles = load_profiles()
+    ladder = [rung for rung in (_recipe().get("ladder") or DEFAULT_LADDER) if rung.get("profile") in profiles]
+    return ladder or DEFAULT_LADDER
+
+
+_measured_fps: Dict[str, float] = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def _fold(speeds: Dict[str, float], profile: str, fps: float):
+    previous = speeds.get(profile)
+    speeds[profile] = fps if previous is None else previous + _EWMA_ALPHA * (fps - previous)
+
+
+def record_encode(profile: str, fps: Optional[float]):
+    """Fold a measured encode speed into the profile's running average."""
+    if not fps:
+        return
+    with _lock:
+        _fold(_measured_fps, profile, fps)
+
+
+def load_measured_fps() -> Dict[str, float]:
+    """Per-profile EWMA of the ``profile_fps`` of the latest transform batches (all workers)."""
+    from app.db import SessionLocal
+    from app.models import Job
+
+    db = SessionLocal()
+    try:
+        batches = (
+            db.query(Job.payload)
+            .filter(Job.kind == "transform_batch", Job.status == "completed")
+            .order_by(Job.completed_at.desc())
+            .limit(_FPS_HISTORY_BATCHES)
+            .all()
+        )
+    finally:
+        db.close()
+    speeds: Dict[str, float] = {}
+    for (payload,) in reversed(batches):
+        for profile, fps in ((payload or {}).get("profile_fps") or {}).items():
+            if fps:
+                _fold(speeds, profile, fps)
+    return speeds
+
+
+def measured_fps() -> Dict[str, float]:
+    global _loaded_at
+    with _lock:
+        stale = time.monotonic() - _loaded_at > _FPS_RELOAD_S
+        if stale:
+            _loaded_at = time.monotonic()
+    if stale:
+        try:
+            speeds = load_measured_fps()
+            with _lock:
+                _measured_fps.update(speeds)
+        except Exception as e:
+            logger.warning(f"Could not load measured encode speeds: {e}")
+    with _lock:
+        return dict(_measured_fps)
+
+
+def _threads(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def select_profile(backlog: int, workers: int = 1, duration_s: Optional[float] = None,
+                   deadline_s: Optional[float] = None) -> EncodingProfile:
+    """Profile for the next encode given the backlog and an optional deadline."""
+    from utils.ffmpeg import OUTPUT_FPS
+
+    profiles = load_profiles()
+    ladder = load_ladder()
+    rung = next((i for i, r in enumerate(ladder) if backlog <= r.get("max_backlog", float("inf"))), len(ladder) - 1)
+
+    if deadline_s and duration_s:
+        frames = duration_s * OUTPUT_FPS
+        speeds = measured_fps()
+        # Step to faster rungs while the measured speed says we'd miss the deadline
+        while rung < len(ladder) - 1:
+            fps = speeds.get(ladder[rung]["profile"])
+            if fps is None or frames / fps <= deadline_s:
+                break
+            rung += 1
+
+    name = ladder[rung]["profile"]
+    spec = profiles[name]
+    return EncodingProfile(
+        name=name,
+        preset=str(spec.get("preset", "fast")),
+        crf=int(spec.get("crf", 23)),
+        threads=int(spec.get("threads") or _threads(workers)),
+    )
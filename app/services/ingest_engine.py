@@ -0,0 +1,369 @@
+"""Concurrent ingestion engine.
+
+Feeds and thumbnails are fetched concurrently through one shared
+``httpx.AsyncClient`` (connection pool), bounded by a global semaphore and a
+per-host semaphore so a single slow or strict host can't hog every slot.
+Database work (dedup lookups, inserts) stays on the calling thread's session
+and assets are bulk-inserted (multi-row INSERT ... ON CONFLICT DO NOTHING on
+the external key) and committed in batches of ``INGEST_COMMIT_BATCH``.
+
+RSS feeds are fetched conditionally: the stored ETag / Last-Modified are sent
+back and a 304 (or a body whose sha256 matches the last one) skips the
+source. Bodies are parsed as they stream in and reading stops at the newest
+entry seen on the previous fetch.
+"""
+
+import asyncio
+import hashlib
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import feedparser
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Asset, Source
+from app.services.feed_stream import FeedStream
+from app.services.phash_cache import USER_AGENT, phash_cache
+from app.services.phash_index import PhashIndex, phash_index
+from app.services.pipeline_events import assets_committed
+from app.services.sources import (
+    build_rss_asset,
+    bulk_insert_assets,
+    entry_text,
+    entry_thumbnail,
+    ingest_source,
+    register_inserted,
+    select_new_entries,
+)
+from app.services.text_analysis import analyze_texts
+from app.utils.datetime import utcnow
+from app.utils.dedupe import url_key
+from app.utils.logger import logger
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class HostLimiter:
+    """Global + per-host concurrency limits for outgoing requests."""
+
+    def __init__(self, global_limit: int, per_host_limit: int):
+        self._global = asyncio.Semaphore(max(1, global_limit))
+        self._hosts = defaultdict(lambda: asyncio.Semaphore(max(1, per_host_limit)))
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        # Wait for the host slot first so we never hold a global slot while queued on a busy host
+        async with self._hosts[urlsplit(url).netloc.lower()]:
+            async with self._global:
+                yield
+
+
+def make_client() -> httpx.AsyncClient:
+    """Shared async client sized to the ingest concurrency."""
+    return httpx.AsyncClient(
+        timeout=settings.INGEST_HTTP_TIMEOUT,
+        follow_redirects=True,
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(
+            max_connections=settings.INGEST_CONCURRENCY,
+            max_keepalive_connections=settings.INGEST_CONCURRENCY,
+        ),
+    )
+
+
+async def fetch_bytes(client: httpx.AsyncClient, limiter: HostLimiter, url: str) -> bytes:
+    async with limiter.slot(url):
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.content
+
+
+@dataclass
+class FeedFetch:
+    source: Source
+    entries: List[Any] = field(default_factory=list)
+    error: Optional[str] = None
+    unchanged: bool = False
+    validators: Dict[str, Optional[str]] = field(default_factory=dict)
+
+
+def _collect(entries: Iterable[Any], into: List[Any], stop_key: Optional[str]) -> bool:
+    """Append entries until the last-seen one; True if it was reached."""
+    for entry in entries:
+        if stop_key and url_key(entry.get("link")) == stop_key:
+            return True
+        into.append(entry)
+    return False
+
+
+async def fetch_feed_conditional(client: httpx.AsyncClient, limiter: HostLimiter, src: Source) -> FeedFetch:
+    """Stream a feed with If-None-Match / If-Modified-Since and keep only new entries.
+
+    Entries are parsed as chunks arrive. Feeds list newest first, so reading
+    stops at the entry that was newest on the previous fetch
+    (``Source.last_seen_key``); there is no cap on the number of new entries.
+    """
+    headers = {}
+    if src.etag:
+        headers["If-None-Match"] = src.etag
+    if src.last_modified:
+        headers["If-Modified-Since"] = src.last_modified
+
+    entries: List[Any] = []
+    digest = hashlib.sha256()
+    complete = False
+    malformed = False
+    async with limiter.slot(src.url):
+        async with client.stream("GET", src.url, headers=headers) as response:
+            if response.status_code == 304:
+                return FeedFetch(src, unchanged=True)
+            response.raise_for_status()
+            validators = {
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+            }
+            stream = FeedStream()
+            try:
+                async for chunk in response.aiter_bytes():
+                    digest.update(chunk)
+                    if _collect(stream.feed(chunk), entries, src.last_seen_key):
+                        break
+                else:
+                    _collect(stream.close(), entries, src.last_seen_key)
+                    complete = True
+            except ET.ParseError as e:
+                logger.info(f"Streaming parse failed for {src.url} ({e}), using feedparser")
+                malformed = True
+
+    if malformed:
+        # feedparser copes with HTML entities and broken markup; needs the whole body
+        async with limiter.slot(src.url):
+            response = await client.get(src.url)
+        response.raise_for_status()
+        content = response.content
+        feed = await asyncio.to_thread(feedparser.parse, content)
+        entries = []
+        _collect(feed.entries, entries, src.last_seen_key)
+        digest = hashlib.sha256(content)
+        complete = True
+
+    first_key = next((k for k in (url_key(e.get("link")) for e in entries) if k), None)
+    if first_key:
+        validators["last_seen_key"] = first_key
+    # The hash only describes a body we read to the end; after an early stop
+    # keep the previous one so an unchanged full body can still be skipped
+    validators["content_hash"] = digest.hexdigest() if complete else src.content_hash
+    # Servers without validators (or that ignore them) still get the source skipped
+    if complete and src.content_hash and validators["content_hash"] == src.content_hash:
+        return FeedFetch(src, unchanged=True, validators=validators)
+    if not entries:
+        return FeedFetch(src, unchanged=True, validators=validators)
+    return FeedFetch(src, entries=entries, validators=validators)
+
+
+def store_validators(fetched: FeedFetch):
+    """Remember what we fetched so the next cycle can ask for a 304."""
+    src = fetched.source
+    for key, value in fetched.validators.items():
+        setattr(src, key, value)
+    src.last_fetched_at = utcnow()
+
+
+async def fetch_phashes(client: httpx.AsyncClient, limiter: HostLimiter, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Download thumbnails concurrently, then hash them as one batch in the phash pool.
+
+    URLs already in the phash cache are not downloaded at all.
+    """
+    phashes: Dict[str, Optional[str]] = {}
+
+    async def one(url: str) -> Tuple[str, Optional[bytes]]:
+        try:
+            cached = await asyncio.to_thread(phash_cache.get, url)
+            if cached:
+                phashes[url] = cached
+                return url, None
+            return url, await fetch_bytes(client, limiter, url)
+        except Exception as e:
+            logger.warning(f"Could not calculate phash for {url}: {e}")
+            return url, None
+
+    blobs = {url: data for url, data in await asyncio.gather(*(one(u) for u in urls)) if data}
+    if blobs:
+        phashes.update(await asyncio.to_thread(phash_cache.put_many, blobs))
+    for url in urls:
+        if phashes.get(url) is None and url in blobs:
+            logger.warning(f"Could not calculate phash for {url}: undecodable image")
+    return phashes
+
+
+class BatchWriter:
+    """Collects assets and bulk-inserts + commits every `batch_size` of them.
+
+    Rows whose external_key already exists (e.g. inserted by a concurrent
+    worker) are skipped by the database and not counted as ingested.
+    """
+
+    def __init__(self, db: Session, stats: Dict[int, Dict[str, Any]], batch_size: int):
+        self.db = db
+        self.stats = stats
+        self.batch_size = max(1, batch_size)
+        self._pending: List[Asset] = []
+        # Hashes of the pending assets: the shared index only gets committed ones
+        self._pending_phashes = PhashIndex(max_distance=settings.PHASH_DUP_THRESHOLD)
+        self.batches = 0
+        self.rows = 0
+        self.insert_s = 0.0
+
+    def add(self, asset: Asset):
+        if asset.phash and self._pending_phashes.find(asset.phash):
+            logger.info(f"Skipping near-duplicate of a pending asset: {asset.external_key}")
+            return
+        self._pending.append(asset)
+        self._pending_phashes.add(asset.phash)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        t0 = time.perf_counter()
+        try:
+            inserted = bulk_insert_assets(self.db, self._pending)
+            self.db.commit()
+            register_inserted(inserted)
+            assets_committed([row.id for row in inserted])
+            for source_id, n in Counter(row.source_id for row in inserted).items():
+                self.stats[source_id]["ingested"] += n
+            self.rows += len(inserted)
+            self.batches += 1
+        except Exception as e:
+            logger.error(f"Ingest batch commit failed: {e}")
+            self.db.rollback()
+            phash_index.invalidate()
+            for source_id in {a.source_id for a in self._pending}:
+                self.stats[source_id]["error"] = f"commit failed: {e}"
+        finally:
+            self.insert_s += time.perf_counter() - t0
+            self._pending.clear()
+            self._pending_phashes.clear()
+
+    @property
+    def rows_per_sec(self) -> float:
+        return round(self.rows / self.insert_s, 1) if self.insert_s else 0.0
+
+
+async def ingest_sources_async(db: Session, sources: List[Source]) -> Dict[str, Any]:
+    """Ingest `sources` concurrently; returns totals plus per-source timings."""
+    started = time.perf_counter()
+    stats = {
+        s.id: {"source_id": s.id, "kind": s.kind, "ingested": 0, "fetch_ms": 0.0, "process_ms": 0.0}
+        for s in sources
+    }
+    rss = [s for s in sources if s.kind == "rss"]
+    others = [s for s in sources if s.kind != "rss"]
+    limiter = HostLimiter(settings.INGEST_CONCURRENCY, settings.INGEST_PER_HOST_CONCURRENCY)
+    pending: List[Tuple[Source, Any, Optional[str]]] = []
+    phashes: Dict[str, Optional[str]] = {}
+    fetched: List[FeedFetch] = []
+    seen_keys: Set[str] = set()
+
+    async with make_client() as client:
+        async def fetch_feed(src: Source) -> FeedFetch:
+            t0 = time.perf_counter()
+            try:
+                return await fetch_feed_conditional(client, limiter, src)
+            except Exception as e:
+                return FeedFetch(src, error=str(e))
+            finally:
+                stats[src.id]["fetch_ms"] = _ms(t0)
+
+        # 1. Fan out feed downloads
+        fetched = await asyncio.gather(*(fetch_feed(s) for s in rss))
+        for result in fetched:
+            src = result.source
+            if result.error:
+                logger.error(f"Error ingesting RSS {src.url}: {result.error}")
+                stats[src.id]["error"] = result.error
+                continue
+            if result.unchanged:
+                stats[src.id]["unchanged"] = True
+                continue
+            # 2. Filters + link dedup on the session
+            t0 = time.perf_counter()
+            for entry in select_new_entries(src, result.entries, db, seen_keys):
+                pending.append((src, entry, entry_thumbnail(entry)))
+            stats[src.id]["process_ms"] += _ms(t0)
+
+        # 3. Fan out thumbnail downloads (each distinct URL once)
+        thumbs_started = time.perf_counter()
+        urls = {thumb for _, _, thumb in pending if thumb}
+        if urls:
+            phashes = await fetch_phashes(client, limiter, urls)
+        thumbs_ms = _ms(thumbs_started)
+
+    # 4. Keywords for the whole batch in one pass, then batched inserts
+    analyses = analyze_texts([entry_text(entry) for _, entry, _ in pending])
+    writer = BatchWriter(db, stats, settings.INGEST_COMMIT_BATCH)
+    for (src, entry, thumb), analysis in zip(pending, analyses):
+        t0 = time.perf_counter()
+        asset = build_rss_asset(src, entry, thumb, phashes.get(thumb) if thumb else None, db, analysis)
+        if asset is not None:
+            writer.add(asset)
+        stats[src.id]["process_ms"] += _ms(t0)
+    writer.flush()
+
+    # Validators are only saved once the source's assets are committed, otherwise
+    # a failed batch would make the next cycle skip entries we never stored
+    for result in fetched:
+        if not result.error and not stats[result.source.id].get("error"):
+            store_validators(result)
+    try:
+        db.commit()
+    except Exception as e:
+        logger.error(f"Could not save feed validators: {e}")
+        db.rollback()
+
+    # SerpAPI YouTube searches (often many, spawned by serp_news/serp_trends) are
+    # issued concurrently; the per-source ingest below reads them from the cache
+    serp_queries = [s.url.strip() for s in others if s.kind == "serp_youtube" and (s.url or "").strip()]
+    if serp_queries:
+        try:
+            from app.providers import serpapi_provider as serp
+            await serp.youtube_search_many(serp_queries)
+        except Exception as e:
+            logger.warning(f"SerpAPI prefetch failed: {e}")
+
+    # Providers without an async client (youtube_cc, stock, serp_*) run as before
+    for src in others:
+        t0 = time.perf_counter()
+        try:
+            stats[src.id]["ingested"] = ingest_source(src, db)
+        except Exception as e:
+            logger.error(f"Error processing source {src.id}: {e}")
+            stats[src.id]["error"] = str(e)
+        stats[src.id]["process_ms"] += _ms(t0)
+
+    for src in rss:
+        logger.info(f"Ingested {stats[src.id]['ingested']} new assets from RSS source {src.id}")
+    for entry in stats.values():
+        entry["process_ms"] = round(entry["process_ms"], 1)
+
+    return {
+        "ingested": sum(s["ingested"] for s in stats.values()),
+        "skipped_unchanged": sum(1 for s in stats.values() if s.get("unchanged")),
+        "sources": list(stats.values()),
+        "thumbnails_fetched": len(urls),
+        "thumbnails_ms": thumbs_ms,
+        "commit_batches": writer.batches,
+        "insert_rows_per_sec": writer.rows_per_sec,
+        "elapsed_ms": _ms(started),
+    }
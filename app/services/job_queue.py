@@ -0,0 +1,217 @@
+"""Durable job queue on the ``jobs`` table.
+
+``enqueue`` adds a ``queued`` row (priority from ``get_job_priorities``,
+optional delayed ``run_at``). Workers (``python -m app.workers.queue_worker``)
+``lease`` the next due job: candidates are selected ``FOR UPDATE SKIP LOCKED``
+on Postgres, and the ``UPDATE ... WHERE status = 'queued' RETURNING id`` hands
+each row to exactly one worker on every backend (SQLite included).
+
+A leased job carries ``locked_by`` and ``lease_expires_at``; the worker
+extends the lease with ``heartbeat`` while it runs. A job whose lease expired
+(its worker died) is leased again by another worker. Failures are retried
+with exponential backoff from ``JOB_RETRY_DELAY_S`` (full jitter, capped at
+``JOB_RETRY_MAX_S``) until ``MAX_JOB_ATTEMPTS``, then the job goes to the DLQ.
+"""
+
+import inspect
+import json
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Job
+from app.utils.datetime import as_utc, utcnow
+from app.utils.logger import logger
+
+QUEUE_DEFAULT_PRIORITY = 5
+_LEASE_CANDIDATES = 10
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_handlers() -> Dict[str, Callable[..., Dict[str, Any]]]:
+    """Job kind -> function, as listed by get_job_priorities."""
+    from app.services.scheduler import get_job_priorities
+    return {j["kind"]: j["function"] for j in get_job_priorities()}
+
+
+def default_priority(kind: str) -> int:
+    from app.services.scheduler import get_job_priorities
+    return next((j["priority"] for j in get_job_priorities() if j["kind"] == kind), QUEUE_DEFAULT_PRIORITY)
+
+
+def enqueue(db: Session, kind: str, payload: Optional[Dict[str, Any]] = None, priority: Optional[int] = None,
+            run_at: Optional[datetime] = None, idempotency_key: Optional[str] = None) -> Job:
+    """Queue a `kind` job; with an `idempotency_key` an existing job of that key is returned instead."""
+    if kind not in job_handlers():
+        raise ValueError(f"Unknown job kind: {kind}")
+    if idempotency_key:
+        existing = db.query(Job).filter(Job.idempotency_key == idempotency_key).first()
+        if existing:
+            return existing
+    job = Job(
+        kind=kind,
+        status="queued",
+        payload=payload or {},
+        idempotency_key=idempotency_key,
+        priority=default_priority(kind) if priority is None else priority,
+        run_at=run_at,
+        attempts=0,
+    )
+    db.add(job)
+    db.commit()
+    logger.info(f"Queued job {job.id} ({kind}, priority {job.priority}, run_at {run_at})")
+    return job
+
+
+def _leasable(now: datetime):
+    due = or_(Job.run_at == None, Job.run_at <= now)  # noqa: E711
+    queued = and_(Job.status == "queued", due)
+    expired = and_(Job.status == "running", Job.lease_expires_at != None, Job.lease_expires_at < now)  # noqa: E711
+    return or_(queued, expired)
+
+
+def lease(db: Session, worker: str, kinds: Optional[List[str]] = None,
+          lease_seconds: Optional[int] = None) -> Optional[Job]:
+    """Lease the most urgent due job (or one whose lease expired); None when idle."""
+    now = utcnow()
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    # Only kinds this queue can run: with_job() rows (watchdog, s3_lifecycle...) run in their own process
+    query = db.query(Job.id).filter(_leasable(now), Job.kind.in_(kinds or list(job_handlers())))
+    candidates = [
+        job_id for (job_id,) in query
+        .order_by(Job.priority, func.coalesce(Job.run_at, Job.created_at), Job.id)
+        .limit(_LEASE_CANDIDATES)
+        .with_for_update(skip_locked=True)  # Postgres; ignored by SQLite
+    ]
+    for job_id in candidates:
+        leased = db.execute(
+            update(Job)
+            .where(Job.id == job_id, _leasable(now))
+            .values(
+                status="running",
+                locked_by=worker,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                started_at=now,
+                attempts=func.coalesce(Job.attempts, 0) + 1,
+            )
+            .returning(Job.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if not leased:
+            continue
+        db.commit()
+        job = db.get(Job, leased)
+        db.refresh(job)
+        if (job.attempts or 0) > settings.MAX_JOB_ATTEMPTS:
+            # Its workers keep dying mid-run (crash, OOM kill): stop re-leasing it
+            fail(db, job, job.last_error or "lease expired", worker)
+            continue
+        return job
+    db.commit()
+    return None
+
+
+def heartbeat(db: Session, job_id: int, worker: str, lease_seconds: Optional[int] = None) -> bool:
+    """Extend the lease of `job_id`; False if `worker` no longer holds it."""
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    extended = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker, Job.status == "running")
+        .values(lease_expires_at=utcnow() + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(extended)
+
+
+def _release(db: Session, job: Job, worker: Optional[str]) -> bool:
+    """Drop `worker`'s lease on `job`; False if another worker has taken it over since."""
+    if worker is not None:
+        released = db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.locked_by == worker, Job.status == "running")
+            .values(locked_by=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not released:
+            db.rollback()
+            logger.warning(f"Worker {worker} no longer holds job {job.id} ({job.kind}), outcome dropped")
+            return False
+    job.locked_by = None
+    job.lease_expires_at = None
+    return True
+
+
+def complete(db: Session, job: Job, result: Optional[Dict[str, Any]] = None, worker: Optional[str] = None) -> bool:
+    """Mark `job` completed; with a `worker`, only if that worker still holds its lease."""
+    if not _release(db, job, worker):
+        return False
+    job.status = "completed"
+    job.result = json.loads(json.dumps(result, default=str)) if result is not None else None
+    job.completed_at = utcnow()
+    db.commit()
+    return True
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before retry number `attempts` (1-based)."""
+    from app.utils.jobs import backoff_delay
+    return backoff_delay(attempts, settings.JOB_RETRY_DELAY_S, settings.JOB_RETRY_MAX_S)
+
+
+def fail(db: Session, job: Job, error: str, worker: Optional[str] = None) -> bool:
+    """Record a failed attempt: requeue with backoff, or DLQ after MAX_JOB_ATTEMPTS.
+
+    With a `worker`, only if that worker still holds the job's lease.
+    """
+    from app.utils.jobs import dead_letter
+
+    if not _release(db, job, worker):
+        return False
+    job.last_error = error
+    if (job.attempts or 0) >= settings.MAX_JOB_ATTEMPTS:
+        job.completed_at = utcnow()
+        dead_letter(db, job)
+        return True
+    job.status = "queued"
+    job.run_at = utcnow() + timedelta(seconds=retry_delay(job.attempts or 1))
+    db.commit()
+    logger.warning(f"Job {job.id} ({job.kind}) failed attempt {job.attempts}, retry at {job.run_at}: {error}")
+    return True
+
+
+def run_handler(job: Job) -> Dict[str, Any]:
+    """Call the job's function with the payload keys it accepts as keyword arguments."""
+    handler = job_handlers().get(job.kind)
+    if handler is None:
+        raise ValueError(f"Unknown job kind: {job.kind}")
+    params = inspect.signature(handler).parameters
+    return handler(**{k: v for k, v in (job.payload or {}).items() if k in params})
+
+
+def queue_stats(db: Session) -> Dict[str, Any]:
+    """Jobs per kind and status, plus the age of the oldest due queued job."""
+    now = utcnow()
+    counts: Dict[str, Dict[str, int]] = {}
+    for kind, status, n in db.query(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status):
+        counts.setdefault(kind, {})[status] = n
+    oldest = (
+        db.query(func.min(func.coalesce(Job.run_at, Job.created_at)))
+        .filter(Job.status == "queued", or_(Job.run_at == None, Job.run_at <= now))  # noqa: E711
+        .scalar()
+    )
+    return {
+        "by_kind": counts,
+        "oldest_due_age_s": round((now - as_utc(oldest)).total_seconds(), 1) if oldest else 0,
+        "expired_leases": db.query(Job).filter(
+            Job.status == "running", Job.lease_expires_at != None, Job.lease_expires_at < now  # noqa: E711
+        ).count(),
+    }
@@ -7,9 +7,10 @@ from sqlalchemy import text
 
 from app.models import Asset, Job, MetricEvent
 from app.utils.logger import logger
-from app.utils.datetime import utcnow, iso_utc
-from app.utils.jobs import with_job, get_retry_decorator
+from app.utils.datetime import as_utc, utcnow, iso_utc
+from app.utils.jobs import with_job, get_retry_decorator, locked_job
 
+@locked_job("retention")
 def job_retention(db: Session):
     """Clean up old data according to retention policies."""
     logger.info("Starting data retention cleanup")
@@ -65,6 +66,7 @@ def job_retention(db: Session):
     
     logger.info(f"Retention cleanup completed: {len(failed_assets)} assets, {old_metrics_count} metrics, {old_jobs_count} jobs")
 
+@locked_job("s3_lifecycle")
 @get_retry_decorator("maintenance")
 def job_s3_lifecycle(db: Session):
     """Simulate S3 lifecycle management for cost optimization."""
@@ -99,16 +101,54 @@ def job_s3_lifecycle(db: Session):
         
         logger.info(f"S3 lifecycle completed for {len(old_assets)} assets")
 
+@locked_job("watchdog")
 @get_retry_decorator("maintenance")
 def job_watchdog(db: Session):
-    """Watchdog to detect and handle stuck jobs."""
+    """Watchdog to detect and handle stuck jobs.
+
+    Queue jobs (app.services.job_queue) and transform batches are stuck only
+    once their lease expired: a live worker heartbeats it however long the
+    job runs. A queue job's failed attempt goes through job_queue.fail (retry
+    with backoff, or DLQ); a dead transform batch is marked failed and its
+    assets, whose claims are no longer renewed, go back to 'new'. Posts left
+    in 'publishing' past PUBLISH_CLAIM_TIMEOUT_S go through the publish retry
+    path (retry with backoff, or DLQ). Jobs without a lease fall back to a
+    30-minute cutoff.
+    """
+    from app.services import job_queue
+    from app.services.scheduler import release_stale_posts
+    from app.services.transform_pool import release_stale_claims
+
     with with_job(db, "watchdog", {"action": "check_stuck"}) as job_id:
         logger.info("Starting job watchdog check")
         
-        # Find jobs that have been running for more than 30 minutes
+        expired = db.query(Job).filter(
+            Job.status == "running",
+            Job.lease_expires_at != None,  # noqa: E711
+            Job.lease_expires_at < utcnow()
+        ).all()
+        runnable = job_queue.job_handlers()
+        for job in expired:
+            logger.warning(f"Job {job.id} ({job.kind}) lost its lease (worker {job.locked_by}, expired {job.lease_expires_at})")
+            if job.kind in runnable:
+                job_queue.fail(db, job, f"lease expired (worker {job.locked_by})", job.locked_by)
+            else:
+                # Progress row of a run (transform_batch): nothing to re-run, the sweeps pick the work up
+                job.status = "failed"
+                job.last_error = f"lease expired (worker {job.locked_by})"
+                job.completed_at = utcnow()
+                job.locked_by = None
+                job.lease_expires_at = None
+                db.commit()
+        released_assets = release_stale_claims(db)
+        released_posts = release_stale_posts(db)
+        
+        # Find jobs without a lease that have been running for more than 30 minutes
         stuck_threshold = utcnow() - timedelta(minutes=30)
         stuck_jobs = db.query(Job).filter(
             Job.status == "running",
+            Job.lease_expires_at == None,  # noqa: E711
+            Job.id != job_id,
             Job.started_at < stuck_threshold
         ).all()
         
@@ -117,7 +157,7 @@ def job_watchdog(db: Session):
             
             # Move to DLQ with reason
             job.status = "dlq"
-            job.dlq_reason = f"Stuck for {utcnow() - job.started_at}"
+            job.dlq_reason = f"Stuck for {utcnow() - as_utc(job.started_at)}"
             job.completed_at = utcnow()
             
             # Could also restart certain types of jobs automatically
@@ -140,7 +180,8 @@ def job_watchdog(db: Session):
         
         db.commit()
         
-        logger.info(f"Watchdog completed: {len(stuck_jobs)} stuck jobs handled")
+        logger.info(f"Watchdog completed: {len(expired)} expired leases, {len(released_assets)} stale transform claims, "
+                    f"{len(released_posts)} stale publish claims, {len(stuck_jobs)} stuck jobs handled")
 
 def get_system_stats(db: Session) -> dict:
     """Get system health statistics for monitoring."""
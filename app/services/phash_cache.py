@@ -0,0 +1,269 @@
+"""Single thumbnail phash service with a two-level cache.
+
+Lookups go through an in-process LRU, then an on-disk SQLite cache shared by
+every worker on the host. Entries are keyed by URL and also carry the sha256
+of the image bytes, so the same picture served from another URL is hashed
+once. Both levels expire entries after ``PHASH_CACHE_TTL`` seconds; the disk
+cache is trimmed to ``PHASH_CACHE_MAX_ENTRIES`` (oldest first).
+
+Decoding and hashing are CPU-bound, so cache misses are hashed in a
+``ProcessPoolExecutor`` of ``PHASH_WORKERS`` processes, a batch at a time.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+from app.utils.dedupe import safe_phash_from_bytes
+from app.utils.logger import logger
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS phash_cache (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    phash TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_phash_cache_content ON phash_cache (content_hash);
+CREATE INDEX IF NOT EXISTS ix_phash_cache_stored_at ON phash_cache (stored_at);
+"""
+
+
+class PhashPool:
+    """Process pool that hashes raw image bytes; `workers <= 1` hashes in-process."""
+
+    def __init__(self, workers: int):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 1:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # spawn: ingest runs in threads, and forking a threaded process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def hash_many(self, blobs: List[bytes]) -> List[Optional[str]]:
+        """Hash a batch of images; undecodable ones come back as None."""
+        if not blobs:
+            return []
+        pool = self._pool()
+        if pool is not None:
+            try:
+                chunksize = max(1, len(blobs) // (self.workers * 4))
+                return list(pool.map(safe_phash_from_bytes, blobs, chunksize=chunksize))
+            except BrokenProcessPool as e:
+                logger.warning(f"phash pool broken, hashing in-process: {e}")
+                self.shutdown()
+        return [safe_phash_from_bytes(b) for b in blobs]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+phash_pool = PhashPool(settings.PHASH_WORKERS)
+
+
+def _count(result: str):
+    try:
+        from app.routes.health import increment_phash_cache_metric
+        increment_phash_cache_metric(result)
+    except Exception:
+        pass
+
+
+class PhashCache:
+    """URL/content-hash -> phash cache (memory LRU in front of SQLite)."""
+
+    def __init__(self, path: str, memory_size: int, max_entries: int, ttl: float):
+        self.path = path
+        self.memory_size = max(0, memory_size)
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts = 0
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """Open the disk cache lazily; on failure keep working memory-only."""
+        if self._conn is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._conn = conn
+            except Exception as e:
+                logger.warning(f"phash disk cache disabled ({self.path}): {e}")
+                self.path = ""
+        return self._conn
+
+    def _remember(self, url: str, phash: str, stored_at: float):
+        if not self.memory_size:
+            return
+        self._memory[url] = (phash, stored_at)
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, url: str) -> Optional[str]:
+        """Cached phash for `url`, or None (counted as a miss)."""
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(url)
+            if hit and now - hit[1] < self.ttl:
+                self._memory.move_to_end(url)
+                _count("hit_memory")
+                return hit[0]
+            self._memory.pop(url, None)
+
+            conn = self._db()
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT phash, stored_at FROM phash_cache WHERE url = ? AND stored_at > ?",
+                    (url, now - self.ttl),
+                ).fetchone()
+                if row:
+                    self._remember(url, row[0], row[1])
+                    _count("hit_disk")
+                    return row[0]
+        _count("miss")
+        return None
+
+    def put_bytes(self, url: str, data: bytes) -> Optional[str]:
+        """Hash downloaded image bytes (reusing a hash of identical content) and cache it."""
+        return self.put_many({url: data}).get(url)
+
+    def put_many(self, blobs: Dict[str, bytes]) -> Dict[str, Optional[str]]:
+        """Hash a batch of downloaded images in the process pool and cache the results.
+
+        Images whose content was hashed before (or appears twice in the batch)
+        are only decoded once.
+        """
+        now = time.time()
+        content = {url: hashlib.sha256(data).hexdigest() for url, data in blobs.items()}
+        known: Dict[str, str] = {}
+        with self._lock:
+            conn = self._db()
+            if conn is not None:
+                for digest in set(content.values()):
+                    row = conn.execute(
+                        "SELECT phash FROM phash_cache WHERE content_hash = ? AND stored_at > ? LIMIT 1",
+                        (digest, now - self.ttl),
+                    ).fetchone()
+                    if row:
+                        known[digest] = row[0]
+        for digest in content.values():
+            if digest in known:
+                _count("hit_content")
+
+        # Decode outside the lock; this is the expensive part
+        todo = {}
+        for url, digest in content.items():
+            if digest not in known and digest not in todo:
+                todo[digest] = blobs[url]
+        known.update(
+            (digest, phash)
+            for digest, phash in zip(todo, phash_pool.hash_many(list(todo.values())))
+            if phash
+        )
+
+        results: Dict[str, Optional[str]] = {}
+        for url, digest in content.items():
+            phash = known.get(digest)
+            if phash:
+                self._store(url, digest, phash, now)
+            results[url] = phash
+        return results
+
+    def _store(self, url: str, content_hash: str, phash: str, stored_at: float):
+        with self._lock:
+            self._remember(url, phash, stored_at)
+            conn = self._db()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO phash_cache (url, content_hash, phash, stored_at) VALUES (?, ?, ?, ?)",
+                    (url, content_hash, phash, stored_at),
+                )
+                self._puts += 1
+                if self._puts % 500 == 0:
+                    self._evict(conn, stored_at)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"phash disk cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM phash_cache WHERE stored_at <= ?", (now - self.ttl,))
+        (total,) = conn.execute("SELECT COUNT(*) FROM phash_cache").fetchone()
+        excess = total - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM phash_cache WHERE url IN "
+                "(SELECT url FROM phash_cache ORDER BY stored_at LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            if conn is not None:
+                conn.execute("DELETE FROM phash_cache")
+                conn.commit()
+
+
+phash_cache = PhashCache(
+    settings.PHASH_CACHE_PATH,
+    settings.PHASH_CACHE_MEMORY_SIZE,
+    settings.PHASH_CACHE_MAX_ENTRIES,
+    settings.PHASH_CACHE_TTL,
+)
+
+_client: Optional[httpx.Client] = None
+
+
+def _http() -> httpx.Client:
+    global _client
+    if _client is None:
+        _client = httpx.Client(
+            timeout=10, follow_redirects=True, headers={"User-Agent": USER_AGENT}
+        )
+    return _client
+
+
+def phash_for_url(url: str) -> Optional[str]:
+    """Perceptual hash of the image at `url`, downloading only on a cache miss.
+
+    Raises on download/decode errors; callers decide how to log them.
+    """
+    if not url:
+        return None
+    cached = phash_cache.get(url)
+    if cached:
+        return cached
+    response = _http().get(url)
+    response.raise_for_status()
+    return phash_cache.put_bytes(url, response.content)
@@ -0,0 +1,173 @@
+"""Near-duplicate phash index (multi-index hashing over Asset.phash_int).
+
+Each 64-bit hash is split into ``max_distance + 1`` disjoint bit chunks. By the
+pigeonhole principle, two hashes within Hamming distance ``max_distance`` agree
+exactly on at least one chunk, so a lookup only compares the hashes sharing a
+chunk bucket with the query instead of every stored asset.
+
+The index is built once at startup from ``Asset.phash_int`` and updated
+incrementally: ingest registers the hashes it inserts, and lookups periodically
+pull rows inserted by other workers. Ids are handed out at insert time, not at
+commit, so a transaction can commit a lower id after a higher one was seen:
+each refresh re-reads the last ``overlap_ids`` ids below the highest seen.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Asset
+from app.utils.dedupe import PHASH_BITS, MASK64, phash_as_uint64
+from app.utils.logger import logger
+
+
+class PhashIndex:
+    """Multi-index hash table answering "any hash within distance <= N?"."""
+
+    def __init__(self, max_distance: int = 5, refresh_interval: float = 2.0, overlap_ids: int = 2000):
+        self.max_distance = max(0, int(max_distance))
+        self.refresh_interval = refresh_interval
+        self.overlap_ids = max(0, int(overlap_ids))
+        self._chunks = self._chunk_layout(self.max_distance + 1)
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._chunks]
+        self._ids: Dict[int, Optional[int]] = {}  # hash -> first asset id
+        self._last_id = 0
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+        self.built = False
+
+    @staticmethod
+    def _chunk_layout(count: int) -> List[Tuple[int, int]]:
+        """Split 64 bits into `count` near-equal (shift, mask) chunks."""
+        count = max(1, min(count, PHASH_BITS))
+        base, extra = divmod(PHASH_BITS, count)
+        layout, shift = [], 0
+        for i in range(count):
+            width = base + (1 if i < extra else 0)
+            layout.append((shift, (1 << width) - 1))
+            shift += width
+        return layout
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, value: Union[str, int, None], asset_id: Optional[int] = None) -> bool:
+        """Register a hash (hex string or phash_int). Returns False if already present."""
+        h = phash_as_uint64(value)
+        if h is None:
+            return False
+        with self._lock:
+            if h in self._ids:
+                if self._ids[h] is None and asset_id is not None:
+                    self._ids[h] = asset_id
+                return False
+            self._ids[h] = asset_id
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                table.setdefault((h >> shift) & mask, []).append(h)
+            return True
+
+    def find(self, value: Union[str, int, None], threshold: Optional[int] = None) -> Optional[Tuple[int, Optional[int]]]:
+        """Return (hash, asset_id) of a stored hash within `threshold`, or None."""
+        h = phash_as_uint64(value)
+        if h is None:
+            return None
+        threshold = self.max_distance if threshold is None else threshold
+        with self._lock:
+            if h in self._ids:
+                return h, self._ids[h]
+            if threshold > self.max_distance:
+                # Chunk layout can't guarantee recall beyond max_distance: scan.
+                candidates = self._ids.keys()
+                for c in candidates:
+                    if (c ^ h).bit_count() <= threshold:
+                        return c, self._ids[c]
+                return None
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                for c in table.get((h >> shift) & mask, ()):
+                    if (c ^ h).bit_count() <= threshold:
+                        return c, self._ids[c]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._tables = [{} for _ in self._chunks]
+            self._ids = {}
+            self._last_id = 0
+            self._last_refresh = 0.0
+            self.built = False
+
+    def invalidate(self):
+        """Drop the index so the next lookup rebuilds it (e.g. after a rollback)."""
+        self.clear()
+
+    def _load(self, db: Session, after_id: int) -> int:
+        rows = db.query(Asset.id, Asset.phash_int).filter(
+            Asset.id > after_id,
+            Asset.phash_int.isnot(None)
+        ).order_by(Asset.id).yield_per(10000)
+
+        loaded = 0
+        with self._lock:
+            for asset_id, value in rows:
+                loaded += self.add(value & MASK64, asset_id)
+                self._last_id = max(self._last_id, asset_id)
+        return loaded
+
+    def build(self, db: Session) -> int:
+        """(Re)build the index from Asset.phash_int."""
+        with self._lock:
+            self.clear()
+            self._load(db, 0)
+            self.built = True
+            self._last_refresh = time.monotonic()
+        return len(self)
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """Pull rows committed since the last refresh (by any worker); returns the hashes added."""
+        if not self.built:
+            return self.build(db)
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+        return self._load(db, max(0, self._last_id - self.overlap_ids))
+
+
+# Process-wide index shared by every ingest path
+phash_index = PhashIndex(
+    max_distance=settings.PHASH_DUP_THRESHOLD,
+    refresh_interval=settings.PHASH_INDEX_REFRESH_SEC,
+    overlap_ids=settings.PHASH_INDEX_OVERLAP_IDS,
+)
+
+
+def build_phash_index(db: Session = None) -> int:
+    """Build the shared index at startup."""
+    from app.db import SessionLocal
+
+    own = db is None
+    db = db or SessionLocal()
+    try:
+        started = time.monotonic()
+        count = phash_index.build(db)
+        logger.info(f"Phash index built: {count} hashes in {time.monotonic() - started:.2f}s")
+        return count
+    finally:
+        if own:
+            db.close()
+
+
+def find_near_duplicate(db: Session, phash: Union[str, int, None], threshold: Optional[int] = None) -> Optional[Tuple[int, Optional[int]]]:
+    """Look up a near-duplicate of `phash`, syncing the index with the DB first."""
+    if phash is None or phash == "":
+        return None
+    phash_index.refresh(db)
+    return phash_index.find(phash, threshold)
+
+
+def register_phash(phash: Union[str, int, None], asset_id: Optional[int] = None) -> bool:
+    """Add a freshly inserted asset hash to the shared index."""
+    return phash_index.add(phash, asset_id)
@@ -0,0 +1,104 @@
+"""Stage-to-stage handoff: ingest -> transform -> publish.
+
+With ``PIPELINE_HANDOFF`` on, committing new assets queues a transform job
+for exactly those assets, and a finished transform queues a publish job for
+the posts it created. Jobs go to Celery when ``CELERY_ENABLED``, else to the
+jobs-table queue (app.services.job_queue). Ingest-to-publish latency is then
+the time the work takes, not the job intervals or an autopilot tick.
+
+Backpressure: a handoff is skipped while the next stage already has
+``PIPELINE_MAX_QUEUED_TRANSFORM`` / ``PIPELINE_MAX_QUEUED_PUBLISH`` jobs
+waiting. Skipped work is not lost: the assets stay ``new`` and the posts
+``queued``, and the periodic job_transform / job_publish sweeps pick them up.
+Handoff errors are logged and never fail the stage that committed.
+
+A publish that failed transiently is handed off again with a delay (its
+backoff, ``post_retry_due``); the ``retry`` post is also claimed by any
+publish sweep once its ``next_attempt_at`` has passed.
+"""
+
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Job
+from app.utils.datetime import utcnow
+from app.utils.logger import logger
+
+MAX_QUEUED = {
+    "transform": lambda: settings.PIPELINE_MAX_QUEUED_TRANSFORM,
+    "publish": lambda: settings.PIPELINE_MAX_QUEUED_PUBLISH,
+}
+
+
+def _count(stage: str, result: str):
+    try:
+        from app.routes.health import increment_handoff_metric
+        increment_handoff_metric(stage, result)
+    except Exception:
+        pass
+
+
+def queue_depth(kind: str) -> int:
+    """Jobs of `kind` waiting to run (Celery: messages in the kind's queue)."""
+    if settings.CELERY_ENABLED:
+        from app.workers.celery_app import celery_app
+        from app.workers.tasks import TASKS
+
+        queue = celery_app.amqp.router.route({}, TASKS[kind].name)["queue"].name
+        with celery_app.connection_for_write() as conn:
+            return conn.default_channel.queue_declare(queue=queue, passive=True).message_count
+    db = SessionLocal()
+    try:
+        return db.query(Job).filter(Job.kind == kind, Job.status == "queued").count()
+    finally:
+        db.close()
+
+
+def _dispatch(kind: str, payload: Dict[str, Any], delay_s: float = 0):
+    if settings.CELERY_ENABLED:
+        from app.workers.tasks import TASKS
+        return TASKS[kind].apply_async(kwargs=payload, countdown=delay_s or None).id
+    from app.services.job_queue import enqueue
+    db = SessionLocal()
+    try:
+        run_at = utcnow() + timedelta(seconds=delay_s) if delay_s else None
+        return enqueue(db, kind, payload, run_at=run_at).id
+    finally:
+        db.close()
+
+
+def handoff(kind: str, payload: Dict[str, Any], delay_s: float = 0) -> Optional[Any]:
+    """Queue a `kind` job for the next stage (in `delay_s` seconds) unless it is backed up; returns the job / task id."""
+    if not settings.PIPELINE_HANDOFF:
+        return None
+    try:
+        depth = queue_depth(kind)
+        if depth >= MAX_QUEUED[kind]():
+            _count(kind, "backpressure")
+            logger.info(f"Handoff to {kind} skipped: {depth} jobs queued, left to the periodic sweep")
+            return None
+        job_id = _dispatch(kind, payload, delay_s)
+        _count(kind, "queued")
+        return job_id
+    except Exception as e:
+        _count(kind, "error")
+        logger.warning(f"Handoff to {kind} failed, left to the periodic sweep: {e}")
+        return None
+
+
+def assets_committed(asset_ids: List[Optional[int]]) -> Optional[Any]:
+    """New assets are committed: transform them."""
+    ids = [i for i in asset_ids if i is not None]
+    return handoff("transform", {"asset_ids": ids}) if ids else None
+
+
+def posts_created(post_ids: List[int]) -> Optional[Any]:
+    """A transform created queued posts: publish them."""
+    return handoff("publish", {"post_ids": list(post_ids)}) if post_ids else None
+
+
+def post_retry_due(post_id: int, delay_s: float) -> Optional[Any]:
+    """A publish failed transiently: publish the post again once its backoff is over."""
+    return handoff("publish", {"post_ids": [post_id]}, delay_s)
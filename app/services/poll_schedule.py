@@ -0,0 +1,83 @@
+"""Adaptive per-source polling.
+
+Each source carries its own poll interval. A poll that yields new assets
+halves it (down to ``POLL_MIN_INTERVAL_MIN``); an empty poll (nothing new,
+or a 304 / unchanged feed) doubles it (up to ``POLL_MAX_INTERVAL_MIN``), as
+does a failed fetch. An ingest cycle only touches sources whose
+``next_poll_at`` has passed.
+
+Sources spawned by ``ingest_serp_news`` / ``ingest_serp_trends`` (an
+``origin`` in their params) are disabled after ``POLL_DISABLE_AFTER_EMPTY``
+consecutive empty polls, so they no longer accumulate without bound.
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Source
+from app.utils.datetime import utcnow
+from app.utils.logger import logger
+
+# Tolerance for tick jitter: a source due a few seconds after the ingest
+# tick starts is polled on that tick rather than one interval later.
+DUE_SLACK = timedelta(minutes=1)
+
+
+def due_sources(db: Session, now: Optional[datetime] = None) -> List[Source]:
+    """Enabled sources whose next poll is due (never-polled sources first).
+
+    Pass the same `now` to ``record_poll`` for the cycle: schedules are
+    measured from the cycle start, so a source at the floor interval is due
+    again on the next tick however long the cycle took.
+    """
+    now = now or utcnow()
+    return (
+        db.query(Source)
+        .filter(Source.enabled == True)  # noqa: E712
+        .filter(or_(Source.next_poll_at == None, Source.next_poll_at <= now + DUE_SLACK))  # noqa: E711
+        .order_by(Source.next_poll_at.is_(None).desc(), Source.next_poll_at)
+        .all()
+    )
+
+
+def is_spawned(source: Source) -> bool:
+    """True for sources auto-created from news / trends (they carry an origin)."""
+    try:
+        return bool(json.loads(source.params_json or "{}").get("origin"))
+    except (TypeError, ValueError):
+        return False
+
+
+def record_poll(source: Source, ingested: int, error: Optional[str] = None,
+                now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Update `source`'s schedule after a poll; the caller commits."""
+    now = now or utcnow()
+    floor = max(1, settings.POLL_MIN_INTERVAL_MIN)
+    ceiling = max(floor, settings.POLL_MAX_INTERVAL_MIN)
+    interval = source.poll_interval_min or floor
+
+    if ingested > 0:
+        interval = max(floor, interval // 2)
+        source.empty_polls = 0
+    else:
+        interval = min(ceiling, interval * 2)
+        if not error:
+            source.empty_polls = (source.empty_polls or 0) + 1
+
+    source.poll_interval_min = interval
+    source.last_polled_at = now
+    source.next_poll_at = now + timedelta(minutes=interval)
+
+    disabled = False
+    limit = settings.POLL_DISABLE_AFTER_EMPTY
+    if limit > 0 and source.empty_polls >= limit and is_spawned(source):
+        source.enabled = False
+        disabled = True
+        logger.info(f"Disabled source {source.id} ({source.kind} '{source.url}') after {source.empty_polls} empty polls")
+
+    return {"poll_interval_min": interval, "next_poll_at": source.next_poll_at.isoformat(), "disabled": disabled}
@@ -0,0 +1,182 @@
+"""Cached ffprobe metadata and keyframe index of input files.
+
+A probe (duration, streams, video keyframe times) is keyed by the file's path,
+size and mtime. It is kept in memory for the process and persisted in
+``Asset.meta_json["probe"]`` by ``probe_meta``, so an asset's input is probed
+once, not on every transform or retry.
+
+Keyframes come from a packet scan (``-show_entries packet=pts_time,flags``),
+which only demuxes: it costs a read of the file, not a decode.
+``snap_segments`` moves segment starts onto nearby keyframes so a segment can
+be cut without re-encoding its first GOP (``keyframe_aligned`` in the plan).
+"""
+
+import bisect
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import logger
+from utils.ffmpeg import parse_rate
+
+_MEMORY_ENTRIES = 512
+_cache: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ident(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _ffprobe(args: List[str], timeout: int) -> Optional[str]:
+    result = subprocess.run(['ffprobe', '-v', 'error', *args], capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        logger.error(f"ffprobe failed: {result.stderr.strip()}")
+        return None
+    return result.stdout
+
+
+def _stream_info(stream: Dict[str, Any]) -> Dict[str, Any]:
+    info = {
+        "index": stream.get("index"),
+        "codec_type": stream.get("codec_type"),
+        "codec": stream.get("codec_name", "unknown"),
+        "bit_rate": int(stream["bit_rate"]) if str(stream.get("bit_rate", "")).isdigit() else None,
+    }
+    if stream.get("codec_type") == "video":
+        info.update({
+            "width": int(stream.get("width") or 0),
+            "height": int(stream.get("height") or 0),
+            "fps": parse_rate(stream.get("avg_frame_rate")) or parse_rate(stream.get("r_frame_rate")),
+            "pix_fmt": stream.get("pix_fmt"),
+        })
+    elif stream.get("codec_type") == "audio":
+        info.update({
+            "sample_rate": int(stream.get("sample_rate") or 0),
+            "channels": int(stream.get("channels") or 0),
+        })
+    return info
+
+
+def run_probe(path: str, timeout: int = 60) -> Optional[Dict[str, Any]]:
+    """Probe `path` with ffprobe (no cache): duration, format, streams and keyframes."""
+    out = _ffprobe(['-print_format', 'json', '-show_format', '-show_streams', path], timeout)
+    if out is None:
+        return None
+    data = json.loads(out)
+    fmt = data.get("format", {})
+    streams = [_stream_info(s) for s in data.get("streams", [])]
+
+    keyframes: List[float] = []
+    if any(s["codec_type"] == "video" for s in streams):
+        packets = _ffprobe(['-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+                            '-of', 'csv=p=0', path], timeout)
+        for line in (packets or "").splitlines():
+            pts, _, flags = line.partition(",")
+            if "K" in flags and pts not in ("", "N/A"):
+                keyframes.append(round(float(pts), 3))
+        keyframes.sort()
+
+    try:
+        duration = float(fmt.get("duration") or 0)
+    except ValueError:
+        duration = 0.0
+    return {
+        "duration": duration,
+        "format": fmt.get("format_name"),
+        "bit_rate": int(fmt["bit_rate"]) if str(fmt.get("bit_rate", "")).isdigit() else None,
+        "streams": streams,
+        "keyframes": keyframes,
+    }
+
+
+def _remember(key: Tuple[str, int, int], probe: Dict[str, Any]):
+    with _lock:
+        _cache[key] = probe
+        _cache.move_to_end(key)
+        while len(_cache) > _MEMORY_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def probe_file(path: str, known: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Probe of `path`, from `known` (a persisted probe) or memory when the file is unchanged."""
+    try:
+        ident = _ident(path)
+    except OSError as e:
+        logger.warning(f"Cannot probe {path}: {e}")
+        return None
+    key = (ident["path"], ident["size"], ident["mtime_ns"])
+
+    if known and known.get("file") == ident:
+        _remember(key, known)
+        return known
+    with _lock:
+        cached = _cache.get(key)
+    if cached:
+        return cached
+
+    probe = run_probe(path)
+    if probe is None:
+        return None
+    probe["file"] = ident
+    _remember(key, probe)
+    logger.info(f"Probed {path}: {probe['duration']:.1f}s, {len(probe['keyframes'])} keyframes")
+    return probe
+
+
+def probe_meta(meta: Dict[str, Any], path: str) -> Optional[Dict[str, Any]]:
+    """Probe `path` and persist it in an asset's `meta` dict (the caller saves meta_json)."""
+    probe = probe_file(path, meta.get("probe"))
+    if probe is not None:
+        meta["probe"] = probe
+    return probe
+
+
+def video_stream(probe: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), None)
+
+
+def audio_stream(probe: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return next((s for s in probe.get("streams", []) if s.get("codec_type") == "audio"), None)
+
+
+def snap_segments(plan: Dict[str, Any], probe: Dict[str, Any],
+                  tolerance: Optional[float] = None) -> Dict[str, Any]:
+    """Move the plan's segment starts back to a keyframe within `tolerance` seconds.
+
+    A stream-copied cut has to start on a keyframe; where it ends does not
+    matter, so ends are only clamped to the file duration.
+    ``plan["keyframe_aligned"]`` is set when every segment starts on a keyframe.
+    """
+    tolerance = settings.PROBE_SNAP_TOLERANCE_S if tolerance is None else tolerance
+    keyframes = probe.get("keyframes") or []
+    duration = probe.get("duration") or 0
+    if not keyframes or tolerance <= 0:
+        plan["keyframe_aligned"] = False
+        return plan
+
+    aligned = True
+    snapped = []
+    for segment in plan.get("segments") or []:
+        start = float(segment.get("start", 0) or 0)
+        end = float(segment.get("end", start) or 0)
+
+        i = bisect.bisect_right(keyframes, start + 1e-3) - 1
+        if i >= 0 and start - keyframes[i] <= tolerance:
+            start = keyframes[i]
+        else:
+            aligned = False
+        if duration:
+            end = min(end, duration)
+
+        if end > start:
+            snapped.append({**segment, "start": start, "end": end})
+    if snapped:
+        plan["segments"] = snapped
+    plan["keyframe_aligned"] = aligned and bool(snapped)
+    return plan
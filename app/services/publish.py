@@ -1,9 +1,12 @@
 import json
 import logging
 import os
+from datetime import timedelta
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.models import Post, MetricEvent, Job
+from app.utils.datetime import utcnow
 from app.utils.logger import logger
 
 logger = logging.getLogger(__name__)
@@ -214,16 +217,15 @@ def do_publish(post: Post, db: Session) -> Dict[str, Any]:
     Main publishing function with platform routing and retry logic.
     """
     try:
-        # Get file path from asset
-        if not post.asset or not post.asset.s3_key:
+        # Get file path: the post's own rendition, else the asset's output
+        file_path = post.media_path or (post.asset.s3_key if post.asset else None)
+        if not file_path:
             return {
                 "success": False,
                 "error": "No video file available",
                 "message": "Aucun fichier vidéo disponible"
             }
         
-        file_path = post.asset.s3_key
-        
         # Route to appropriate publisher
         if post.platform == "instagram":
             result = publish_instagram(post, file_path)
@@ -258,9 +260,7 @@ def do_publish(post: Post, db: Session) -> Dict[str, Any]:
             db.add(metric_event)
             
         else:
-            post.status = "failed"
-            
-            # Handle retry logic via Job system
+            # Retry with backoff, or fail / DLQ
             handle_publish_retry(post, result, db)
         
         db.commit()
@@ -269,8 +269,7 @@ def do_publish(post: Post, db: Session) -> Dict[str, Any]:
         
     except Exception as e:
         logger.error(f"Publish error for post {post.id}: {e}")
-        post.status = "failed"
-        db.commit()
+        handle_publish_retry(post, {"error": str(e)}, db)  # commits
         
         return {
             "success": False,
@@ -279,34 +278,77 @@ def do_publish(post: Post, db: Session) -> Dict[str, Any]:
         }
 
 
-def handle_publish_retry(post: Post, failed_result: Dict[str, Any], db: Session):
-    """Handle retry logic for failed publications."""
-    try:
-        # Create retry job if this is a recoverable error
-        error_msg = failed_result.get("error", "")
-        
-        # Don't retry for credential errors
-        if "non connecté" in error_msg or "manquantes" in error_msg:
-            logger.info(f"Not retrying post {post.id} due to missing credentials")
-            return
-        
-        # Create retry job
-        retry_job = Job(
+# Backoff base per platform (seconds): YouTube's upload quota resets slowly,
+# the others mostly fail on short rate limits
+PUBLISH_RETRY_BASE_S = {
+    "youtube": 300,
+    "instagram": 60,
+    "tiktok": 60,
+    "reddit": 120,
+    "pinterest": 60,
+}
+# Errors a retry cannot fix
+NON_RETRYABLE_ERRORS = ("non connecté", "manquantes", "Unsupported platform", "No video file available")
+
+
+def publish_retry_base(platform: str) -> float:
+    """Backoff base of `platform`: PUBLISH_RETRY_BASE_S_<PLATFORM>, PUBLISH_RETRY_BASE_S, or the default."""
+    override = os.getenv(f"PUBLISH_RETRY_BASE_S_{(platform or '').upper()}")
+    if override:
+        return float(override)
+    return settings.PUBLISH_RETRY_BASE_S or PUBLISH_RETRY_BASE_S.get(platform, settings.JOB_RETRY_DELAY_S)
+
+
+def handle_publish_retry(post: Post, failed_result: Dict[str, Any], db: Session) -> str:
+    """Record a failed publish of `post` and schedule its retry.
+
+    Transient errors put the post in ``retry`` with ``next_attempt_at`` after
+    an exponential, fully jittered backoff from its platform's base, and hand
+    a delayed publish job off (app.services.pipeline_events); publish sweeps
+    claim due ``retry`` posts too. After ``MAX_JOB_ATTEMPTS`` the post fails
+    and a publish job recording it goes to the DLQ. Every outcome is committed
+    here, with whatever else is pending on `db`: the retry handoff must see
+    the post's new schedule.
+
+    Returns the outcome: "retry", "failed" (not retryable) or "dlq".
+    """
+    from app.utils.jobs import backoff_delay, dead_letter
+
+    error_msg = failed_result.get("error") or failed_result.get("message") or "unknown error"
+    post.publish_attempts = (post.publish_attempts or 0) + 1
+    post.last_error = error_msg
+    post.next_attempt_at = None
+
+    if any(marker in error_msg for marker in NON_RETRYABLE_ERRORS):
+        post.status = "failed"
+        db.commit()
+        logger.info(f"Not retrying post {post.id}: {error_msg}")
+        return "failed"
+
+    if post.publish_attempts >= settings.MAX_JOB_ATTEMPTS:
+        post.status = "failed"
+        job = Job(
             kind="publish",
-            payload_json=json.dumps({
-                "post_id": post.id,
-                "retry_attempt": True,
-                "original_error": error_msg
-            }),
-            status="queued",
-            attempts=1
+            status="failed",
+            payload={"post_ids": [post.id], "platform": post.platform},
+            attempts=post.publish_attempts,
+            last_error=error_msg,
+            completed_at=utcnow(),
         )
-        
-        db.add(retry_job)
-        logger.info(f"Created retry job for post {post.id}")
-        
-    except Exception as e:
-        logger.error(f"Error creating retry job for post {post.id}: {e}")
+        db.add(job)
+        dead_letter(db, job)  # commits
+        return "dlq"
+
+    delay = backoff_delay(post.publish_attempts, publish_retry_base(post.platform), settings.JOB_RETRY_MAX_S)
+    post.status = "retry"
+    post.next_attempt_at = utcnow() + timedelta(seconds=delay)
+    db.commit()
+    logger.warning(f"Publish of post {post.id} to {post.platform} failed (attempt {post.publish_attempts}), "
+                   f"retry at {post.next_attempt_at}: {error_msg}")
+
+    from app.services.pipeline_events import post_retry_due
+    post_retry_due(post.id, delay)
+    return "retry"
 
 
 def publish_to_platform(post: Post, file_path: str) -> Dict[str, Any]:
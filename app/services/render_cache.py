@@ -0,0 +1,257 @@
+"""Content-addressed cache of transform outputs.
+
+A render is keyed by the sha256 of the input file, the parts of the plan that
+change the picture or sound (segments, overlay texts, subtitles, audio) and
+the encoder settings of utils/ffmpeg. A repeat render (retry, manual
+``/assets/{id}/transform``, re-planning with unchanged segments) is then
+served by hard-linking (or copying) the cached files to the requested output
+paths instead of running FFmpeg. Outputs are unlinked before a fresh render
+so FFmpeg never truncates a file shared with the cache.
+
+The encoding profile (x264 preset / crf) follows the transform backlog, so a
+retry often asks for another profile than the first render. The key leaves
+them out; an entry records the crf it was rendered at and serves any request
+of that crf or higher (same or better quality than asked for). A request for
+a lower crf renders again and replaces the entry.
+
+Entries live under ``RENDER_CACHE_DIR/<key>/`` and are written to a temp
+directory then renamed, so readers never see half-written files. Hits touch
+the entry's mtime; when the cache grows past ``RENDER_CACHE_MAX_BYTES`` the
+least recently used entries are deleted. An empty ``RENDER_CACHE_DIR``
+disables the cache.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import logger
+from utils.ffmpeg import burnt_overlays, encoder_settings, plan_segments
+
+_HASH_CHUNK = 1 << 20
+_MEMORY_ENTRIES = 512  # memoized input hashes kept in memory
+_QUALITY_FILE = "quality.json"
+
+
+def _count(result: str):
+    try:
+        from app.routes.health import increment_render_cache_metric
+        increment_render_cache_metric(result)
+    except Exception:
+        pass
+
+
+def _crf(encoding: Optional[Dict[str, Any]]) -> Optional[int]:
+    """crf `encoding` renders at; None for a stream copy (no re-encode)."""
+    from utils.ffmpeg import DEFAULT_ENCODING
+    if (encoding or {}).get("copy"):
+        return None
+    return int({**DEFAULT_ENCODING, **(encoding or {})}["crf"])
+
+
+def _place(src: str, dst: str):
+    """Hard-link `src` to `dst` (copy across filesystems), replacing `dst`."""
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return  # already linked: rename() between two links of one file is a no-op that leaves tmp behind
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class RenderCache:
+    """Size-bounded LRU directory of rendered files, keyed by content."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._file_hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def file_hash(self, path: str) -> str:
+        """sha256 of a file, memoized by (path, size, mtime) for the last _MEMORY_ENTRIES files."""
+        st = os.stat(path)
+        ident = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._file_hashes.get(ident)
+            if cached:
+                self._file_hashes.move_to_end(ident)
+        if cached:
+            return cached
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._file_hashes[ident] = digest.hexdigest()
+            self._file_hashes.move_to_end(ident)
+            while len(self._file_hashes) > _MEMORY_ENTRIES:
+                self._file_hashes.popitem(last=False)
+        return digest.hexdigest()
+
+    def key(self, input_path: str, plan: Dict[str, Any], names, encoding: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key of rendering `plan` from `input_path` into outputs `names`."""
+        overlays = burnt_overlays(plan)
+        srt = plan.get("srt")
+        normalized = {
+            "input": self.file_hash(input_path),
+            "segments": [[round(start, 3), round(end, 3)] for start, end in plan_segments(plan)],
+            "overlays": {f: (overlays.get(f) or "").strip() for f in ("hook_text", "cta_text", "attribution")},
+            "srt": self.file_hash(srt) if srt and os.path.exists(srt) else None,
+            "audio": bool(plan.get("audio_enabled", True)),
+            "outputs": sorted(names),
+            "encoder": encoder_settings(encoding),
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def quality(self, key: str) -> Optional[int]:
+        """crf the entry of `key` was rendered at (None: unknown or a stream copy)."""
+        try:
+            with open(os.path.join(self._entry(key), _QUALITY_FILE)) as f:
+                return json.load(f).get("crf")
+        except (OSError, ValueError):
+            return None
+
+    def _serves(self, key: str, crf: Optional[int]) -> bool:
+        cached = self.quality(key)
+        return crf is None or cached is None or cached <= crf
+
+    def fetch(self, key: str, outputs: Dict[str, str], crf: Optional[int] = None) -> bool:
+        """Place the cached files of `key` at `outputs` ({name: path}); False on a miss.
+
+        With a `crf`, an entry rendered at a higher crf (lower quality) is a miss.
+        """
+        entry = self._entry(key)
+        sources = {name: os.path.join(entry, f"{name}.mp4") for name in outputs}
+        if not all(os.path.exists(p) for p in sources.values()) or not self._serves(key, crf):
+            return False
+        try:
+            for name, path in outputs.items():
+                _place(sources[name], path)
+            os.utime(entry)  # LRU clock
+        except OSError as e:  # evicted meanwhile
+            logger.warning(f"Render cache entry {key[:12]} unusable: {e}")
+            return False
+        return True
+
+    def store(self, key: str, outputs: Dict[str, str], crf: Optional[int] = None):
+        """Add rendered `outputs` ({name: path}) under `key`, then trim the cache.
+
+        An existing entry is kept unless this render has a lower `crf`.
+        """
+        entry = self._entry(key)
+        replaced = os.path.isdir(entry)
+        if replaced and (crf is None or self._serves(key, crf)):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        trash = None
+        try:
+            for name, path in outputs.items():
+                _place(path, os.path.join(staging, f"{name}.mp4"))
+            with open(os.path.join(staging, _QUALITY_FILE), "w") as f:
+                json.dump({"crf": crf}, f)
+            if replaced:
+                # Moved aside first: rename() does not replace a non-empty directory
+                trash = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+                os.rename(entry, os.path.join(trash, "old"))
+            os.rename(staging, entry)
+        except OSError:
+            # Another worker stored (or replaced) the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        finally:
+            if trash:
+                shutil.rmtree(trash, ignore_errors=True)
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries until under max_bytes; returns entries removed."""
+        if self.max_bytes <= 0 or not os.path.isdir(self.root):
+            return 0
+        entries = []
+        total = 0
+        with os.scandir(self.root) as it:
+            for d in it:
+                if not d.is_dir():
+                    continue
+                if d.name.startswith(".staging-"):
+                    if d.stat().st_mtime < time.time() - 3600:  # left behind by a crashed worker
+                        shutil.rmtree(d.path, ignore_errors=True)
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(d.path) if f.is_file())
+                entries.append((d.stat().st_mtime, size, d.path))
+                total += size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Render cache evicted {removed} entries")
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self._file_hashes.clear()
+
+
+render_cache = RenderCache(settings.RENDER_CACHE_DIR, settings.RENDER_CACHE_MAX_BYTES)
+
+
+def cached_render(input_path: str, plan: Dict[str, Any], outputs: Dict[str, str],
+                  render: Callable[[], bool], encoding: Optional[Dict[str, Any]] = None) -> bool:
+    """Serve `outputs` from the render cache, or call `render()` and cache its files.
+
+    `encoding` is the profile `render` encodes with: an entry of the same plan
+    rendered at its crf or a lower one is served whatever its preset.
+    """
+    if not render_cache.enabled:
+        return render()
+    try:
+        key = render_cache.key(input_path, plan, outputs, encoding)
+    except OSError as e:
+        logger.warning(f"Render cache key failed for {input_path}: {e}")
+        return render()
+
+    crf = _crf(encoding)
+    if render_cache.fetch(key, outputs, crf):
+        _count("hit")
+        logger.info(f"Render cache hit {key[:12]} for {input_path}")
+        return True
+    _count("miss")
+
+    # Outputs may be hard links into the cache from an earlier hit: unlink them
+    # so FFmpeg writes new files instead of truncating the cached ones
+    for path in outputs.values():
+        if os.path.lexists(path):
+            os.remove(path)
+
+    started = time.perf_counter()
+    if not render():
+        return False
+    logger.info(f"Rendered {input_path} in {time.perf_counter() - started:.1f}s")
+    try:
+        render_cache.store(key, outputs, crf)
+    except OSError as e:
+        logger.warning(f"Could not store render {key[:12]}: {e}")
+    return True
@@ -1,12 +1,16 @@
 import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import timedelta
 from app.utils.datetime import utcnow
+from sqlalchemy import and_, or_, update
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.models import Job, Asset, Post, Source
 from app.db import SessionLocal
 from app.utils.logger import logger
+from app.utils.jobs import locked_job
+from app.utils.locks import acquire_lock, fence_row, holds_fence, release_lock
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +53,7 @@ def job_status() -> Dict[str, Any]:
         }
 
 
+@locked_job("ingest")
 def job_ingest() -> Dict[str, Any]:
     """
     Ingestion job - watch sources, filter, and deduplicate.
@@ -57,11 +62,19 @@ def job_ingest() -> Dict[str, Any]:
         from app.services.sources import ingest_watch
         
         logger.info("Starting ingestion job...")
-        count = ingest_watch()
+        report = ingest_watch()
+        count = report["ingested"]
         
         result = {
             "success": True,
             "assets_ingested": count,
+            "skipped_unchanged": report["skipped_unchanged"],
+            "sources_polled": report["polled"],
+            "sources_disabled": report["disabled"],
+            "elapsed_ms": report["elapsed_ms"],
+            "insert_rows_per_sec": report["insert_rows_per_sec"],
+            "rows_per_sec": round(count / (report["elapsed_ms"] / 1000), 1) if report["elapsed_ms"] else 0.0,
+            "sources": report["sources"],  # per-source fetch/process timings
             "message": f"Ingested {count} new assets"
         }
         
@@ -77,54 +90,31 @@ def job_ingest() -> Dict[str, Any]:
         }
 
 
-def job_transform() -> Dict[str, Any]:
+@locked_job("transform", sweep_only=True)
+def job_transform(asset_ids: Optional[List[int]] = None) -> Dict[str, Any]:
     """
     Transform job - analyze assets, generate AI plans, transform videos.
+    
+    Claims a batch of new assets (those of `asset_ids` when handed off by
+    ingest) and transforms them in parallel (see app.services.transform_pool).
     """
     try:
-        db = SessionLocal()
-        
-        # Get assets ready for transformation
-        assets_to_transform = db.query(Asset).filter(
-            Asset.status == "new"
-        ).order_by(Asset.created_at.desc()).limit(5).all()  # Process 5 at a time
-        
-        transformed_count = 0
-        failed_count = 0
-        
-        for asset in assets_to_transform:
-            try:
-                logger.info(f"Transforming asset {asset.id}")
-                
-                from app.services.assets import transform_asset
-                success = transform_asset(asset, db)
-                
-                if success:
-                    # Mark as transformed and create posts for publishing
-                    asset.status = "transformed"
-                    db.commit()
-                    
-                    # Create posts for multiple platforms
-                    create_posts_for_asset(asset, db)
-                    
-                    transformed_count += 1
-                    logger.info(f"Successfully transformed asset {asset.id} and created posts")
-                else:
-                    failed_count += 1
-                    logger.warning(f"Failed to transform asset {asset.id}")
-                    
-            except Exception as e:
-                logger.error(f"Error transforming asset {asset.id}: {e}")
-                failed_count += 1
-                asset.status = "failed"
-                db.commit()
+        from app.services.transform_pool import run_transform_batch
         
-        db.close()
+        report = run_transform_batch(asset_ids=asset_ids)
+        transformed_count = report["transformed"]
+        failed_count = report["failed"]
         
         result = {
             "success": True,
             "assets_transformed": transformed_count,
             "assets_failed": failed_count,
+            "workers": report["workers"],
+            "job_id": report["job_id"],
+            "elapsed_ms": report["elapsed_ms"],
+            "encode_fps": report["encode_fps"],
+            "output_bytes": report["output_bytes"],
+            "profiles": report["profiles"],
             "message": f"Transformed {transformed_count} assets, {failed_count} failed"
         }
         
@@ -140,8 +130,8 @@ def job_transform() -> Dict[str, Any]:
         }
 
 
-def create_posts_for_asset(asset: Asset, db: Session):
-    """Create posts for multiple platforms from a transformed asset."""
+def create_posts_for_asset(asset: Asset, db: Session) -> List[Post]:
+    """Create posts for multiple platforms from a transformed asset; returns them."""
     from app.models import Post
     from app.services.ai_planner import generate_hooks_for_asset
     import json
@@ -151,9 +141,11 @@ def create_posts_for_asset(asset: Asset, db: Session):
     
     # Parse asset metadata
     meta = json.loads(asset.meta_json) if asset.meta_json else {}
+    renditions = meta.get("renditions") or {}  # per-platform files (TRANSFORM_MODE=renditions)
     
     # Platforms to publish to
     platforms = ["instagram", "tiktok", "youtube", "reddit"]
+    posts = []
     
     for i, platform in enumerate(platforms):
         # Use different hook variants for A/B testing
@@ -176,6 +168,7 @@ def create_posts_for_asset(asset: Asset, db: Session):
             title=hook,
             description=description,
             shortlink=shortlink,
+            media_path=renditions.get(platform),
             status="queued",  # Ready for publishing
             language=asset.lang or "fr",
             hashtags="#tech,#innovation,#ia,#contentflow",
@@ -183,9 +176,11 @@ def create_posts_for_asset(asset: Asset, db: Session):
         )
         
         db.add(post)
+        posts.append(post)
         logger.info(f"Created post for {platform} with monetized shortlink")
     
     db.commit()
+    return posts
 
 
 def create_monetized_shortlink(asset: Asset, platform: str, db: Session) -> str:
@@ -221,30 +216,116 @@ def create_monetized_shortlink(asset: Asset, platform: str, db: Session) -> str:
     return f"https://contentflow.ai/l/{link_hash}"
 
 
-def job_publish() -> Dict[str, Any]:
+def claim_posts(db: Session, limit: int, post_ids: Optional[List[int]] = None) -> List[int]:
+    """Atomically move up to `limit` queued or due 'retry' posts (of `post_ids` if given) to 'publishing'.
+
+    Handed-off publish jobs and the periodic sweep can then run concurrently
+    without publishing a post twice.
+    """
+    now = utcnow()
+    claimable = or_(Post.status == "queued", and_(Post.status == "retry", Post.next_attempt_at <= now))
+    query = db.query(Post.id).filter(claimable)
+    if post_ids is not None:
+        query = query.filter(Post.id.in_(post_ids))
+    ids = [i for (i,) in query.order_by(Post.created_at.desc()).limit(limit).with_for_update(skip_locked=True)]
+    if not ids:
+        db.commit()
+        return []
+    claimed = db.execute(
+        update(Post)
+        .where(Post.id.in_(ids), claimable)
+        .values(status="publishing", claimed_at=now)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    return list(claimed)
+
+
+def release_post_claim(db: Session, post_id: int) -> bool:
+    """Hand a claimed post back to 'queued' for a later publish run, unless its outcome was written meanwhile."""
+    released = db.execute(
+        update(Post)
+        .where(Post.id == post_id, Post.status == "publishing")
+        .values(status="queued", claimed_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(released)
+
+
+def release_stale_posts(db: Session, timeout_s: Optional[int] = None) -> List[int]:
+    """Send posts stuck in 'publishing' (their worker or task died) through handle_publish_retry.
+
+    A post's claim is refreshed when its publish starts, so only a post whose
+    own publish outlived `timeout_s` (PUBLISH_CLAIM_TIMEOUT_S) is released.
+    """
+    from app.services.publish import handle_publish_retry
+
+    cutoff = utcnow() - timedelta(seconds=timeout_s or settings.PUBLISH_CLAIM_TIMEOUT_S)
+    stale = db.query(Post).filter(
+        Post.status == "publishing",
+        or_(Post.claimed_at == None, Post.claimed_at < cutoff)  # noqa: E711
+    ).all()
+    for post in stale:
+        logger.warning(f"Post {post.id} stuck in 'publishing' since {post.claimed_at}")
+        handle_publish_retry(post, {"error": "publish interrupted: worker lost"}, db)  # commits
+    return [p.id for p in stale]
+
+
+@locked_job("publish", sweep_only=True)
+def job_publish(post_ids: Optional[List[int]] = None) -> Dict[str, Any]:
     """
     Publish job - check compliance, quality, and publish safe content.
+    
+    Publishes the posts of `post_ids` (handed off by a transform or a retry)
+    or, as a sweep, the 5 most recent queued posts and due retries. Failed
+    publishes go through handle_publish_retry (backoff, then DLQ).
+
+    Each post is published under its own lock, whose fencing token is stamped
+    on the post; the outcome is only written while the post still carries it.
+    Locks are taken and released one post at a time, so a batch holds at most
+    one (with Postgres advisory locks, one pooled connection besides the
+    session's). A post whose lock is held elsewhere is handed back to 'queued'.
     """
     try:
+        from app.services.publish import handle_publish_retry
+
         db = SessionLocal()
         
         # Get posts ready for publishing
-        posts_to_publish = db.query(Post).filter(
-            Post.status == "queued"
-        ).order_by(Post.created_at.desc()).limit(5).all()  # Limit to 5 concurrent
+        claimed = claim_posts(db, len(post_ids) if post_ids else 5, post_ids)
+        posts_to_publish = db.query(Post).filter(Post.id.in_(claimed)).order_by(Post.created_at.desc()).all()
         
         published_count = 0
         review_count = 0
         failed_count = 0
+        retry_count = 0
         
         for post in posts_to_publish:
+            # A worker that paused past its claim (and had the post released and
+            # re-claimed) holds an older token: its outcome is dropped below
+            lock = acquire_lock(f"post:{post.id}", renew=True)
+            if lock is None or not fence_row(db, Post, post.id, lock.token):
+                logger.warning(f"Post {post.id} is being published by another worker, handing it back")
+                if lock is not None:
+                    release_lock(lock)
+                # Not left in 'publishing' until release_stale_posts counts it as a failed attempt
+                release_post_claim(db, post.id)
+                continue
             try:
                 logger.info(f"Processing post {post.id} for publishing")
+                # Posts of the batch are published one after the other: the claim counts from here
+                post.claimed_at = utcnow()
+                db.commit()
                 
                 # Load asset and plan
                 asset = post.asset
                 if not asset:
                     logger.warning(f"Post {post.id} has no associated asset")
+                    post.status = "failed"  # claimed: don't leave it in 'publishing'
+                    failed_count += 1
+                    db.commit()
                     continue
                 
                 meta = json.loads(asset.meta_json or "{}")
@@ -262,10 +343,18 @@ def job_publish() -> Dict[str, Any]:
                     # Publish automatically
                     from app.services.publish import publish_to_platform
                     
-                    # Get video file path from asset
-                    video_path = f"/tmp/videos/asset_{asset.id}_vertical.mp4"
+                    # The post's own platform rendition, else the asset's output
+                    video_path = post.media_path or asset.s3_key
                     
-                    publish_result = publish_to_platform(post, video_path)
+                    if video_path:
+                        publish_result = publish_to_platform(post, video_path)
+                    else:
+                        publish_result = {"success": False, "error": "No video file available"}
+                    if not holds_fence(db, Post, post.id, lock.token):
+                        logger.warning(f"Post {post.id}: lock token {lock.token} superseded, "
+                                       f"dropping publish outcome {publish_result}")
+                        db.rollback()
+                        continue
                     
                     if publish_result["success"]:
                         post.status = "published"
@@ -289,10 +378,12 @@ def job_publish() -> Dict[str, Any]:
                             # Continue without metrics - publication is more important
                         
                     else:
-                        post.status = "failed"
-                        failed_count += 1
                         logger.error(f"❌ Failed to publish post {post.id}: {publish_result.get('error', 'Unknown error')}")
                         logger.error(f"   Full result: {publish_result}")
+                        if handle_publish_retry(post, publish_result, db) == "retry":
+                            retry_count += 1
+                        else:
+                            failed_count += 1
                 else:
                     # Send to manual review
                     post.status = "review"
@@ -303,9 +394,15 @@ def job_publish() -> Dict[str, Any]:
                 
             except Exception as e:
                 logger.error(f"Error processing post {post.id}: {e}")
-                failed_count += 1
-                post.status = "failed"
-                db.commit()
+                db.rollback()
+                if not holds_fence(db, Post, post.id, lock.token):
+                    continue
+                if handle_publish_retry(post, {"error": str(e)}, db) == "retry":  # commits
+                    retry_count += 1
+                else:
+                    failed_count += 1
+            finally:
+                release_lock(lock)
         
         db.close()
         
@@ -314,7 +411,8 @@ def job_publish() -> Dict[str, Any]:
             "published": published_count,
             "sent_to_review": review_count,
             "failed": failed_count,
-            "message": f"Published {published_count}, {review_count} to review, {failed_count} failed"
+            "retrying": retry_count,
+            "message": f"Published {published_count}, {review_count} to review, {retry_count} retrying, {failed_count} failed"
         }
         
         logger.info(f"Publish job completed: {result}")
@@ -397,21 +495,6 @@ def job_metrics() -> Dict[str, Any]:
         }
 
 
-def run_job_by_kind(kind: str) -> Dict[str, Any]:
-    """Execute job by kind."""
-    job_map = {
-        "ingest": job_ingest,
-        "transform": job_transform,
-        "publish": job_publish,
-        "metrics": job_metrics
-    }
-    
-    if kind not in job_map:
-        raise ValueError(f"Unknown job kind: {kind}")
-        
-    return job_map[kind]()
-
-
 def get_scheduler_status() -> Dict[str, Any]:
     """Get current scheduler status."""
     return {
@@ -432,6 +515,7 @@ def get_job_priorities() -> Dict[str, int]:
     }
 
 
+@locked_job("metrics")
 def job_metrics() -> Dict[str, Any]:
     """
     Metrics job - collect performance data and update bandits.
@@ -504,48 +588,33 @@ def get_job_priorities() -> List[Dict[str, Any]]:
     return sorted(jobs, key=lambda x: x["priority"])
 
 
-def run_job_by_kind(job_kind: str) -> Dict[str, Any]:
-    """Run a specific job by kind."""
-    job_functions = {
-        "ingest": job_ingest,
-        "transform": job_transform,
-        "publish": job_publish,
-        "metrics": job_metrics
-    }
-    
-    if job_kind not in job_functions:
+def run_job_by_kind(job_kind: str, priority: Optional[int] = None, delay_s: int = 0) -> Dict[str, Any]:
+    """Queue a specific job by kind on the jobs table; a queue worker runs it.
+
+    Leasing, retries with backoff and the DLQ all apply (app.services.job_queue).
+    """
+    from app.services.job_queue import enqueue
+
+    db = SessionLocal()
+    try:
+        run_at = utcnow() + timedelta(seconds=delay_s) if delay_s > 0 else None
+        job = enqueue(db, job_kind, {"manual_trigger": True}, priority=priority, run_at=run_at)
         return {
-            "success": False,
-            "error": f"Unknown job kind: {job_kind}",
-            "message": f"Job type '{job_kind}' not supported"
+            "success": True,
+            "job_id": job.id,
+            "status": job.status,
+            "priority": job.priority,
+            "run_at": job.run_at,
+            "message": f"Job {job_kind} queued"
         }
-    
-    try:
-        logger.info(f"Running {job_kind} job...")
-        result = job_functions[job_kind]()
-        
-        # Log job execution
-        db = SessionLocal()
-        job_record = Job(
-            kind=job_kind,
-            payload_json=json.dumps({"manual_trigger": True}),
-            status="done" if result["success"] else "failed",
-            attempts=1,
-            last_error=result.get("error", "")
-        )
-        db.add(job_record)
-        db.commit()
-        db.close()
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Job {job_kind} execution failed: {e}")
+    except ValueError as e:
         return {
             "success": False,
             "error": str(e),
-            "message": f"Job execution failed: {e}"
+            "message": f"Job type '{job_kind}' not supported"
         }
+    finally:
+        db.close()
 
 
 def get_scheduler_status() -> Dict[str, Any]:
@@ -558,7 +627,7 @@ def get_scheduler_status() -> Dict[str, Any]:
         
         stats = {
             "total_jobs": len(recent_jobs),
-            "successful": sum(1 for j in recent_jobs if j.status == "done"),
+            "successful": sum(1 for j in recent_jobs if j.status == "completed"),
             "failed": sum(1 for j in recent_jobs if j.status == "failed"),
             "running": sum(1 for j in recent_jobs if j.status == "running"),
             "queued": sum(1 for j in recent_jobs if j.status == "queued")
@@ -0,0 +1,116 @@
+"""Compiled keyword / category filters for sources.
+
+Each filter CSV is compiled once into a single regex built from a trie of
+its terms, so an entry takes one regex search instead of a substring test
+per keyword. The (backtracking) engine walks the trie at each word start, so
+the cost follows the text and the longest keyword more than the keyword
+count; it is not a linear-time match. infra/bench_source_filters.py measures
+it ~1.8x faster than the substring loop at 200 keywords, ~18x at 2000.
+
+Matching is case- and accent-insensitive ("securite" matches "Sécurité") and
+anchored at the start of a word: "tech" still matches "technologie", but
+"art" no longer matches inside "départ".
+
+Compiled matchers are cached per source id and reused until the source's
+filter strings change.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, Optional, Pattern, Tuple
+
+from app.models import Source
+
+
+def _strip_marks(text: str) -> str:
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+
+
+# Accented Latin letters (Latin-1 Supplement .. Latin Extended-B) -> base letters,
+# applied with str.translate so typical French/European text never hits NFKD
+_LATIN_FOLD = {
+    cp: folded
+    for cp in range(0xC0, 0x250)
+    if (folded := _strip_marks(chr(cp).casefold())) != chr(cp)
+}
+_COMBINING_RE = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents (NFKD + drop combining marks)."""
+    folded = text.casefold().translate(_LATIN_FOLD)
+    if folded.isascii():
+        return folded
+    if not unicodedata.is_normalized("NFKD", folded):
+        folded = unicodedata.normalize("NFKD", folded)
+    return _COMBINING_RE.sub("", folded)
+
+
+def split_terms(csv: Optional[str]) -> list:
+    """Folded, de-duplicated, non-empty terms of a CSV filter."""
+    if not csv:
+        return []
+    return sorted({fold(t.strip()) for t in csv.split(",") if t.strip()})
+
+
+def _trie_pattern(node: dict) -> str:
+    """Regex for a trie node: shared prefixes are factored out, so the
+    pattern's size (not its matching time) is linear in the total keyword length."""
+    end = "" in node
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not end:
+        return branches[0]
+    body = "(?:" + "|".join(branches) + ")"
+    return body + "?" if end else body
+
+
+def compile_terms(terms: Iterable[str]) -> Optional[Pattern]:
+    """One regex matching any of `terms` (already folded) at a word start."""
+    root: dict = {}
+    for term in terms:
+        node = root
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    if not root:
+        return None
+    return re.compile(r"(?<!\w)" + _trie_pattern(root))
+
+
+class SourceMatcher:
+    """Keyword and category filters of one source, compiled."""
+
+    def __init__(self, keywords: Optional[str], categories: Optional[str]):
+        self.keywords = compile_terms(split_terms(keywords))
+        self.categories = compile_terms(split_terms(categories))
+
+    def matches(self, title: str, description: str) -> bool:
+        if self.keywords is None and self.categories is None:
+            return True
+        text = fold(f"{title} {description}")
+        if self.keywords is not None and not self.keywords.search(text):
+            return False
+        if self.categories is not None and not self.categories.search(text):
+            return False
+        return True
+
+
+_cache: Dict[int, Tuple[Tuple[Optional[str], Optional[str]], SourceMatcher]] = {}
+_lock = threading.Lock()
+
+
+def matcher_for(source: Source) -> SourceMatcher:
+    """Cached compiled matcher for `source`; rebuilt when its filters change."""
+    fingerprint = (source.keywords, source.categories)
+    with _lock:
+        cached = _cache.get(source.id)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+    matcher = SourceMatcher(*fingerprint)
+    if source.id is not None:
+        with _lock:
+            _cache[source.id] = (fingerprint, matcher)
+    return matcher
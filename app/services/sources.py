@@ -1,181 +1,241 @@
 import feedparser
 import json
 import logging
-import re
-import requests
-from io import BytesIO
-from PIL import Image
-import imagehash
+from sqlalchemy import insert as core_insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
 from app.models import Source, Asset
+from app.services.phash_cache import phash_for_url
+from app.services.phash_index import PhashIndex, phash_index, find_near_duplicate, register_phash
+from app.services.pipeline_events import assets_committed
+from app.services.source_filters import matcher_for
+from app.services.text_analysis import analyze_text, analyze_texts
+from app.utils.datetime import utcnow
+from app.utils.dedupe import phash_to_int, url_key, video_key
 from app.utils.logger import logger
 
 logger = logging.getLogger(__name__)
 
 
 def calculate_phash(image_url: str) -> Optional[str]:
-    """Calculate perceptual hash of an image from URL."""
+    """Calculate perceptual hash of an image from URL (cached by URL and content)."""
     try:
-        response = requests.get(image_url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        response.raise_for_status()
-        
-        image = Image.open(BytesIO(response.content))
-        phash = str(imagehash.phash(image))
-        return phash
+        return phash_for_url(image_url)
         
     except Exception as e:
         logger.warning(f"Could not calculate phash for {image_url}: {e}")
         return None
 
 
-def is_duplicate_phash(phash: str, db: Session, threshold: int = 5) -> bool:
-    """Check if an asset with similar phash already exists."""
+def is_duplicate_phash(phash: str, db: Session, threshold: int = None) -> bool:
+    """Check if an asset with similar phash already exists (indexed lookup)."""
     if not phash:
         return False
-        
-    existing_assets = db.query(Asset).filter(Asset.phash.isnot(None)).all()
-    
-    for asset in existing_assets:
-        try:
-            existing_phash = imagehash.hex_to_hash(asset.phash)
-            new_phash = imagehash.hex_to_hash(phash)
-            
-            # Calculate Hamming distance
-            if abs(existing_phash - new_phash) <= threshold:
-                logger.info(f"Duplicate detected: phash {phash} similar to existing {asset.phash}")
-                return True
-                
-        except Exception as e:
-            logger.warning(f"Error comparing phashes: {e}")
-            continue
-            
+
+    match = find_near_duplicate(db, phash, threshold)
+    if match:
+        _, asset_id = match
+        logger.info(f"Duplicate detected: phash {phash} similar to existing asset {asset_id}")
+        return True
+
     return False
 
 
+def existing_external_keys(db: Session, keys: Iterable[Optional[str]], chunk_size: int = 500) -> Set[str]:
+    """Return which of `keys` are already stored (one indexed IN query per chunk)."""
+    wanted = list({k for k in keys if k})
+    found: Set[str] = set()
+    for i in range(0, len(wanted), chunk_size):
+        chunk = wanted[i:i + chunk_size]
+        found.update(k for (k,) in db.query(Asset.external_key).filter(Asset.external_key.in_(chunk)))
+    return found
+
+
+_ASSET_COLUMNS = [c for c in Asset.__table__.columns if c.key != "id"]
+BULK_INSERT_MAX_PARAMS = 900  # per statement, under SQLite's default host-parameter limit
+
+
+def asset_row(asset: Asset) -> Dict[str, Any]:
+    """Column values of an unsaved Asset, for a Core insert."""
+    row = {c.key: getattr(asset, c.key) for c in _ASSET_COLUMNS}
+    row["status"] = row["status"] or "new"
+    row["created_at"] = row["created_at"] or utcnow()
+    return row
+
+
+class InsertedAsset(NamedTuple):
+    id: Optional[int]
+    source_id: Optional[int]
+    phash_int: Optional[int]
+
+
+def bulk_insert_assets(db: Session, assets: Sequence[Asset]) -> List[InsertedAsset]:
+    """Insert `assets` with multi-row INSERTs, skipping rows whose external_key
+    is already stored (ON CONFLICT DO NOTHING on Postgres and SQLite).
+
+    Returns the rows actually inserted. Does not commit.
+    """
+    rows = [asset_row(a) for a in assets]
+    if not rows:
+        return []
+    table = Asset.__table__
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    per_statement = max(1, BULK_INSERT_MAX_PARAMS // len(_ASSET_COLUMNS))
+    inserted: List[Any] = []
+    for i in range(0, len(rows), per_statement):
+        chunk = rows[i:i + per_statement]
+        if dialect is not None:
+            stmt = (
+                dialect.insert(table).values(chunk)
+                .on_conflict_do_nothing(index_elements=[table.c.external_key])
+                .returning(table.c.id, table.c.source_id, table.c.phash_int)
+            )
+            inserted.extend(InsertedAsset(*row) for row in db.execute(stmt))
+        else:
+            # Other backends: keys were filtered with existing_external_keys beforehand
+            db.execute(core_insert(table), chunk)
+            inserted.extend(InsertedAsset(None, row["source_id"], row["phash_int"]) for row in chunk)
+    return inserted
+
+
+def register_inserted(inserted: Sequence[InsertedAsset]):
+    """Add committed rows to the phash index: only hashes with an asset behind them."""
+    for row in inserted:
+        register_phash(row.phash_int, row.id)
+
+
 def extract_keywords(text: str) -> List[str]:
-    """Extract keywords from text using simple regex patterns."""
+    """Extract keywords from text (see app.services.text_analysis)."""
     if not text:
         return []
+    return analyze_text(text)["keywords"]
+
+
+def matches_filter(title: str, description: str, source: Source) -> bool:
+    """Check if content matches source filter criteria (keywords and categories)."""
+    return matcher_for(source).matches(title, description)
+
+
+def entry_thumbnail(entry) -> Optional[str]:
+    """Find a thumbnail URL in the various RSS fields."""
+    if entry.get('media_thumbnail'):
+        return entry['media_thumbnail'][0].get('url')
+    for enclosure in entry.get('enclosures') or []:
+        if 'image' in enclosure.get('type', ''):
+            return enclosure.get('href')
+    return None
+
+
+def select_new_entries(source: Source, entries: list, db: Session, seen: Optional[Set[str]] = None) -> list:
+    """Apply the source filters and drop entries already ingested (by canonical link).
+
+    `seen` collects the keys selected so far so the same link coming from two
+    feeds in one cycle is only inserted once.
+    """
+    seen = set() if seen is None else seen
+    candidates = []
+    for entry in entries:
+        title = entry.get("title", "")
+        description = entry.get("description", "") or entry.get("summary", "")
         
-    # Remove HTML tags and normalize
-    text = re.sub(r'<[^>]+>', '', text.lower())
-    
-    # Extract meaningful words (longer than 3 chars, not common words)
-    words = re.findall(r'\b[a-zA-Z]{4,}\b', text)
-    
-    # Filter out common stop words
-    stop_words = {'this', 'that', 'with', 'have', 'will', 'from', 'they', 'been', 
-                  'were', 'said', 'each', 'which', 'their', 'time', 'mais', 'pour', 
-                  'dans', 'avec', 'être', 'avoir', 'fait', 'tout', 'dire', 'plus'}
+        # Apply keyword/category filters
+        if not matches_filter(title, description, source):
+            logger.debug(f"Filtered out: {title}")
+            continue
+        
+        candidates.append(entry)
     
-    keywords = [w for w in words if w not in stop_words]
+    # Check if we already have these by link (one query for the whole feed)
+    existing = existing_external_keys(db, (url_key(e.get("link")) for e in candidates))
     
-    # Return top 10 most relevant keywords
-    return list(set(keywords))[:10]
+    fresh = []
+    for entry in candidates:
+        key = url_key(entry.get("link"))
+        if key:
+            if key in existing or key in seen:
+                continue
+            seen.add(key)
+        fresh.append(entry)
+    return fresh
 
 
-def matches_filter(title: str, description: str, source: Source) -> bool:
-    """Check if content matches source filter criteria."""
-    text = f"{title} {description}".lower()
+def entry_text(entry) -> str:
+    """Title + description of a feed entry, as analysed for keywords."""
+    title = entry.get("title", "")
+    description = entry.get("description", "") or entry.get("summary", "")
+    return f"{title} {description}"
+
+
+def build_rss_asset(source: Source, entry, thumbnail_url: Optional[str], phash: Optional[str], db: Session,
+                    analysis: Optional[Dict[str, Any]] = None) -> Optional[Asset]:
+    """Build an (unsaved) Asset for an RSS entry, or None if its thumbnail is a near-duplicate.
+
+    `analysis` is the entry's result from a batched analyze_texts call, if any.
+    """
+    title = entry.get("title", "")
+    description = entry.get("description", "") or entry.get("summary", "")
+    
+    # Check for duplicates using phash
+    if phash and is_duplicate_phash(phash, db):
+        logger.info(f"Skipping duplicate content: {title}")
+        return None
     
-    # Check keywords filter
-    if source.keywords:
-        keywords = [k.strip().lower() for k in source.keywords.split(',')]
-        if not any(keyword in text for keyword in keywords):
-            return False
+    # Extract keywords from content
+    keywords = (analysis or analyze_text(entry_text(entry)))["keywords"]
     
-    # Check categories filter (simple regex matching)
-    if source.categories:
-        categories = [c.strip().lower() for c in source.categories.split(',')]
-        if not any(category in text for category in categories):
-            return False
+    meta = {
+        "title": title,
+        "description": description,
+        "link": entry.get("link", ""),
+        "published": entry.get("published", ""),
+        "summary": entry.get("summary", ""),
+        "thumbnail": thumbnail_url
+    }
     
-    return True
+    return Asset(
+        source_id=source.id,
+        status="new",
+        meta_json=json.dumps(meta),
+        lang=source.language or "fr",
+        phash=phash,
+        phash_int=phash_to_int(phash),
+        keywords=",".join(keywords) if keywords else None,
+        external_key=url_key(entry.get("link"))
+    )
 
 
 def ingest_rss(source: Source, db: Session) -> int:
     """Ingest RSS feed with advanced filtering and deduplication."""
     try:
-        feed = feedparser.parse(source.url)
-        count = 0
+        from app.services.ingest_engine import ingest_sources_async
+        from app.utils.aio import run_sync
         
-        for entry in feed.entries[:20]:  # Process more entries for filtering
-            title = entry.get("title", "")
-            description = entry.get("description", "") or entry.get("summary", "")
-            
-            # Apply keyword/category filters
-            if not matches_filter(title, description, source):
-                logger.debug(f"Filtered out: {title}")
-                continue
-            
-            # Check if we already have this by link
-            existing = db.query(Asset).filter(
-                Asset.source_id == source.id,
-                Asset.meta_json.contains(f'"link":"{entry.link}"')
-            ).first()
-            
-            if existing:
-                continue
-            
-            # Calculate phash for thumbnail if available
-            phash = None
-            thumbnail_url = None
-            
-            # Try to find thumbnail in various RSS fields
-            if hasattr(entry, 'media_thumbnail') and entry.media_thumbnail:
-                thumbnail_url = entry.media_thumbnail[0]['url']
-            elif hasattr(entry, 'enclosures') and entry.enclosures:
-                for enclosure in entry.enclosures:
-                    if 'image' in enclosure.get('type', ''):
-                        thumbnail_url = enclosure.get('href')
-                        break
-            
-            if thumbnail_url:
-                phash = calculate_phash(thumbnail_url)
-                
-                # Check for duplicates using phash
-                if phash and is_duplicate_phash(phash, db):
-                    logger.info(f"Skipping duplicate content: {title}")
-                    continue
-            
-            # Extract keywords from content
-            keywords = extract_keywords(f"{title} {description}")
-            
-            # Create asset
-            meta = {
-                "title": title,
-                "description": description,
-                "link": entry.get("link", ""),
-                "published": entry.get("published", ""),
-                "summary": entry.get("summary", ""),
-                "thumbnail": thumbnail_url
-            }
-            
-            asset = Asset(
-                source_id=source.id,
-                status="new",
-                meta_json=json.dumps(meta),
-                lang=source.language or "fr",
-                phash=phash,
-                keywords=",".join(keywords) if keywords else None
-            )
-            
-            db.add(asset)
-            count += 1
-            
-        db.commit()
-        logger.info(f"Ingested {count} new assets from RSS source {source.id}")
-        return count
+        report = run_sync(ingest_sources_async(db, [source]))
+        return report["ingested"]
         
     except Exception as e:
         logger.error(f"Error ingesting RSS {source.url}: {e}")
         db.rollback()
+        phash_index.invalidate()
         return 0
 
 
+def ingest_source(source: Source, db: Session) -> int:
+    """Ingest a single source, dispatching on its kind."""
+    if source.kind == "rss":
+        return ingest_rss(source, db)
+    elif source.kind == "youtube_cc":
+        return ingest_youtube_cc(source, db)
+    elif source.kind == "stock":
+        return ingest_stock(source, db)
+    elif source.kind.startswith("serp_"):
+        return ingest_dispatch_serp(db, source)
+    
+    logger.warning(f"Unknown source kind: {source.kind}")
+    return 0
+
+
 def ingest_youtube_cc(source: Source, db: Session) -> int:
     """Ingest YouTube closed captions (mock implementation)."""
     try:
@@ -199,32 +259,32 @@ def ingest_youtube_cc(source: Source, db: Session) -> int:
                 }
             ]
             
-            count = 0
-            for video in mock_videos:
+            new_assets = []
+            existing = existing_external_keys(db, (video_key(v["video_id"]) for v in mock_videos))
+            analyses = analyze_texts([f"{v['title']} {v['description']}" for v in mock_videos])
+            for video, analysis in zip(mock_videos, analyses):
                 # Check if already exists
-                existing = db.query(Asset).filter(
-                    Asset.source_id == source.id,
-                    Asset.meta_json.contains(f'"video_id":"{video["video_id"]}"')
-                ).first()
-                
-                if existing:
+                key = video_key(video["video_id"])
+                if key in existing:
                     continue
+                existing.add(key)
                 
-                keywords = extract_keywords(f"{video['title']} {video['description']}")
+                keywords = analysis["keywords"]
                 
-                asset = Asset(
+                new_assets.append(Asset(
                     source_id=source.id,
                     status="new",
                     meta_json=json.dumps(video),
                     lang=source.language or "fr",
                     duration=video["duration"],
-                    keywords=",".join(keywords) if keywords else None
-                )
-                
-                db.add(asset)
-                count += 1
+                    keywords=",".join(keywords) if keywords else None,
+                    external_key=key
+                ))
             
+            inserted = bulk_insert_assets(db, new_assets)
             db.commit()
+            assets_committed([row.id for row in inserted])
+            count = len(inserted)
             logger.info(f"Created {count} mock YouTube assets")
             return count
         
@@ -244,42 +304,44 @@ def ingest_stock(source: Source, db: Session) -> int:
     return 0
 
 
-def ingest_watch() -> int:
-    """Continuous ingestion monitoring - scan all active sources."""
+def ingest_watch() -> Dict[str, Any]:
+    """Continuous ingestion monitoring - scan the sources that are due, concurrently.
+    
+    Returns the engine report: total ingested plus per-source timings and
+    the next poll time of each source.
+    """
     from app.db import SessionLocal
+    from app.services.ingest_engine import ingest_sources_async
+    from app.services.poll_schedule import due_sources, record_poll
+    from app.utils.aio import run_sync
     
     db = SessionLocal()
-    total_ingested = 0
     
     try:
-        # Get all enabled sources
-        sources = db.query(Source).filter(Source.enabled == True).all()
+        # Only sources whose adaptive poll interval has elapsed; the next poll
+        # is scheduled from the cycle start, not from when the fetches finished
+        cycle_start = utcnow()
+        sources = due_sources(db, now=cycle_start)
+        report = run_sync(ingest_sources_async(db, sources))
         
-        for source in sources:
-            try:
-                if source.kind == "rss":
-                    count = ingest_rss(source, db)
-                elif source.kind == "youtube_cc":
-                    count = ingest_youtube_cc(source, db)
-                elif source.kind == "stock":
-                    count = ingest_stock(source, db)
-                elif source.kind.startswith("serp_"):
-                    count = ingest_dispatch_serp(db, source)
-                else:
-                    logger.warning(f"Unknown source kind: {source.kind}")
-                    continue
-                    
-                total_ingested += count
-                
-            except Exception as e:
-                logger.error(f"Error processing source {source.id}: {e}")
-                continue
+        by_id = {s.id: s for s in sources}
+        for entry in report["sources"]:
+            entry.update(record_poll(by_id[entry["source_id"]], entry["ingested"], entry.get("error"),
+                                     now=cycle_start))
+        report["polled"] = len(sources)
+        report["disabled"] = sum(1 for e in report["sources"] if e["disabled"])
+        try:
+            db.commit()
+        except Exception as e:
+            logger.error(f"Could not save poll schedule: {e}")
+            db.rollback()
     
     finally:
         db.close()
     
-    logger.info(f"Ingestion watch completed: {total_ingested} total assets")
-    return total_ingested
+    logger.info(f"Ingestion watch completed: {report['ingested']} total assets from "
+                f"{report['polled']} due sources in {report['elapsed_ms']:.0f}ms")
+    return report
 
 
 # SerpAPI Integration for content discovery and trends monitoring
@@ -306,7 +368,11 @@ def ingest_serp_youtube(db: Session, src: Source, limit: int = 10) -> int:
             return 0
         
         items = serp.youtube_search(q, max_results=limit)
-        created = 0
+        new_assets = []
+        batch_phashes = PhashIndex(max_distance=settings.PHASH_DUP_THRESHOLD)  # near-duplicates within this batch
+        existing = existing_external_keys(
+            db, (video_key(it.get("video_id") or it.get("id")) for it in items)
+        )
         
         for it in items:
             vid = it.get("video_id") or it.get("id")
@@ -321,13 +387,17 @@ def ingest_serp_youtube(db: Session, src: Source, limit: int = 10) -> int:
             else:
                 thumb_url = it.get("thumbnail")
             
-            # Calculate perceptual hash for deduplication
-            p = phash_from_url(thumb_url) if thumb_url else None
-
             # Check for duplicates using video ID
             video_url = f"https://www.youtube.com/watch?v={vid}"
-            exists = db.query(Asset).filter(Asset.meta_json.contains(vid)).first()
-            if exists:
+            key = video_key(vid)
+            if key in existing:
+                continue
+            existing.add(key)
+
+            # Calculate perceptual hash for deduplication
+            p = phash_from_url(thumb_url) if thumb_url else None
+            if p and (is_duplicate_phash(p, db) or batch_phashes.find(p)):
+                logger.info(f"Skipping near-duplicate thumbnail for video {vid}")
                 continue
 
             # Create asset metadata
@@ -352,20 +422,28 @@ def ingest_serp_youtube(db: Session, src: Source, limit: int = 10) -> int:
                 meta_json=json.dumps(meta), 
                 s3_key=None, 
                 duration=None, 
-                lang="fr"
+                lang="fr",
+                external_key=key
             )
             if p:
                 a.phash = p
+                a.phash_int = phash_to_int(p)
             
-            db.add(a)
-            created += 1
+            new_assets.append(a)
+            batch_phashes.add(p)
         
+        inserted = bulk_insert_assets(db, new_assets)
         db.commit()
+        register_inserted(inserted)
+        assets_committed([row.id for row in inserted])
+        created = len(inserted)
         logger.info(f"SerpAPI YouTube ingestion: {created} assets created for query '{q}'")
         return created
         
     except Exception as e:
         logger.error(f"Error in SerpAPI YouTube ingestion: {e}")
+        db.rollback()
+        phash_index.invalidate()
         return 0
 
 
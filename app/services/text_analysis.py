@@ -0,0 +1,88 @@
+"""Batched text analysis: keywords, language and word counts in one pass.
+
+Each text is tokenized once; term frequencies come from a ``Counter`` per
+document and document frequencies from one ``Counter`` across the batch, so
+keywords are ranked by tf-idf within the batch (words every item of a feed
+shares, like the site name, sink to the bottom). Tech terms are always kept
+first. Ingest analyses a whole feed batch at once, transform a batch of assets.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+")
+_URL_RE = re.compile(r"http[s]?://")
+_DIGIT_RE = re.compile(r"\d")
+
+STOP_WORDS = {
+    'this', 'that', 'with', 'have', 'will', 'from', 'they', 'been',
+    'were', 'said', 'each', 'which', 'their', 'time', 'mais', 'pour',
+    'dans', 'avec', 'être', 'avoir', 'fait', 'tout', 'dire', 'plus',
+}
+
+TECH_KEYWORDS = {
+    'tech', 'innovation', 'startup', 'digital', 'intelligence', 'artificielle',
+    'machine', 'learning', 'blockchain', 'crypto', 'fintech', 'saas', 'api',
+}
+
+FRENCH_INDICATORS = {
+    'le', 'la', 'les', 'de', 'du', 'des', 'et', 'ou', 'est', 'sont',
+    'avec', 'pour', 'dans', 'sur', 'par', 'cette', 'ces', 'nous', 'vous',
+}
+ENGLISH_INDICATORS = {
+    'the', 'and', 'or', 'is', 'are', 'with', 'for', 'in', 'on', 'by',
+    'this', 'these', 'we', 'you', 'that', 'have', 'has', 'will',
+}
+
+MIN_KEYWORD_LEN = 4
+MAX_KEYWORDS = 10
+
+
+def _is_candidate(token: str) -> bool:
+    return (
+        token in TECH_KEYWORDS
+        or (len(token) >= MIN_KEYWORD_LEN and token.isalpha() and token not in STOP_WORDS)
+    )
+
+
+def analyze_texts(texts: List[str], max_keywords: int = MAX_KEYWORDS) -> List[Dict[str, Any]]:
+    """Analyze a batch of texts; one dict per text, in order.
+
+    Each dict has ``keywords`` (best first), ``language`` ('fr' or 'en'),
+    ``word_count``, ``has_numbers`` and ``has_urls``.
+    """
+    docs = []
+    df: Counter = Counter()
+    for text in texts:
+        raw = (text or "").lower()
+        tokens = _TOKEN_RE.findall(_TAG_RE.sub(" ", raw))
+        tf = Counter(t for t in tokens if _is_candidate(t))
+        df.update(tf.keys())
+        docs.append((raw, tokens, tf))
+
+    n_docs = len(docs)
+    results = []
+    for raw, tokens, tf in docs:
+        def score(term: str) -> tuple:
+            idf = math.log((1 + n_docs) / (1 + df[term])) + 1
+            # ties: longer (more specific) words first, then alphabetical for stable output
+            return (term not in TECH_KEYWORDS, -tf[term] * idf, -len(term), term)
+
+        french = sum(1 for t in tokens if t in FRENCH_INDICATORS)
+        english = sum(1 for t in tokens if t in ENGLISH_INDICATORS)
+        results.append({
+            "keywords": sorted(tf, key=score)[:max_keywords],
+            "language": "fr" if french >= english else "en",
+            "word_count": len(tokens),
+            "has_numbers": bool(_DIGIT_RE.search(raw)),
+            "has_urls": bool(_URL_RE.search(raw)),
+        })
+    return results
+
+
+def analyze_text(text: str, max_keywords: int = MAX_KEYWORDS) -> Dict[str, Any]:
+    """Single-text convenience wrapper around analyze_texts."""
+    return analyze_texts([text], max_keywords)[0]
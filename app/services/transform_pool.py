@@ -0,0 +1,255 @@
+"""Parallel transform executor.
+
+``job_transform`` claims up to ``TRANSFORM_BATCH_SIZE`` new assets and runs
+their FFmpeg transforms on ``TRANSFORM_WORKERS`` threads (FFmpeg runs as a
+subprocess, so threads are enough to keep N encodes busy). Each worker uses
+its own session.
+
+Assets are claimed with a status transition ``new -> transforming``: on
+Postgres the candidates are selected ``FOR UPDATE SKIP LOCKED``, and on
+every backend the ``UPDATE ... WHERE status = 'new' RETURNING id`` only
+hands each row to the one worker whose update matched it, so concurrent
+schedulers / processes never transform the same asset twice.
+
+A claim is a lease: ``claimed_at`` is refreshed every third of
+``JOB_LEASE_SECONDS`` while the batch runs, and ``release_stale_claims``
+(run by the watchdog) puts assets whose claim was not refreshed for a whole
+lease back to ``new``, so a worker that died mid-batch loses nothing.
+
+Each transformed asset hands its posts to the publish stage (see
+app.services.pipeline_events). Progress (claimed, done, failed, per-asset outcome) is written to the
+``transform_batch`` Job row of the run as each asset finishes. The row is
+leased and heartbeated like queue jobs (app.services.job_queue); the final payload adds the
+mean encode fps, total output bytes, the encoding profiles used and their
+mean fps (``profile_fps``, read back by app.services.encoding_profiles).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Asset, Job
+from app.services import job_queue
+from app.services.encoding_profiles import EncodingProfile, select_profile
+from app.services.pipeline_events import posts_created
+from app.utils.datetime import utcnow
+from app.utils.logger import logger
+
+
+def transform_workers() -> int:
+    """Configured worker count; 0 = half the CPUs (each FFmpeg encode is itself multi-threaded)."""
+    if settings.TRANSFORM_WORKERS > 0:
+        return settings.TRANSFORM_WORKERS
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def claim_assets(db: Session, limit: int, asset_ids: Optional[List[int]] = None) -> List[int]:
+    """Atomically move up to `limit` new assets (of `asset_ids` if given) to 'transforming'; returns their ids."""
+    query = db.query(Asset.id).filter(Asset.status == "new")
+    if asset_ids is not None:
+        query = query.filter(Asset.id.in_(asset_ids))
+    candidates = (
+        query
+        .order_by(Asset.created_at.desc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)  # Postgres; ignored by SQLite
+    )
+    ids = [asset_id for (asset_id,) in candidates]
+    if not ids:
+        db.commit()
+        return []
+    claimed = db.execute(
+        update(Asset)
+        .where(Asset.id.in_(ids), Asset.status == "new")
+        .values(status="transforming", claimed_at=utcnow())
+        .returning(Asset.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    return list(claimed)
+
+
+def renew_claims(db: Session, asset_ids: List[int]) -> int:
+    """Refresh the claims of `asset_ids` still being transformed."""
+    renewed = db.execute(
+        update(Asset)
+        .where(Asset.id.in_(asset_ids), Asset.status == "transforming")
+        .values(claimed_at=utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return renewed
+
+
+def release_stale_claims(db: Session, lease_seconds: Optional[int] = None) -> List[int]:
+    """Put 'transforming' assets whose claim was not renewed for a lease back to 'new'."""
+    cutoff = utcnow() - timedelta(seconds=lease_seconds or settings.JOB_LEASE_SECONDS)
+    released = db.execute(
+        update(Asset)
+        .where(Asset.status == "transforming", or_(Asset.claimed_at == None, Asset.claimed_at < cutoff))  # noqa: E711
+        .values(status="new", claimed_at=None)
+        .returning(Asset.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    if released:
+        logger.warning(f"Released {len(released)} stale transform claims: {released}")
+    return list(released)
+
+
+def _heartbeat(job_id: int, worker: str, asset_ids: List[int], done: threading.Event):
+    """Extend the batch Job's lease and its assets' claims until `done`."""
+    db = SessionLocal()
+    try:
+        while not done.wait(max(1.0, settings.JOB_LEASE_SECONDS / 3)):
+            try:
+                job_queue.heartbeat(db, job_id, worker)
+                renew_claims(db, asset_ids)
+            except Exception as e:
+                logger.warning(f"Transform batch heartbeat failed: {e}")
+                db.rollback()
+    finally:
+        db.close()
+
+
+def _transform_one(asset_id: int, analysis: Optional[Dict[str, Any]],
+                   profile: Optional[EncodingProfile] = None) -> Tuple[str, Dict[str, Any]]:
+    """Transform one claimed asset on its own session; returns its final status and encode stats."""
+    from app.services.assets import transform_asset
+    from app.services.scheduler import create_posts_for_asset
+
+    db = SessionLocal()
+    try:
+        asset = db.get(Asset, asset_id)
+        if asset is None:
+            return "missing", {}
+        logger.info(f"Transforming asset {asset_id}")
+        if not transform_asset(asset, db, analysis, profile):
+            logger.warning(f"Failed to transform asset {asset_id}")
+            return "failed", {}
+        # Mark as transformed and create posts for publishing
+        asset.status = "transformed"
+        db.commit()
+        posts = create_posts_for_asset(asset, db)
+        logger.info(f"Successfully transformed asset {asset_id} and created posts")
+        posts_created([p.id for p in posts])
+        return "transformed", json.loads(asset.meta_json or "{}").get("encode", {})
+    except Exception as e:
+        logger.error(f"Error transforming asset {asset_id}: {e}")
+        db.rollback()
+        asset = db.get(Asset, asset_id)
+        if asset is not None:
+            asset.status = "failed"
+            db.commit()
+        return "failed", {}
+    finally:
+        db.close()
+
+
+def _save_progress(db: Session, job: Job, progress: Dict[str, Any], status: Optional[str] = None):
+    job.payload = {**progress, "assets": dict(progress["assets"])}  # new objects so the JSON column is flagged dirty
+    if status:
+        job.status = status
+        job.completed_at = utcnow()
+        job.locked_by = None
+        job.lease_expires_at = None
+    try:
+        db.commit()
+    except Exception as e:
+        logger.warning(f"Could not save transform progress for job {job.id}: {e}")
+        db.rollback()
+
+
+def _run_pool(db: Session, job: Job, progress: Dict[str, Any], claimed: List[int],
+              analyses: Dict[int, Any], backlog: int, workers: int) -> List[Dict[str, Any]]:
+    """Transform the claimed assets on the thread pool, saving progress as each finishes."""
+    with ThreadPoolExecutor(max_workers=min(workers, len(claimed)), thread_name_prefix="transform") as pool:
+        futures = {}
+        for i in claimed:
+            # Ladder rung from the backlog left behind this asset, plus deadline pressure
+            profile = select_profile(backlog, workers, (analyses.get(i) or {}).get("duration"),
+                                     settings.TRANSFORM_DEADLINE_S or None)
+            futures[pool.submit(_transform_one, i, analyses.get(i), profile)] = i
+            backlog = max(0, backlog - 1)
+        encodes = []
+        for future in as_completed(futures):
+            status, encode = future.result()
+            progress["done"] += 1
+            progress["transformed" if status == "transformed" else "failed"] += 1
+            progress["assets"][str(futures[future])] = status
+            if encode:
+                encodes.append(encode)
+            _save_progress(db, job, progress)
+    return encodes
+
+
+def run_transform_batch(limit: Optional[int] = None, asset_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Claim and transform a batch of new assets (those of `asset_ids` if given) in parallel."""
+    from app.services.assets import analyze_assets
+
+    started = time.perf_counter()
+    workers = transform_workers()
+    limit = limit or (len(asset_ids) if asset_ids else settings.TRANSFORM_BATCH_SIZE or workers * 2)
+
+    db = SessionLocal()
+    try:
+        backlog = db.query(Asset).filter(Asset.status == "new").count()
+        claimed = claim_assets(db, limit, asset_ids)
+        if not claimed:
+            return {"claimed": 0, "transformed": 0, "failed": 0, "workers": workers, "job_id": None,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "encode_fps": None, "output_bytes": 0, "profiles": {}}
+
+        # Keywords / language for the whole batch in one pass
+        assets = db.query(Asset).filter(Asset.id.in_(claimed)).all()
+        analyses = dict(zip((a.id for a in assets), analyze_assets(assets)))
+        db.expunge_all()
+
+        progress: Dict[str, Any] = {"claimed": len(claimed), "done": 0, "transformed": 0, "failed": 0,
+                                    "workers": workers, "assets": {str(i): "transforming" for i in claimed}}
+        worker = job_queue.worker_name()
+        job = Job(kind="transform_batch", status="running", payload=progress, attempts=1, started_at=utcnow(),
+                  locked_by=worker, lease_expires_at=utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+        db.add(job)
+        db.commit()
+
+        done = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(job.id, worker, claimed, done), daemon=True)
+        beat.start()
+        try:
+            encodes = _run_pool(db, job, progress, claimed, analyses, backlog, workers)
+        except Exception as e:
+            progress["error"] = str(e)
+            _save_progress(db, job, progress, "failed")
+            raise
+        finally:
+            done.set()
+            beat.join()
+
+        fps = [e["fps"] for e in encodes if e.get("fps")]
+        progress["encode_fps"] = round(sum(fps) / len(fps), 1) if fps else None
+        progress["output_bytes"] = sum(e.get("output_bytes") or 0 for e in encodes)
+        progress["profiles"] = dict(Counter(e["profile"] for e in encodes if e.get("profile")))
+        by_profile: Dict[str, List[float]] = {}
+        for e in encodes:
+            if e.get("fps") and e.get("profile") not in (None, "copy", "demo"):  # ladder profiles only
+                by_profile.setdefault(e["profile"], []).append(e["fps"])
+        progress["profile_fps"] = {p: round(sum(v) / len(v), 1) for p, v in by_profile.items()}
+        progress["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _save_progress(db, job, progress, "completed")
+        return {"claimed": len(claimed), "transformed": progress["transformed"], "failed": progress["failed"],
+                "workers": workers, "job_id": job.id, "elapsed_ms": progress["elapsed_ms"],
+                "encode_fps": progress["encode_fps"], "output_bytes": progress["output_bytes"],
+                "profiles": progress["profiles"]}
+    finally:
+        db.close()
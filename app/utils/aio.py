@@ -0,0 +1,19 @@
+"""Helpers to drive asyncio code from the synchronous job functions."""
+
+import asyncio
+from typing import Any, Coroutine
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """Run a coroutine to completion from sync code (job functions in worker threads).
+
+    Never call it from a running event loop: it would block that loop for the
+    whole run. Async callers await the coroutine itself, or run the job
+    function in a thread (asyncio.to_thread / run_in_threadpool).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("run_sync() called from a running event loop; await the coroutine or use asyncio.to_thread")
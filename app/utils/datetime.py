@@ -7,6 +7,11 @@ def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def as_utc(dt: datetime) -> datetime:
+    """`dt` as an aware UTC datetime (naive columns read back without a tzinfo)."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
 def iso_utc(dt: datetime | None = None) -> str:
     """ISO 8601 toujours en UTC."""
     return (dt or utcnow()).isoformat()
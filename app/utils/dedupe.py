@@ -1,7 +1,9 @@
 """Image deduplication utilities using perceptual hashing."""
 
+import hashlib
 import io
-from typing import Optional
+from typing import Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 try:
     import httpx
@@ -11,28 +13,125 @@ try:
 except ImportError:
     DEDUPE_AVAILABLE = False
 
+# 64-bit phash values (imagehash.phash default hash_size=8)
+PHASH_BITS = 64
+MASK64 = (1 << PHASH_BITS) - 1
+_SIGN_BIT = 1 << (PHASH_BITS - 1)
+# JPEGs are decoded at the smallest DCT scale that keeps both sides >= this.
+# phash itself only needs 32x32, but decoding much below 256px shifts hashes
+# of noisy images by several bits against full-resolution decodes already stored.
+PHASH_DECODE_SIZE = 256
+
+# Query parameters that never change what a link points to
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "igshid", "mc_cid", "mc_eid", "ref_src"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
 
 def phash_from_url(url: str) -> Optional[str]:
-    """Generate perceptual hash from image URL."""
+    """Generate perceptual hash from image URL (shared phash cache)."""
     if not DEDUPE_AVAILABLE or not url:
         return None
-    
+
     try:
-        with httpx.Client(timeout=10) as client:
-            r = client.get(url)
-            r.raise_for_status()
-            img = Image.open(io.BytesIO(r.content)).convert("RGB")
-            return str(imagehash.phash(img))
+        from app.services.phash_cache import phash_for_url
+        return phash_for_url(url)
     except Exception:
         return None
 
 
-def hamming(a: str, b: str) -> int:
-    """Calculate Hamming distance between two hashes."""
-    if not a or not b or not DEDUPE_AVAILABLE:
-        return 999
-    
+def phash_from_bytes(data: bytes) -> str:
+    """Calculate perceptual hash of raw image bytes.
+
+    JPEGs use PIL's draft() mode so the decoder scales down by 1/2..1/8 in the
+    DCT instead of producing a full-resolution bitmap that phash throws away.
+    The colour mode is kept so the greyscale conversion matches a full decode.
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (PHASH_DECODE_SIZE, PHASH_DECODE_SIZE))
+    return str(imagehash.phash(image))
+
+
+def safe_phash_from_bytes(data: bytes) -> Optional[str]:
+    """phash_from_bytes that returns None for undecodable images (pool worker entry point)."""
     try:
-        return imagehash.hex_to_hash(a) - imagehash.hex_to_hash(b)
+        return phash_from_bytes(data)
     except Exception:
-        return 999
\ No newline at end of file
+        return None
+
+
+def phash_to_int(phash: Optional[str]) -> Optional[int]:
+    """Convert a hex phash to the signed 64-bit integer stored in Asset.phash_int.
+
+    Signed so it fits a Postgres BIGINT; returns None for empty or non 64-bit hashes.
+    """
+    if not phash or len(phash) * 4 != PHASH_BITS:
+        return None
+    try:
+        value = int(phash, 16)
+    except ValueError:
+        return None
+    return value - (1 << PHASH_BITS) if value & _SIGN_BIT else value
+
+
+def phash_as_uint64(value: Union[str, int, None]) -> Optional[int]:
+    """Normalize a hex phash or a (signed) integer phash to an unsigned 64-bit int."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value & MASK64
+    signed = phash_to_int(value)
+    return None if signed is None else signed & MASK64
+
+
+def hamming(a: Union[str, int, None], b: Union[str, int, None]) -> int:
+    """Calculate Hamming distance between two hashes (hex strings or phash_int values)."""
+    ia, ib = phash_as_uint64(a), phash_as_uint64(b)
+    if ia is None or ib is None:
+        return 999
+    return (ia ^ ib).bit_count()
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a link so trivially different URLs for one item compare equal.
+
+    Lowercases scheme/host, drops default ports, fragments and tracking
+    parameters (utm_*, fbclid, ...), sorts the query and trims a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def external_key(identifier: str) -> str:
+    """Fixed-width key stored in Asset.external_key (sha1 of the normalized identifier)."""
+    return hashlib.sha1(identifier.encode("utf-8")).hexdigest()
+
+
+def url_key(url: Optional[str]) -> Optional[str]:
+    """External key for a web link (RSS entries)."""
+    if not url or not url.strip():
+        return None
+    return external_key(canonical_url(url))
+
+
+def video_key(video_id: Optional[str], platform: str = "youtube") -> Optional[str]:
+    """External key for a platform video, e.g. youtube:<video_id>."""
+    if not video_id:
+        return None
+    return external_key(f"{platform}:{video_id}")
+
+
+def asset_external_key(meta: dict) -> Optional[str]:
+    """Derive the external key from an asset's metadata (video id first, then link/url)."""
+    if not isinstance(meta, dict):
+        return None
+    return video_key(meta.get("video_id")) or url_key(meta.get("link") or meta.get("url"))
@@ -3,6 +3,7 @@ import os
 import tempfile
 from typing import Dict, Any
 from app.utils.logger import logger
+from utils.ffmpeg import make_vertical
 
 
 def make_shorts(input_path: str, plan: Dict[str, Any] = None) -> str:
@@ -41,21 +42,13 @@ def make_shorts(input_path: str, plan: Dict[str, Any] = None) -> str:
                 output_path
             ]
         else:
-            # Process actual video
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", input_path,
-                "-ss", str(start_time),
-                "-t", str(duration),
-                "-vf", f"scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,drawtext=text='{hook_text}':fontsize=48:fontcolor=white:x=(w-text_w)/2:y=50:box=1:boxcolor=black@0.5,drawtext=text='{attribution}':fontsize=24:fontcolor=white:x=10:y=h-50:box=1:boxcolor=black@0.7",
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-r", "30",
-                "-preset", "fast",
-                "-crf", "23",
-                "-movflags", "+faststart",
-                output_path
-            ]
+            # Process actual video: same single-pass graph as the transform job
+            if make_vertical(input_path, {
+                "segments": [{"start": start_time, "end": start_time + duration}],
+                "overlays": {"hook_text": hook_text, "attribution": attribution},
+            }, output_path, timeout=60):
+                return output_path
+            return create_test_video(output_path)
         
         logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
@@ -1,11 +1,12 @@
 """Job management with idempotency, retry, and DLQ support."""
 
+import functools
 import hashlib
 import json
+import random
 from contextlib import contextmanager
 from datetime import timedelta
 from typing import Any, Dict, Callable, Optional
-from filelock import FileLock
 from tenacity import retry, stop_after_attempt, wait_exponential
 from sqlalchemy.orm import Session
 
@@ -91,12 +92,48 @@ def dead_letter(db: Session, job: Job):
     logger.warning(f"Job {job.id} moved to DLQ: {job.dlq_reason}")
     increment_job_metric(job.kind, "dlq")
 
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Seconds before retry number `attempt` (1-based): exponential backoff with full jitter.
+
+    Drawn uniformly in [0, min(cap, base * 2**(attempt-1))], so failures that
+    happened together (a platform outage) do not retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** max(0, attempt - 1)))
+
 def with_file_lock(lock_key: str):
-    """Decorator for file-based locking."""
+    """Decorator holding the distributed lock `lock_key` (app.utils.locks) during the call.
+
+    Waits up to 5 minutes for it, then raises TimeoutError.
+    """
     def decorator(func: Callable):
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            lock_file = f"/tmp/contentflow_{lock_key}.lock"
-            with FileLock(lock_file, timeout=300):  # 5 min timeout
+            from app.utils.locks import distributed_lock
+            with distributed_lock(lock_key, wait=300) as lock:
+                if lock is None:
+                    raise TimeoutError(f"Lock {lock_key} still held after 300s")
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def locked_job(kind: str, sweep_only: bool = False):
+    """Decorator running a pipeline job under the lock ``job:<kind>``.
+
+    Only one replica runs it at a time; the others skip the run. With
+    `sweep_only`, calls given targets (asset_ids / post_ids: rows claimed
+    atomically) run unlocked, only the periodic sweep is exclusive.
+    """
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if sweep_only and (any(args) or any(kwargs.values())):
+                return func(*args, **kwargs)
+            from app.utils.locks import distributed_lock
+            with distributed_lock(f"job:{kind}") as lock:
+                if lock is None:
+                    logger.info(f"Job {kind} already running on another worker, skipped")
+                    return {"success": True, "skipped": True, "message": f"{kind} already running elsewhere"}
+                logger.info(f"Job {kind} holds lock job:{kind} (token {lock.token})")
                 return func(*args, **kwargs)
         return wrapper
     return decorator
@@ -0,0 +1,304 @@
+"""Distributed locks shared by every app replica and worker.
+
+Backends (``LOCK_BACKEND``, "auto" picks the first that applies):
+
+- ``postgres``: session advisory locks (``pg_try_advisory_lock``) on a
+  connection held for the lock's lifetime. A holder that dies drops its
+  connection, and Postgres releases the lock with it;
+- ``redis``: ``SET key value NX PX ttl``. The lease expires after
+  ``LOCK_TTL_S`` unless its holder renews it (``distributed_lock`` and
+  ``acquire_lock(renew=True)`` renew it from a thread every third of the
+  TTL), so a crashed holder frees it;
+- ``file``: ``filelock`` files under ``LOCK_DIR``, released by the OS when
+  the holder exits. Only processes on one host share them.
+
+Every acquisition gets a fencing token that increases with each grant of any
+lock. A holder that may have lost its lease (a long pause past a Redis TTL)
+stamps its token on the row it works on with ``fence_row`` and checks it with
+``holds_fence`` before writing: a newer holder has stamped a higher token, so
+the older one's writes are refused (job_publish does this per post).
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from filelock import FileLock, Timeout
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.utils.logger import logger
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+WAIT_POLL_SEC = 0.5
+
+
+@dataclass
+class Lock:
+    """A granted lock: `token` is its fencing token."""
+
+    key: str
+    token: int
+    owner: str
+    ttl: float
+    backend: Any = field(repr=False)
+    handle: Any = field(default=None, repr=False)
+    renewal: Optional[threading.Event] = field(default=None, repr=False)  # set to stop renewing
+
+    def still_held(self) -> bool:
+        return self.backend.still_held(self)
+
+
+def _owner() -> str:
+    from app.services.job_queue import worker_name
+    return f"{worker_name()}:{threading.get_ident()}"
+
+
+class PostgresLockBackend:
+    """Session advisory locks; fencing tokens from the ``cf_lock_fencing`` sequence."""
+
+    name = "postgres"
+    renews = False
+
+    def __init__(self, engine):
+        self.engine = engine
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE SEQUENCE IF NOT EXISTS cf_lock_fencing")
+
+    @staticmethod
+    def lock_id(key: str) -> int:
+        """Signed 64-bit advisory lock id of `key`."""
+        return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big", signed=True)
+
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[Lock]:
+        conn = self.engine.connect()
+        try:
+            got = conn.exec_driver_sql("SELECT pg_try_advisory_lock(%s)" % self.lock_id(key)).scalar()
+            if not got:
+                conn.rollback()
+                conn.close()
+                return None
+            token = conn.exec_driver_sql("SELECT nextval('cf_lock_fencing')").scalar()
+            conn.commit()  # session-level lock: outlives the transaction
+        except Exception:
+            conn.close()
+            raise
+        return Lock(key, int(token), owner, ttl, self, conn)
+
+    def renew(self, lock: Lock) -> bool:
+        return self.still_held(lock)
+
+    def still_held(self, lock: Lock) -> bool:
+        try:
+            lock.handle.exec_driver_sql("SELECT 1")
+            lock.handle.commit()
+            return True
+        except Exception:
+            return False
+
+    def release(self, lock: Lock):
+        conn = lock.handle
+        try:
+            conn.exec_driver_sql("SELECT pg_advisory_unlock(%s)" % self.lock_id(lock.key))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class RedisLockBackend:
+    """Leased keys in Redis; fencing tokens from one INCR counter."""
+
+    name = "redis"
+    renews = True
+    prefix = "cf:lock:"
+
+    # Only the holder (same value) may extend or delete its lease
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str):
+        self._redis = redis.Redis.from_url(url)
+        self._renew = self._redis.register_script(self._RENEW)
+        self._release = self._redis.register_script(self._RELEASE)
+
+    @staticmethod
+    def _value(lock: Lock) -> str:
+        return lock.handle
+
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[Lock]:
+        value = f"{owner}:{uuid.uuid4().hex}"
+        if not self._redis.set(self.prefix + key, value, nx=True, px=int(ttl * 1000)):
+            return None
+        # Only granted locks draw a token
+        token = int(self._redis.incr(self.prefix + "fencing"))
+        return Lock(key, token, owner, ttl, self, value)
+
+    def renew(self, lock: Lock) -> bool:
+        return bool(self._renew(keys=[self.prefix + lock.key], args=[self._value(lock), int(lock.ttl * 1000)]))
+
+    def still_held(self, lock: Lock) -> bool:
+        return self._redis.get(self.prefix + lock.key) == self._value(lock).encode()
+
+    def release(self, lock: Lock):
+        self._release(keys=[self.prefix + lock.key], args=[self._value(lock)])
+
+
+class FileLockBackend:
+    """Lock files on one host; fencing tokens from a counter file."""
+
+    name = "file"
+    renews = False
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._counter = os.path.join(directory, "fencing")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:32] + ".lock")
+
+    def _next_token(self) -> int:
+        with FileLock(self._counter + ".lock"):
+            try:
+                with open(self._counter) as f:
+                    token = int(f.read().strip() or 0) + 1
+            except FileNotFoundError:
+                token = 1
+            with open(self._counter, "w") as f:
+                f.write(str(token))
+        return token
+
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[Lock]:
+        file_lock = FileLock(self._path(key))
+        try:
+            file_lock.acquire(timeout=0)
+        except Timeout:
+            return None
+        return Lock(key, self._next_token(), owner, ttl, self, file_lock)
+
+    def renew(self, lock: Lock) -> bool:
+        return lock.handle.is_locked
+
+    def still_held(self, lock: Lock) -> bool:
+        return lock.handle.is_locked
+
+    def release(self, lock: Lock):
+        lock.handle.release()
+
+
+def make_lock_backend():
+    """Backend for LOCK_BACKEND; "auto": Postgres database, else Redis, else files."""
+    choice = (settings.LOCK_BACKEND or "auto").lower()
+    if choice in ("auto", "postgres") and settings.DATABASE_URL.startswith("postgres"):
+        try:
+            from app.db import engine
+            return PostgresLockBackend(engine)
+        except Exception as e:
+            logger.warning(f"Locks: Postgres advisory locks unavailable ({e})")
+    if choice in ("auto", "redis") and settings.REDIS_URL and REDIS_AVAILABLE:
+        try:
+            backend = RedisLockBackend(settings.REDIS_URL)
+            backend._redis.ping()
+            return backend
+        except Exception as e:
+            logger.warning(f"Locks: Redis unavailable ({e})")
+    if choice not in ("auto", "file"):
+        logger.warning(f"Locks: {choice} backend unavailable, using lock files (this host only)")
+    return FileLockBackend(settings.LOCK_DIR)
+
+
+_backend = None
+_backend_guard = threading.Lock()
+
+
+def get_lock_backend():
+    global _backend
+    with _backend_guard:
+        if _backend is None:
+            _backend = make_lock_backend()
+            logger.info(f"Distributed locks: {_backend.name} backend")
+        return _backend
+
+
+def acquire_lock(key: str, ttl: Optional[float] = None, wait: float = 0, renew: bool = False) -> Optional[Lock]:
+    """Acquire `key`, retrying for up to `wait` seconds; None if another holder keeps it.
+
+    With `renew`, an expiring lease (Redis) is renewed from a thread until release_lock.
+    """
+    backend = get_lock_backend()
+    ttl = ttl or settings.LOCK_TTL_S
+    owner = _owner()
+    deadline = time.monotonic() + wait
+    while True:
+        lock = backend.acquire(key, owner, ttl)
+        if lock is not None or time.monotonic() >= deadline:
+            break
+        time.sleep(WAIT_POLL_SEC)
+    if lock is not None and renew and backend.renews:
+        lock.renewal = threading.Event()
+        threading.Thread(target=_renew_until, args=(lock, lock.renewal), daemon=True).start()
+    return lock
+
+
+def release_lock(lock: Lock):
+    if lock.renewal is not None:
+        lock.renewal.set()
+    try:
+        lock.backend.release(lock)
+    except Exception as e:
+        logger.warning(f"Releasing lock {lock.key} failed (its lease will expire): {e}")
+
+
+def _renew_until(lock: Lock, done: threading.Event):
+    while not done.wait(max(0.1, lock.ttl / 3)):
+        try:
+            if not lock.backend.renew(lock):
+                logger.warning(f"Lost lock {lock.key} (token {lock.token})")
+                return
+        except Exception as e:
+            logger.warning(f"Renewing lock {lock.key} failed: {e}")
+
+
+@contextmanager
+def distributed_lock(key: str, ttl: Optional[float] = None, wait: float = 0) -> Iterator[Optional[Lock]]:
+    """Hold `key` for the block; yields the Lock, or None if it is held elsewhere.
+
+    Leases that expire (Redis) are renewed while the block runs.
+    """
+    lock = acquire_lock(key, ttl, wait, renew=True)
+    if lock is None:
+        yield None
+        return
+    try:
+        yield lock
+    finally:
+        release_lock(lock)
+
+
+def fence_row(db: Session, model, row_id: int, token: int) -> bool:
+    """Stamp `token` on a row's ``fence_token`` unless a newer holder already did; commits."""
+    stamped = db.execute(
+        update(model)
+        .where(model.id == row_id, or_(model.fence_token == None, model.fence_token < token))  # noqa: E711
+        .values(fence_token=token)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(stamped)
+
+
+def holds_fence(db: Session, model, row_id: int, token: int) -> bool:
+    """True while no newer lock holder has stamped the row."""
+    current = db.query(model.fence_token).filter(model.id == row_id).scalar()
+    return current == token
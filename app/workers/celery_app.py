@@ -1,14 +1,72 @@
 from __future__ import annotations
 import os
 from celery import Celery
+from kombu import Queue
 
+# Broker: Redis in production. Without Redis, "filesystem://" (one host, any
+# number of processes, messages under CELERY_LOCAL_DIR) or "memory://" (a
+# worker in the same process, e.g. tests) work with the same tasks.
 BROKER_URL = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
-RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+LOCAL_DIR = os.getenv("CELERY_LOCAL_DIR", "/tmp/contentflow_celery")
+if BROKER_URL.startswith("filesystem"):
+    _default_backend = f"file://{LOCAL_DIR}/results"
+elif BROKER_URL.startswith("memory"):
+    _default_backend = "cache+memory://"
+else:
+    _default_backend = "redis://localhost:6379/1"
+RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", _default_backend)
+
+# A task not acked within this many seconds is redelivered (Redis / SQS brokers):
+# keep it above the longest task, or long transforms run twice
+VISIBILITY_TIMEOUT = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", "7200"))
+RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", "86400"))
+
+# Network-bound tasks (feeds, platform APIs) go to "io", served by a thread or
+# gevent pool; FFmpeg transforms to "cpu", served by prefork
+IO_QUEUE = "io"
+CPU_QUEUE = "cpu"
 
 celery_app = Celery(
     "contentflow",
     broker=BROKER_URL,
     backend=RESULT_BACKEND,
+    include=["app.workers.tasks"],
+)
+
+_transport_options = {"visibility_timeout": VISIBILITY_TIMEOUT}
+if BROKER_URL.startswith("filesystem"):
+    for folder in ("queue", "processed", "results", "control"):
+        os.makedirs(os.path.join(LOCAL_DIR, folder), exist_ok=True)
+    _transport_options.update({
+        "data_folder_in": os.path.join(LOCAL_DIR, "queue"),
+        "data_folder_out": os.path.join(LOCAL_DIR, "queue"),
+        "processed_folder": os.path.join(LOCAL_DIR, "processed"),
+        "store_processed": False,
+        # Broadcast / remote-control exchanges; kombu defaults to ./control in the cwd
+        "control_folder": os.path.join(LOCAL_DIR, "control"),
+    })
+
+celery_app.conf.update(
+    task_queues=(Queue(IO_QUEUE), Queue(CPU_QUEUE), Queue("celery")),
+    task_default_queue="celery",
+    task_routes={
+        "contentflow.ingest": {"queue": IO_QUEUE},
+        "contentflow.publish": {"queue": IO_QUEUE},
+        "contentflow.metrics": {"queue": IO_QUEUE},
+        "contentflow.autopilot_tick": {"queue": IO_QUEUE},
+        "contentflow.transform": {"queue": CPU_QUEUE},
+    },
+    # Ack after the task ran, so a worker killed mid-task leaves it to be redelivered
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options=_transport_options,
+    result_backend_transport_options={"visibility_timeout": VISIBILITY_TIMEOUT},
+    result_expires=RESULT_EXPIRES,
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    timezone="UTC",
 )
 
 # Autodiscover tasks in app.workers package
@@ -0,0 +1,124 @@
+"""Queue worker: runs jobs leased from the ``jobs`` table (app.services.job_queue).
+
+    python -m app.workers.queue_worker [--kinds transform,publish] [--once]
+
+Start as many as needed, on any host sharing the database: each job is leased
+by a single worker. A heartbeat thread extends the lease while the job runs,
+so a job outliving ``JOB_LEASE_SECONDS`` is not picked up twice, while a
+crashed worker's job is re-leased once its lease expires. SIGTERM / SIGINT
+finish the current job, then exit.
+"""
+
+import argparse
+import signal
+import threading
+from typing import List, Optional
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Job
+from app.services import job_queue
+from app.utils.logger import logger, set_job_context
+from app.routes.health import increment_job_metric
+
+
+class QueueWorker:
+    def __init__(self, kinds: Optional[List[str]] = None, name: Optional[str] = None):
+        self.kinds = kinds or None
+        self.name = name or job_queue.worker_name()
+        self._stop = threading.Event()
+
+    def stop(self, *_):
+        logger.info(f"Queue worker {self.name} stopping after the current job")
+        self._stop.set()
+
+    def _heartbeat(self, job_id: int, done: threading.Event):
+        interval = max(1.0, settings.JOB_LEASE_SECONDS / 3)
+        db = SessionLocal()
+        try:
+            while not done.wait(interval):
+                if not job_queue.heartbeat(db, job_id, self.name):
+                    logger.warning(f"Worker {self.name} lost the lease of job {job_id}")
+                    return
+        except Exception as e:
+            logger.error(f"Heartbeat of job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+    def run_once(self) -> bool:
+        """Lease and run one job; False when nothing was due."""
+        db = SessionLocal()
+        try:
+            job = job_queue.lease(db, self.name, self.kinds)
+            if job is None:
+                return False
+            # Detach the leased row and end the transaction: no connection sits
+            # idle in a transaction (holding row locks) while the handler runs
+            db.expunge(job)
+            db.commit()
+        finally:
+            db.close()
+
+        set_job_context(job.id)
+        increment_job_metric(job.kind, "started")
+        logger.info(f"Worker {self.name} running job {job.id} ({job.kind}, attempt {job.attempts})")
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job.id, done), daemon=True)
+        beat.start()
+        error = None
+        try:
+            result = job_queue.run_handler(job)
+            if isinstance(result, dict) and result.get("success") is False:
+                raise RuntimeError(result.get("error") or result.get("message") or "job reported failure")
+        except Exception as e:
+            error = str(e)
+        finally:
+            done.set()
+            beat.join()
+
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job.id)
+            if job is None:
+                return True
+            if error is not None:
+                if job_queue.fail(db, job, error, self.name):
+                    increment_job_metric(job.kind, "failed")
+                return True
+            if job_queue.complete(db, job, result, self.name):
+                increment_job_metric(job.kind, "completed")
+                logger.info(f"Worker {self.name} completed job {job.id} ({job.kind})")
+            return True
+        finally:
+            db.close()
+
+    def run_forever(self):
+        logger.info(f"Queue worker {self.name} started (kinds: {', '.join(self.kinds or ['all'])})")
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception as e:
+                logger.error(f"Queue worker {self.name} error: {e}")
+                busy = False
+            if not busy:
+                self._stop.wait(settings.JOB_POLL_INTERVAL_S)
+        logger.info(f"Queue worker {self.name} stopped")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run ContentFlow jobs from the database queue")
+    parser.add_argument("--kinds", default="", help="comma-separated job kinds to run (default: all)")
+    parser.add_argument("--once", action="store_true", help="run at most one job, then exit")
+    args = parser.parse_args(argv)
+
+    worker = QueueWorker([k.strip() for k in args.kinds.split(",") if k.strip()])
+    if args.once:
+        worker.run_once()
+        return
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Celery tasks for the pipeline jobs of app.services.scheduler.
+
+Routing (see celery_app): ingest, publish, metrics and the autopilot tick on
+the ``io`` queue, transform on ``cpu``. Run one worker per pool:
+
+    celery -A app.workers.celery_app worker -Q io -P threads -c 32   # or -P gevent
+    celery -A app.workers.celery_app worker -Q cpu -P prefork -c 2
+    celery -A app.workers.celery_app beat
+
+Beat runs each job every ``interval_minutes`` of ``get_job_priorities`` and
+the autopilot every ``AI_TICK_INTERVAL_MIN`` when ``FEATURE_AUTOPILOT`` is on
+(``CELERY_ENABLED`` keeps the web process from running it as well). With
+``PIPELINE_HANDOFF``, transform and publish tasks also arrive per batch of
+committed assets / posts (app.services.pipeline_events).
+"""
+
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from celery.exceptions import SoftTimeLimitExceeded
+
+from app.config import settings
+from app.services.scheduler import get_job_priorities, job_ingest, job_metrics, job_publish, job_transform
+from app.utils.logger import logger
+from app.workers.celery_app import celery_app
+
+# Failures retried with backoff. job_* functions catch their own errors and
+# report them as {"success": False}, which _run turns back into JobFailed
+_RETRY = dict(autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=600, retry_jitter=True,
+              max_retries=max(0, settings.MAX_JOB_ATTEMPTS - 1))
+
+
+class JobFailed(RuntimeError):
+    """A job_* function reported failure in its result."""
+
+
+def _run(kind: str, job) -> Dict[str, Any]:
+    logger.info(f"Celery task {kind} starting")
+    try:
+        result = job()
+    except SoftTimeLimitExceeded:
+        logger.error(f"Celery task {kind} hit its soft time limit")
+        raise
+    if isinstance(result, dict) and result.get("success") is False:
+        logger.error(f"Celery task {kind} failed: {result.get('error') or result.get('message')}")
+        raise JobFailed(result.get("error") or result.get("message") or f"{kind} job reported failure")
+    logger.info(f"Celery task {kind} finished: {result.get('message', '') if isinstance(result, dict) else result}")
+    return result
+
+
+@celery_app.task(name="contentflow.ingest", soft_time_limit=1500, time_limit=1800, **_RETRY)
+def ingest_task() -> Dict[str, Any]:
+    return _run("ingest", job_ingest)
+
+
+@celery_app.task(name="contentflow.transform", soft_time_limit=3000, time_limit=3600, **_RETRY)
+def transform_task(asset_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    return _run("transform", lambda: job_transform(asset_ids=asset_ids))
+
+
+@celery_app.task(name="contentflow.publish", soft_time_limit=1500, time_limit=1800, **_RETRY)
+def publish_task(post_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    return _run("publish", lambda: job_publish(post_ids=post_ids))
+
+
+@celery_app.task(name="contentflow.metrics", soft_time_limit=1500, time_limit=1800, **_RETRY)
+def metrics_task() -> Dict[str, Any]:
+    return _run("metrics", job_metrics)
+
+
+@celery_app.task(name="contentflow.autopilot_tick", soft_time_limit=300, time_limit=600)
+def autopilot_task() -> Dict[str, Any]:
+    from app.aiops.autopilot import ai_tick
+    return _run("autopilot", lambda: ai_tick(dry_run=settings.AI_DRY_RUN))
+
+
+TASKS = {
+    "ingest": ingest_task,
+    "transform": transform_task,
+    "publish": publish_task,
+    "metrics": metrics_task,
+}
+
+
+def dispatch(kind: str, countdown: int = 0):
+    """Send the `kind` job to its Celery queue; returns the AsyncResult."""
+    if kind not in TASKS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return TASKS[kind].apply_async(countdown=countdown or None)
+
+
+_schedule = {
+    f"{job['kind']}-every-{job['interval_minutes']}m": {
+        "task": TASKS[job["kind"]].name,
+        "schedule": timedelta(minutes=job["interval_minutes"]),
+    }
+    for job in get_job_priorities() if job["kind"] in TASKS
+}
+if settings.FEATURE_AUTOPILOT:
+    _schedule["autopilot-tick"] = {
+        "task": autopilot_task.name,
+        "schedule": timedelta(minutes=max(1, settings.AI_TICK_INTERVAL_MIN)),
+    }
+celery_app.conf.beat_schedule = _schedule
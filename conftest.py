@@ -0,0 +1,24 @@
+"""Shared fixtures for the unit tests (the other root test_*.py scripts need a running server)."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  registers every table on Base
+from app.db import Base
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """sessionmaker over a fresh SQLite file; each session gets its own connection."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
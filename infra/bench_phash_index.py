@@ -0,0 +1,80 @@
+"""Benchmark near-duplicate phash lookups: PhashIndex vs the old linear scan.
+
+Usage: python infra/bench_phash_index.py [sizes...]   (default: 10000 100000 1000000)
+
+Hashes are random 64-bit values; half the queries are near-duplicates
+(1-5 flipped bits) of a stored hash, half are misses. The linear scan is the
+pre-index behaviour of is_duplicate_phash (minus the per-row hex parsing, so
+it is a lower bound of the old cost) and is skipped above 100k rows.
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.phash_index import PhashIndex  # noqa: E402
+from app.utils.dedupe import hamming  # noqa: E402
+
+QUERIES = 2000
+THRESHOLD = 5
+
+
+def _flip(value: int, bits: int) -> int:
+    for pos in random.sample(range(64), bits):
+        value ^= 1 << pos
+    return value
+
+
+def _timed(fn, queries):
+    samples, hits = [], 0
+    for q in queries:
+        t0 = time.perf_counter()
+        hits += fn(q) is not None
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99)],
+        "hits": hits,
+    }
+
+
+def bench(size: int):
+    random.seed(size)
+    hashes = [random.getrandbits(64) for _ in range(size)]
+
+    index = PhashIndex(max_distance=THRESHOLD)
+    t0 = time.perf_counter()
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+    build_s = time.perf_counter() - t0
+
+    queries = [_flip(random.choice(hashes), random.randint(1, THRESHOLD)) for _ in range(QUERIES // 2)]
+    queries += [random.getrandbits(64) for _ in range(QUERIES // 2)]
+    random.shuffle(queries)
+
+    indexed = _timed(lambda q: index.find(q, THRESHOLD), queries)
+    print(f"{size:>9,} assets | build {build_s:6.2f}s | index  mean {indexed['mean_us']:9.1f}us "
+          f"p50 {indexed['p50_us']:9.1f}us p99 {indexed['p99_us']:9.1f}us hits {indexed['hits']}")
+
+    if size <= 100_000:
+        def linear(q):
+            for h in hashes:
+                if hamming(h, q) <= THRESHOLD:
+                    return h
+            return None
+
+        scan = _timed(linear, queries[:200])
+        print(f"{'':>9} {'':>6} | {'':>12} | linear mean {scan['mean_us']:9.1f}us "
+              f"p50 {scan['p50_us']:9.1f}us p99 {scan['p99_us']:9.1f}us (200 queries)")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for n in sizes:
+        bench(n)
@@ -0,0 +1,65 @@
+"""Benchmark source filter matching: compiled trie regex vs the old substring loop.
+
+Usage: python infra/bench_source_filters.py [entries] [keywords]   (default: 10000 200)
+
+Entries are ~60-word pseudo-French titles + descriptions; roughly a third of
+them contain one of the keywords. The substring loop is the pre-compiled
+behaviour of matches_filter (lower() + `in` per keyword, per entry).
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.source_filters import SourceMatcher  # noqa: E402
+
+WORDS = ["actualité", "économie", "données", "réseau", "marché", "été", "projet", "équipe",
+         "nouveau", "rapport", "analyse", "résultat", "public", "société", "énergie", "santé"]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase + "éèà") for _ in range(rng.randint(5, 10)))
+
+
+def _substring_loop(title: str, description: str, keywords: str) -> bool:
+    text = f"{title} {description}".lower()
+    return any(k in text for k in (k.strip().lower() for k in keywords.split(",")))
+
+
+def bench(n_entries: int, n_keywords: int):
+    rng = random.Random(42)
+    keywords = [_word(rng) for _ in range(n_keywords)]
+    csv = ",".join(keywords)
+    entries = []
+    for i in range(n_entries):
+        words = [rng.choice(WORDS) for _ in range(60)]
+        if i % 3 == 0:
+            words[rng.randrange(60)] = rng.choice(keywords).capitalize()
+        entries.append((" ".join(words[:10]), " ".join(words[10:])))
+
+    t0 = time.perf_counter()
+    matcher = SourceMatcher(csv, None)
+    compile_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    compiled_hits = sum(matcher.matches(t, d) for t, d in entries)
+    compiled_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    loop_hits = sum(_substring_loop(t, d, csv) for t, d in entries)
+    loop_s = time.perf_counter() - t0
+
+    print(f"{n_entries:,} entries x {n_keywords} keywords")
+    print(f"  compiled  {compiled_s * 1000:8.1f}ms total {compiled_s / n_entries * 1e6:7.1f}us/entry "
+          f"(compile {compile_ms:.1f}ms) hits {compiled_hits}")
+    print(f"  substring {loop_s * 1000:8.1f}ms total {loop_s / n_entries * 1e6:7.1f}us/entry "
+          f"hits {loop_hits}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    bench(args[0] if args else 10_000, args[1] if len(args) > 1 else 200)
@@ -6,6 +6,19 @@ echo "[boot] IMAGE_BUILT_FROM_DOCKERFILE=${IMAGE_BUILT_FROM_DOCKERFILE}"
 echo "[boot] Using PORT=${PORT_RESOLVED}"
 echo "[boot] PWD=$(pwd)  LS=$(ls -la)"
 
+# The API and the queue worker share Prometheus counters through this directory
+# (prometheus_client multiprocess mode); start each boot from a clean one.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "${PROMETHEUS_MULTIPROC_DIR}" && mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+
+# Jobs queued through POST /jobs/{kind}/run need a queue worker. Single-container
+# deploys (Railway, Procfile) run one next to the API; set START_QUEUE_WORKER=0
+# where workers run as their own service (docker-compose queue_worker).
+if [ "${START_QUEUE_WORKER:-1}" = "1" ]; then
+  echo "[boot] Starting queue worker"
+  python -m app.workers.queue_worker &
+fi
+
 exec uvicorn app.main:app \
   --host 0.0.0.0 \
   --port "${PORT_RESOLVED}" \
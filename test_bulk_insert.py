@@ -0,0 +1,36 @@
+"""Bulk asset insert: ON CONFLICT DO NOTHING on external_key, chunked statements."""
+
+from app.models import Asset, Source
+from app.services.sources import BULK_INSERT_MAX_PARAMS, _ASSET_COLUMNS, bulk_insert_assets
+
+
+def _asset(source_id: int, key: str, phash_int=None) -> Asset:
+    return Asset(source_id=source_id, external_key=key, phash_int=phash_int, meta_json="{}")
+
+
+def test_conflicting_keys_are_skipped_and_not_returned(db):
+    src = Source(kind="rss", url="https://feeds.example/rss")
+    db.add(src)
+    db.commit()
+    db.add(_asset(src.id, "k1"))
+    db.commit()
+
+    inserted = bulk_insert_assets(db, [_asset(src.id, "k1"), _asset(src.id, "k2", 5), _asset(src.id, "k2", 6)])
+    db.commit()
+    assert [(row.source_id, row.phash_int) for row in inserted] == [(src.id, 5)]
+    assert db.get(Asset, inserted[0].id).external_key == "k2"
+    assert db.query(Asset).count() == 2
+
+
+def test_large_batches_are_split_into_several_statements(db):
+    per_statement = BULK_INSERT_MAX_PARAMS // len(_ASSET_COLUMNS)
+    total = per_statement * 2 + 3
+    inserted = bulk_insert_assets(db, [_asset(1, f"k{i}") for i in range(total)])
+    db.commit()
+    assert len(inserted) == total
+    assert len({row.id for row in inserted}) == total
+    assert db.query(Asset).count() == total
+
+
+def test_empty_batch(db):
+    assert bulk_insert_assets(db, []) == []
@@ -0,0 +1,56 @@
+"""Celery tasks: failed job results raise JobFailed and are retried; queue routing per kind."""
+
+import pytest
+
+from app.config import settings
+from app.workers import tasks
+from app.workers.celery_app import CPU_QUEUE, IO_QUEUE, celery_app
+
+
+def test_failed_result_raises_and_is_retried(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tasks, "job_ingest", lambda: calls.append(1) or {"success": False, "error": "feed down"})
+    result = tasks.ingest_task.apply()  # eager: autoretry re-runs the task in place
+    assert result.state == "FAILURE" and isinstance(result.result, tasks.JobFailed)
+    assert str(result.result) == "feed down"
+    assert len(calls) == max(0, settings.MAX_JOB_ATTEMPTS - 1) + 1  # first run + every retry
+
+
+def test_retry_stops_once_the_job_succeeds(monkeypatch):
+    results = iter([{"success": False, "error": "db gone"}, {"success": True, "message": "ok"}])
+    monkeypatch.setattr(tasks, "job_metrics", lambda: next(results))
+    result = tasks.metrics_task.apply()
+    assert result.state == "SUCCESS" and result.result == {"success": True, "message": "ok"}
+
+
+def test_dispatch_routes_transform_to_cpu_and_the_rest_to_io(monkeypatch):
+    sent = {}
+
+    def send(task):
+        def apply_async(countdown=None, **_):
+            sent[task.name] = celery_app.amqp.router.route({}, task.name)["queue"].name
+        return apply_async
+
+    for task in tasks.TASKS.values():
+        monkeypatch.setattr(task, "apply_async", send(task))
+    for kind in tasks.TASKS:
+        tasks.dispatch(kind)
+
+    assert sent == {
+        "contentflow.ingest": IO_QUEUE,
+        "contentflow.transform": CPU_QUEUE,
+        "contentflow.publish": IO_QUEUE,
+        "contentflow.metrics": IO_QUEUE,
+    }
+    with pytest.raises(ValueError):
+        tasks.dispatch("nope")
+
+
+def test_beat_runs_every_job_on_its_interval():
+    from app.services.scheduler import get_job_priorities
+
+    schedule = celery_app.conf.beat_schedule
+    for job in get_job_priorities():
+        entry = schedule[f"{job['kind']}-every-{job['interval_minutes']}m"]
+        assert entry["task"] == tasks.TASKS[job["kind"]].name
+        assert entry["schedule"].total_seconds() == job["interval_minutes"] * 60
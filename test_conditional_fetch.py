@@ -0,0 +1,56 @@
+"""Conditional RSS fetching: validators sent back, 304 and same-body skips."""
+
+import asyncio
+
+import httpx
+
+from app.models import Source
+from app.services.ingest_engine import HostLimiter, fetch_feed_conditional, store_validators
+
+FEED = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><title>Two</title><link>https://example.com/2</link></item>
+<item><title>One</title><link>https://example.com/1</link></item>
+</channel></rss>"""
+
+
+def _fetch(src: Source, handler):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await fetch_feed_conditional(client, HostLimiter(4, 2), src)
+    return asyncio.run(run())
+
+
+def _server(seen):
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=FEED, headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    return handler
+
+
+def test_first_fetch_stores_validators_then_gets_304():
+    seen = []
+    src = Source(url="https://feeds.example/rss")
+    first = _fetch(src, _server(seen))
+    assert [e["title"] for e in first.entries] == ["Two", "One"]
+    assert "if-none-match" not in seen[0]
+
+    store_validators(first)
+    assert src.etag == '"v1"' and src.content_hash and src.last_seen_key
+
+    again = _fetch(src, _server(seen))
+    assert seen[1]["if-none-match"] == '"v1"'
+    assert seen[1]["if-modified-since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert again.unchanged and not again.entries
+
+
+def test_unchanged_body_without_validators_is_skipped():
+    def handler(request):
+        return httpx.Response(200, content=FEED)  # no ETag / Last-Modified
+
+    src = Source(url="https://feeds.example/rss")
+    first = _fetch(src, handler)
+    store_validators(first)
+    src.last_seen_key = None  # only the body hash can tell
+    assert _fetch(src, handler).unchanged
@@ -0,0 +1,62 @@
+"""Asset external keys: link normalization and the backfill under the unique index."""
+
+import json
+
+import pytest
+
+from app.db import backfill_asset_external_key
+from app.models import Asset
+from app.utils.dedupe import asset_external_key, canonical_url, url_key, video_key
+
+
+@pytest.mark.parametrize("url", [
+    "https://Example.com/news/item-1/",
+    "HTTPS://EXAMPLE.COM:443/news/item-1",
+    "https://example.com/news/item-1?utm_source=rss&utm_medium=feed",
+    "https://example.com/news/item-1?fbclid=abc#comments",
+    "  https://example.com/news/item-1?UTM_Campaign=x&gclid=1  ",
+])
+def test_trivially_different_links_share_a_canonical_form(url):
+    assert canonical_url(url) == "https://example.com/news/item-1"
+    assert url_key(url) == url_key("https://example.com/news/item-1")
+
+
+def test_canonical_url_keeps_what_identifies_the_item():
+    assert canonical_url("https://example.com/watch?v=2&a=1&utm_source=x") == "https://example.com/watch?a=1&v=2"
+    # Only the scheme and host are case-insensitive
+    assert canonical_url("https://example.com/News/Item") != canonical_url("https://example.com/news/item")
+    assert canonical_url("http://example.com:8080/") == "http://example.com:8080/"
+    assert url_key("") is None and url_key(None) is None
+
+
+def test_video_id_wins_over_the_link():
+    meta = {"video_id": "abc123", "link": "https://youtube.com/watch?v=abc123"}
+    assert asset_external_key(meta) == video_key("abc123")
+    assert asset_external_key({"url": "https://example.com/a/"}) == url_key("https://example.com/a")
+    assert asset_external_key("not a dict") is None
+
+
+def test_backfill_keys_first_rows_and_leaves_duplicates_null(session_factory, db):
+    link = "https://example.com/post/1"
+    metas = [
+        {"link": "https://example.com/post/0"},  # already keyed below
+        {"link": link},
+        {"link": link + "/?utm_source=feed"},  # same item as the row before
+        {"video_id": "v1"},
+        {"link": "https://example.com/post/0#top"},  # duplicate of the keyed row
+        {},  # nothing to key on
+        {"video_id": "v1", "link": "https://other.example/"},
+    ]
+    rows = [Asset(meta_json=json.dumps(meta)) for meta in metas]
+    rows.append(Asset(meta_json="not json"))
+    rows[0].external_key = url_key("https://example.com/post/0")
+    db.add_all(rows)
+    db.commit()
+
+    engine = session_factory.kw["bind"]
+    assert backfill_asset_external_key(engine, batch_size=2) == 2  # duplicates span batches
+    db.expire_all()
+    keys = [db.get(Asset, row.id).external_key for row in rows]
+    assert keys == [url_key("https://example.com/post/0"), url_key(link), None, video_key("v1"),
+                    None, None, None, None]
+    assert backfill_asset_external_key(engine) == 0  # re-run: the remaining rows are duplicates
@@ -0,0 +1,49 @@
+"""Encoding ladder: profile by transform backlog, faster rungs under a deadline."""
+
+import pytest
+
+from app.services import encoding_profiles
+from app.services.encoding_profiles import select_profile
+from utils.ffmpeg import OUTPUT_FPS
+
+
+@pytest.fixture
+def speeds(monkeypatch):
+    """Built-in profiles and ladder; measured encode fps per profile set by the test."""
+    measured = {}
+    monkeypatch.setattr(encoding_profiles, "_recipe", lambda: {})
+    monkeypatch.setattr(encoding_profiles, "measured_fps", lambda: dict(measured))
+    return measured
+
+
+@pytest.mark.parametrize("backlog, profile", [(0, "quality"), (5, "quality"), (6, "balanced"),
+                                              (25, "balanced"), (100, "fast"), (101, "rush")])
+def test_backlog_picks_the_ladder_rung(speeds, backlog, profile):
+    assert select_profile(backlog).name == profile
+
+
+def test_quality_rung_compresses_at_the_baseline_crf(speeds):
+    chosen = select_profile(0)
+    assert (chosen.preset, chosen.crf) == ("slow", 23)
+    assert chosen.as_encoding()["threads"] >= 1
+
+
+def test_deadline_steps_to_faster_profiles_by_measured_fps(speeds):
+    frames = 60 * OUTPUT_FPS  # a 60 s clip
+    speeds.update(quality=frames / 120, balanced=frames / 40, fast=frames / 10)
+    assert select_profile(0, duration_s=60, deadline_s=30).name == "fast"
+    assert select_profile(0, duration_s=60, deadline_s=45).name == "balanced"
+    assert select_profile(0, duration_s=60, deadline_s=200).name == "quality"
+    assert select_profile(0, duration_s=60).name == "quality"  # no deadline
+
+
+def test_unmeasured_profile_is_kept(speeds):
+    speeds.update(balanced=1.0)
+    assert select_profile(0, duration_s=60, deadline_s=1).name == "quality"
+
+
+def test_encode_speeds_are_averaged_per_profile():
+    measured = {}
+    encoding_profiles._fold(measured, "fast", 100.0)
+    encoding_profiles._fold(measured, "fast", 200.0)
+    assert measured["fast"] == pytest.approx(100 + encoding_profiles._EWMA_ALPHA * 100)
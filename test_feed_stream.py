@@ -0,0 +1,62 @@
+"""Streaming feed parsing and stopping at the last seen entry."""
+
+import asyncio
+
+import httpx
+
+from app.models import Source
+from app.services.feed_stream import FeedStream
+from app.services.ingest_engine import HostLimiter, fetch_feed_conditional
+from app.utils.dedupe import url_key
+
+ITEMS = 50
+HEAD = b'<?xml version="1.0"?><rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/"><channel><title>t</title>'
+TAIL = b"</channel></rss>"
+
+
+def _item(i: int) -> bytes:
+    return (f"<item><title>Item {i}</title><link>https://example.com/{i}</link>"
+            f'<media:thumbnail url="https://img.example.com/{i}.jpg"/></item>').encode()
+
+
+def _chunks():
+    """Newest first, one item per chunk."""
+    return [HEAD] + [_item(i) for i in range(ITEMS, 0, -1)] + [TAIL]
+
+
+def test_entries_are_yielded_as_their_chunks_arrive():
+    stream = FeedStream()
+    body = b"".join(_chunks())
+    entries = []
+    for i in range(0, len(body), 7):  # chunk boundaries inside tags
+        entries.extend(stream.feed(body[i:i + 7]))
+    entries.extend(stream.close())
+    assert [e["title"] for e in entries] == [f"Item {i}" for i in range(ITEMS, 0, -1)]
+    assert entries[0]["media_thumbnail"] == [{"url": f"https://img.example.com/{ITEMS}.jpg"}]
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks, self.sent = chunks, 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+
+def test_reading_stops_at_the_last_seen_entry():
+    body = _CountingStream(_chunks())
+    src = Source(url="https://feeds.example/rss", last_seen_key=url_key("https://example.com/45"),
+                 content_hash="previous")
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=body))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await fetch_feed_conditional(client, HostLimiter(4, 2), src)
+
+    fetched = asyncio.run(run())
+    assert [e["title"] for e in fetched.entries] == [f"Item {i}" for i in range(ITEMS, 45, -1)]
+    assert body.sent < len(body.chunks) // 2  # the rest of the feed was never read
+    assert fetched.validators["last_seen_key"] == url_key(f"https://example.com/{ITEMS}")
+    assert fetched.validators["content_hash"] == "previous"  # partial body: the stored hash is kept
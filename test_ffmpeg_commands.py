@@ -0,0 +1,88 @@
+"""FFmpeg command builders: one-pass filter graph and multi-rendition outputs."""
+
+from utils.ffmpeg import (OUTPUT_FPS, RENDITIONS, build_filter_graph, build_renditions_command,
+                          build_vertical_command)
+
+
+def _plan(segments, **extra):
+    return {"segments": [{"start": s, "end": e} for s, e in segments], "overlays": {}, **extra}
+
+
+def _outputs_of(cmd, outputs):
+    """Per-output argument slices of a multi-output command, by platform."""
+    slices, start = {}, cmd.index("-filter_complex") + 2
+    for platform, path in outputs.items():
+        end = cmd.index(path, start)
+        slices[platform] = cmd[start:end]
+        start = end + 1
+    return slices
+
+
+def test_multi_segment_plan_is_cut_with_select_and_aselect():
+    graph = build_filter_graph(_plan([(10, 15), (2, 5)]), {}, offset=2.0)
+    # sorted, shifted by the input-side seek
+    assert "select='between(t,0.000,3.000)+between(t,8.000,13.000)'" in graph["video"]
+    assert f"setpts=N/{OUTPUT_FPS}/TB" in graph["video"]
+    assert graph["audio"] == "aselect='between(t,0.000,3.000)+between(t,8.000,13.000)',asetpts=N/SR/TB"
+
+
+def test_single_segment_is_trimmed_by_seek_and_duration(tmp_path):
+    cmd = build_vertical_command("in.mp4", _plan([(4, 19)]), "out.mp4", str(tmp_path))
+    assert cmd[cmd.index("-ss") + 1] == "4.000" and cmd[cmd.index("-t") + 1] == "15.000"
+    assert cmd.index("-ss") < cmd.index("-i")  # input-side seek
+    assert "select=" not in cmd[cmd.index("-vf") + 1]
+    assert "-af" not in cmd
+    assert cmd[-1] == "out.mp4"
+
+
+def test_subtitles_are_rendered_on_source_time(tmp_path):
+    srt = tmp_path / "subs.srt"
+    srt.write_text("1\n00:00:05,000 --> 00:00:06,000\nhi\n")
+    video = build_filter_graph(_plan([(5, 20)], srt=str(srt)), {}, offset=5.0)["video"]
+    chain = video.split(",")
+    assert chain[0] == "setpts=PTS+5.000/TB"
+    assert chain[1].startswith("subtitles=filename=")
+    assert "setpts=PTS-STARTPTS" in chain  # back to 0 after the subtitles
+
+
+def test_drawtext_reads_escaped_text_files(tmp_path):
+    text_file = str(tmp_path / "it's: [hook].txt")
+    video = build_filter_graph(_plan([(0, 30)]), {"hook": text_file})["video"]
+    assert "drawtext=textfile=" in video
+    escaped = video.split("drawtext=textfile=")[1].split(":fontcolor")[0]
+    assert "'" not in escaped.replace("\\'", "") and "\\[" in escaped and "\\:" in escaped
+
+
+def test_overlay_texts_are_written_to_files(tmp_path):
+    plan = _plan([(0, 30)], overlays={"hook_text": "Top 3: l'astuce", "cta_text": "Lien en bio"})
+    cmd = build_vertical_command("in.mp4", plan, "out.mp4", str(tmp_path))
+    video = cmd[cmd.index("-vf") + 1]
+    assert (tmp_path / "hook.txt").read_text(encoding="utf-8") == "Top 3: l'astuce"
+    assert video.count("drawtext=textfile=") == 2
+
+
+def test_renditions_map_audio_filter_bitrate_and_duration_per_output(tmp_path):
+    outputs = {"youtube": "yt.mp4", "reddit": "rd.mp4"}
+    cmd = build_renditions_command("in.mp4", _plan([(0, 30), (40, 80)]), outputs, str(tmp_path))
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "split=2[s0][s1]" in graph
+    assert "[s0]null[v0]" in graph and "[s1]scale=720:1280[v1]" in graph
+
+    per_output = _outputs_of(cmd, outputs)
+    for i, (platform, args) in enumerate(per_output.items()):
+        spec = RENDITIONS[platform]
+        assert args[args.index("-map") + 1] == f"[v{i}]"
+        assert "0:a?" in args
+        assert args[args.index("-af") + 1].startswith("aselect=")
+        assert args[args.index("-b:a") + 1] == f"{spec['audio_kbps']}k"
+        assert args[args.index("-maxrate") + 1] == f"{spec['video_kbps']}k"
+        assert args[args.index("-t") + 1] == str(spec["max_duration"])  # 70s plan, 60s cap
+
+
+def test_renditions_of_a_silent_input_have_no_audio_arguments(tmp_path):
+    outputs = {"instagram": "ig.mp4", "tiktok": "tt.mp4"}
+    plan = _plan([(0, 10), (20, 30)], audio_enabled=False)
+    cmd = build_renditions_command("in.mp4", plan, outputs, str(tmp_path))
+    for args in _outputs_of(cmd, outputs).values():
+        assert "0:a?" not in args and "-af" not in args and "-c:a" not in args
+        assert "-t" not in args  # 20s plan is under both caps
@@ -0,0 +1,50 @@
+"""Ingest concurrency: host/global fetch limits and run_sync's event-loop guard."""
+
+import asyncio
+
+import pytest
+
+from app.services.ingest_engine import HostLimiter
+from app.utils.aio import run_sync
+
+
+async def _peak(limiter: HostLimiter, urls):
+    running, peak = {"all": 0}, {"all": 0}
+
+    async def one(url):
+        host = url.split("/")[2]
+        async with limiter.slot(url):
+            for key in ("all", host):
+                running[key] = running.get(key, 0) + 1
+                peak[key] = max(peak.get(key, 0), running[key])
+            await asyncio.sleep(0.01)
+            for key in ("all", host):
+                running[key] -= 1
+
+    await asyncio.gather(*(one(u) for u in urls))
+    return peak
+
+
+def test_host_limiter_bounds_each_host_and_the_total():
+    urls = [f"https://{host}.example/{i}" for host in ("a", "b", "c") for i in range(10)]
+    peak = asyncio.run(_peak(HostLimiter(global_limit=4, per_host_limit=2), urls))
+    assert peak["all"] == 4
+    assert all(peak[f"{host}.example"] <= 2 for host in ("a", "b", "c"))
+
+
+async def _answer():
+    return 42
+
+
+def test_run_sync_from_sync_code():
+    assert run_sync(_answer()) == 42
+
+
+def test_run_sync_refuses_a_running_loop():
+    async def caller():
+        coro = _answer()
+        with pytest.raises(RuntimeError):
+            run_sync(coro)
+        assert coro.cr_frame is None  # closed, not left un-awaited
+
+    asyncio.run(caller())
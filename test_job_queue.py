@@ -0,0 +1,96 @@
+"""Durable job queue: priority leasing, heartbeats, expired leases, retries and DLQ."""
+
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models import Job
+from app.services import job_queue
+
+
+def test_jobs_are_leased_by_priority_once(db):
+    low = job_queue.enqueue(db, "metrics", priority=9)
+    high = job_queue.enqueue(db, "ingest", priority=1)
+    later = job_queue.enqueue(db, "ingest", priority=0, run_at=datetime.utcnow() + timedelta(hours=1))
+
+    assert job_queue.lease(db, "w1").id == high.id
+    assert job_queue.lease(db, "w2").id == low.id
+    assert job_queue.lease(db, "w3") is None  # `later` is not due
+    assert db.get(Job, later.id).status == "queued"
+
+
+def test_idempotency_key_returns_the_existing_job(db):
+    first = job_queue.enqueue(db, "ingest", idempotency_key="ingest:2026-10-17")
+    assert job_queue.enqueue(db, "ingest", idempotency_key="ingest:2026-10-17").id == first.id
+    assert db.query(Job).count() == 1
+
+
+def test_expired_lease_is_taken_over(db):
+    job = job_queue.enqueue(db, "ingest")
+    assert job_queue.lease(db, "w1", lease_seconds=60).id == job.id
+    assert job_queue.heartbeat(db, job.id, "w1")
+    assert job_queue.lease(db, "w2") is None
+
+    db.get(Job, job.id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)  # w1 died
+    db.commit()
+    again = job_queue.lease(db, "w2")
+    assert again.id == job.id and again.locked_by == "w2" and again.attempts == 2
+    assert not job_queue.heartbeat(db, job.id, "w1")
+
+
+def test_failures_back_off_then_go_to_the_dlq(db, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_JOB_ATTEMPTS", 2)
+    job_queue.enqueue(db, "publish", {"post_ids": [1]})
+
+    job = job_queue.lease(db, "w1")
+    job_queue.fail(db, job, "boom")
+    assert job.status == "queued" and job.run_at is not None and job.locked_by is None
+    assert job.run_at <= datetime.utcnow() + timedelta(seconds=settings.JOB_RETRY_DELAY_S)
+
+    job.run_at = datetime.utcnow() - timedelta(seconds=1)  # due now
+    db.commit()
+    job = job_queue.lease(db, "w1")
+    assert job.attempts == 2
+    job_queue.fail(db, job, "boom again")
+    assert job.status == "dlq" and job.last_error == "boom again"
+    assert job_queue.lease(db, "w1") is None
+
+
+def test_run_handler_passes_only_known_payload_keys(monkeypatch):
+    seen = {}
+    monkeypatch.setattr(job_queue, "job_handlers", lambda: {"publish": lambda post_ids=None: seen.update(ids=post_ids) or {}})
+    job_queue.run_handler(Job(kind="publish", payload={"post_ids": [3], "platform": "reddit"}))
+    assert seen == {"ids": [3]}
+
+
+def test_a_worker_that_lost_its_lease_cannot_finish_the_job(db):
+    job = job_queue.enqueue(db, "ingest")
+    stale = job_queue.lease(db, "w1", lease_seconds=60)
+    stale.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)  # w1 stalled
+    db.commit()
+    taken = job_queue.lease(db, "w2")
+    assert taken.id == job.id
+
+    assert not job_queue.complete(db, db.get(Job, job.id), {"ok": True}, "w1")
+    assert not job_queue.fail(db, db.get(Job, job.id), "boom", "w1")
+    assert db.get(Job, job.id).locked_by == "w2" and db.get(Job, job.id).status == "running"
+
+    assert job_queue.complete(db, db.get(Job, job.id), {"ok": True}, "w2")
+    assert db.get(Job, job.id).status == "completed"
+
+
+def test_run_job_by_kind_queues_instead_of_running(db, session_factory, monkeypatch):
+    from app.services import scheduler
+
+    monkeypatch.setattr(scheduler, "SessionLocal", session_factory)
+    monkeypatch.setattr(scheduler, "job_ingest", lambda: (_ for _ in ()).throw(AssertionError("ran inline")))
+    result = scheduler.run_job_by_kind("ingest")
+    assert result["success"] and result["status"] == "queued"
+    assert db.get(Job, result["job_id"]).kind == "ingest"
+    assert not scheduler.run_job_by_kind("nope")["success"]
+
+
+def test_queue_stats_ages_rows_read_back_without_tzinfo(db):
+    job_queue.enqueue(db, "ingest", run_at=datetime.utcnow() - timedelta(minutes=5))
+    stats = job_queue.queue_stats(db)
+    assert stats["by_kind"]["ingest"] == {"queued": 1}
+    assert 290 <= stats["oldest_due_age_s"] <= 310
@@ -0,0 +1,73 @@
+"""Thumbnail phash cache: bounded memory LRU, disk persistence, content-hash reuse."""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.services import phash_cache as phash_cache_module
+from app.services.phash_cache import PhashCache
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Blobs the pool was asked to decode; the phash is derived from the bytes."""
+    calls = []
+
+    def hash_many(blobs):
+        calls.extend(blobs)
+        return [b.hex().ljust(16, "0")[:16] for b in blobs]
+
+    monkeypatch.setattr(phash_cache_module.phash_pool, "hash_many", hash_many)
+    return calls
+
+
+def test_memory_lru_is_bounded(hashed):
+    cache = PhashCache("", memory_size=2, max_entries=100, ttl=3600)  # memory only
+    cache.put_many({"u1": b"\x01", "u2": b"\x02", "u3": b"\x03"})
+    assert cache.get("u1") is None  # evicted first
+    assert cache.get("u2") and cache.get("u3")
+
+
+def test_disk_cache_outlives_the_process_cache(tmp_path, hashed):
+    path = str(tmp_path / "phash.sqlite")
+    PhashCache(path, memory_size=10, max_entries=100, ttl=3600).put_bytes("u1", b"\x01")
+    assert PhashCache(path, memory_size=10, max_entries=100, ttl=3600).get("u1") == "0100000000000000"
+
+
+def test_same_image_at_another_url_is_hashed_once(tmp_path, hashed):
+    cache = PhashCache(str(tmp_path / "phash.sqlite"), memory_size=10, max_entries=100, ttl=3600)
+    first = cache.put_many({"a": b"\x07", "b": b"\x07"})
+    second = cache.put_bytes("c", b"\x07")
+    assert first["a"] == first["b"] == second
+    assert hashed == [b"\x07"]
+
+
+def test_entries_expire(tmp_path, hashed, monkeypatch):
+    cache = PhashCache(str(tmp_path / "phash.sqlite"), memory_size=10, max_entries=100, ttl=60)
+    cache.put_bytes("u1", b"\x01")
+    later = time.time() + 61
+    monkeypatch.setattr(phash_cache_module.time, "time", lambda: later)
+    assert cache.get("u1") is None
+
+
+def test_prometheus_router_only_serves_metrics():
+    from app.routes.prometheus import router
+
+    assert [route.path for route in router.routes] == ["/metrics"]
+
+
+def test_counts_from_worker_processes_reach_the_scrape(tmp_path, monkeypatch):
+    import subprocess
+    import sys
+
+    from app.routes import prometheus
+
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = "from app.routes.health import increment_phash_cache_metric as inc; inc('hit_disk'); inc('hit_disk')"
+    subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    body = asyncio.run(prometheus.metrics_endpoint()).body.decode()
+    assert 'cf_phash_cache_total{result="hit_disk"} 2.0' in body
@@ -0,0 +1,68 @@
+"""Multi-index phash lookup agrees with a brute-force Hamming scan."""
+
+import random
+
+from app.services.phash_index import PhashIndex
+from app.services.sources import InsertedAsset
+from app.utils.dedupe import MASK64, phash_to_int
+
+
+def _flip(value: int, bits: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def _brute_force(stored, query: int, threshold: int) -> bool:
+    return any((h ^ query).bit_count() <= threshold for h in stored)
+
+
+def test_lookup_matches_brute_force():
+    rng = random.Random(7)
+    index = PhashIndex(max_distance=5)
+    stored = [rng.getrandbits(64) for _ in range(2000)]
+    for asset_id, h in enumerate(stored, 1):
+        index.add(h, asset_id)
+
+    for _ in range(500):
+        query = _flip(rng.choice(stored), rng.randint(0, 10), rng)
+        for threshold in (0, 3, 5, 8):  # 8 > max_distance takes the scan fallback
+            found = index.find(query, threshold)
+            assert (found is not None) == _brute_force(stored, query, threshold)
+            if found:
+                assert (found[0] ^ query).bit_count() <= threshold
+
+
+def test_signed_and_hex_hashes_are_the_same_key():
+    index = PhashIndex(max_distance=5)
+    hex_hash = "f0e1d2c3b4a59687"
+    signed = phash_to_int(hex_hash)
+    assert signed < 0
+    assert index.add(signed, 1)
+    assert not index.add(hex_hash)
+    assert index.find(hex_hash) == (signed & MASK64, 1)
+
+
+def test_register_inserted_only_adds_returned_rows(monkeypatch):
+    from app.services import phash_index, sources
+
+    index = PhashIndex(max_distance=5)
+    monkeypatch.setattr(phash_index, "phash_index", index)
+    sources.register_inserted([InsertedAsset(id=10, source_id=1, phash_int=123456789)])
+    assert index.find(123456789) == (123456789, 10)
+    assert len(index) == 1
+
+
+def test_refresh_picks_up_a_lower_id_committed_late(db):
+    from app.models import Asset
+
+    index = PhashIndex(max_distance=5, overlap_ids=10)
+    db.add_all([Asset(id=i, phash_int=i * 1000003) for i in (1, 2, 3, 5)])
+    db.commit()
+    index.build(db)
+    assert index.find(4 * 1000003, 0) is None
+
+    db.add(Asset(id=4, phash_int=4 * 1000003))  # its transaction began before id 5's, committed after
+    db.commit()
+    assert index.refresh(db, force=True) == 1
+    assert index.find(4 * 1000003, 0) == (4 * 1000003, 4)
@@ -0,0 +1,54 @@
+"""Stage handoff on the jobs-table queue: backpressure and delayed publish retries."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models import Job
+from app.services import job_queue, pipeline_events
+
+
+@pytest.fixture
+def handoff_on(session_factory, monkeypatch):
+    monkeypatch.setattr(pipeline_events, "SessionLocal", session_factory)
+    monkeypatch.setattr(settings, "PIPELINE_HANDOFF", True)
+    monkeypatch.setattr(settings, "CELERY_ENABLED", False)
+    monkeypatch.setattr(settings, "PIPELINE_MAX_QUEUED_TRANSFORM", 2)
+
+
+def test_committed_assets_queue_their_transform(db, handoff_on):
+    job_id = pipeline_events.assets_committed([4, None, 7])
+    job = db.get(Job, job_id)
+    assert job.kind == "transform" and job.status == "queued" and job.payload == {"asset_ids": [4, 7]}
+    assert pipeline_events.assets_committed([None]) is None
+
+
+def test_handoff_is_skipped_once_the_stage_is_backed_up(db, handoff_on):
+    assert pipeline_events.assets_committed([1]) is not None
+    assert pipeline_events.assets_committed([2]) is not None
+    assert pipeline_events.assets_committed([3]) is None  # 2 transform jobs waiting
+    assert db.query(Job).filter(Job.kind == "transform").count() == 2
+
+    # a worker takes one: there is room again
+    job_queue.lease(db, "w1", kinds=["transform"])
+    assert pipeline_events.assets_committed([3]) is not None
+
+
+def test_handoff_is_off_by_default(db, handoff_on, monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_HANDOFF", False)
+    assert pipeline_events.posts_created([1, 2]) is None
+    assert db.query(Job).count() == 0
+
+
+def test_post_retry_due_queues_a_delayed_publish(db, handoff_on):
+    before = datetime.utcnow()
+    job = db.get(Job, pipeline_events.post_retry_due(9, 120))
+    assert job.kind == "publish" and job.payload == {"post_ids": [9]}
+    assert timedelta(seconds=119) <= job.run_at - before <= timedelta(seconds=125)
+    assert job_queue.lease(db, "w1") is None  # not due before its backoff
+
+
+def test_handoff_errors_never_reach_the_stage(db, handoff_on, monkeypatch):
+    monkeypatch.setattr(pipeline_events, "queue_depth", lambda kind: 1 / 0)
+    assert pipeline_events.posts_created([1]) is None
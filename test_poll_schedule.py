@@ -0,0 +1,36 @@
+"""Adaptive poll schedule: floor-interval sources are due on every ingest tick."""
+
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models import Source
+from app.services.poll_schedule import due_sources, record_poll
+
+
+def test_floor_interval_source_is_due_on_the_next_tick(db):
+    floor = settings.POLL_MIN_INTERVAL_MIN
+    source = Source(kind="rss", url="https://example.com/feed", poll_interval_min=floor)
+    db.add(source)
+    db.commit()
+
+    tick = datetime(2026, 1, 1, 12, 0, 0)
+    for _ in range(3):
+        assert due_sources(db, now=tick) == [source]
+        # the cycle itself takes a while; the schedule is kept from its start
+        record_poll(source, ingested=5, now=tick)
+        db.commit()
+        assert source.poll_interval_min == floor
+        tick += timedelta(minutes=floor)
+
+
+def test_tick_jitter_does_not_skip_a_due_source(db):
+    source = Source(kind="rss", url="https://example.com/feed")
+    db.add(source)
+    db.commit()
+
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    record_poll(source, ingested=1, now=start)
+    db.commit()
+    next_tick = source.next_poll_at - timedelta(seconds=5)  # tick fired slightly early
+    assert due_sources(db, now=next_tick) == [source]
+    assert due_sources(db, now=start) == []
@@ -0,0 +1,52 @@
+"""ffprobe cache and keyframe snapping of plan segments."""
+
+import os
+
+from app.services import probe as probe_module
+from app.services.probe import probe_file, probe_meta, snap_segments
+
+PROBE = {"duration": 30.0, "keyframes": [0.0, 2.0, 4.0, 10.0]}
+
+
+def test_starts_snap_back_to_a_close_keyframe():
+    plan = snap_segments({"segments": [{"start": 4.6, "end": 40}]}, PROBE, tolerance=1.0)
+    assert plan["segments"] == [{"start": 4.0, "end": 30.0}]  # end clamped to the duration
+    assert plan["keyframe_aligned"]
+
+
+def test_far_keyframes_leave_the_plan_unaligned():
+    plan = snap_segments({"segments": [{"start": 0.2, "end": 5}, {"start": 7.0, "end": 9}]}, PROBE, tolerance=1.0)
+    assert [s["start"] for s in plan["segments"]] == [0.0, 7.0]
+    assert not plan["keyframe_aligned"]
+
+
+def test_no_keyframes_or_zero_tolerance_disable_snapping():
+    assert not snap_segments({"segments": [{"start": 4, "end": 8}]}, {"keyframes": []})["keyframe_aligned"]
+    plan = snap_segments({"segments": [{"start": 4.5, "end": 8}]}, PROBE, tolerance=0)
+    assert plan["segments"][0]["start"] == 4.5 and not plan["keyframe_aligned"]
+
+
+def test_segments_past_the_end_are_dropped():
+    plan = snap_segments({"segments": [{"start": 0, "end": 5}, {"start": 31, "end": 40}]}, PROBE, tolerance=1.0)
+    assert plan["segments"] == [{"start": 0.0, "end": 5.0}]
+
+
+def test_a_file_is_probed_once_until_it_changes(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(probe_module, "run_probe", lambda path: calls.append(path) or {**PROBE, "streams": []})
+    video = tmp_path / "in.mp4"
+    video.write_bytes(b"v1")
+
+    meta = {}
+    probe_meta(meta, str(video))
+    assert probe_file(str(video))["duration"] == 30.0
+    assert len(calls) == 1
+
+    probe_module._cache.clear()  # new process: the persisted probe is enough
+    assert probe_meta(meta, str(video)) is meta["probe"]
+    assert len(calls) == 1
+
+    video.write_bytes(b"v2, longer")
+    os.utime(video, ns=(1, 1))
+    probe_meta(meta, str(video))
+    assert len(calls) == 2
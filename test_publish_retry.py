@@ -0,0 +1,89 @@
+"""Publish retries: per-platform backoff, non-retryable errors, DLQ and claiming due retries."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models import Job, Post
+from app.services import pipeline_events
+from app.services.publish import handle_publish_retry, publish_retry_base
+from app.services.scheduler import claim_posts, release_stale_posts
+from app.utils import jobs as jobs_utils
+
+
+@pytest.fixture
+def handoffs(monkeypatch):
+    """Delayed publish handoffs, and a backoff that always draws its upper bound."""
+    calls = []
+    monkeypatch.setattr(pipeline_events, "post_retry_due", lambda post_id, delay: calls.append((post_id, delay)))
+    monkeypatch.setattr(jobs_utils.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(settings, "PUBLISH_RETRY_BASE_S", 0)
+    monkeypatch.delenv("PUBLISH_RETRY_BASE_S_YOUTUBE", raising=False)
+    return calls
+
+
+def _post(db, platform="youtube", **fields):
+    post = Post(platform=platform, status=fields.pop("status", "publishing"), **fields)
+    db.add(post)
+    db.commit()
+    return post
+
+
+def test_backoff_base_is_per_platform(handoffs, monkeypatch):
+    assert publish_retry_base("youtube") == 300
+    assert publish_retry_base("instagram") == 60
+    assert publish_retry_base("unknown") == settings.JOB_RETRY_DELAY_S
+    monkeypatch.setenv("PUBLISH_RETRY_BASE_S_YOUTUBE", "30")
+    assert publish_retry_base("youtube") == 30
+
+
+def test_transient_failure_schedules_a_retry_with_backoff(db, handoffs):
+    post = _post(db)
+    before = datetime.utcnow()
+    assert handle_publish_retry(post, {"error": "HTTP 503"}, db) == "retry"
+    assert post.status == "retry" and post.publish_attempts == 1 and post.last_error == "HTTP 503"
+    assert handoffs == [(post.id, 300)]
+    assert timedelta(seconds=299) <= post.next_attempt_at - before <= timedelta(seconds=302)
+
+    assert handle_publish_retry(post, {"error": "HTTP 503"}, db) == "retry"
+    assert handoffs[-1] == (post.id, 600)  # doubled
+
+
+def test_non_retryable_error_fails_at_once(db, handoffs):
+    post = _post(db, platform="reddit")
+    assert handle_publish_retry(post, {"error": "Unsupported platform: reddit"}, db) == "failed"
+    assert post.status == "failed" and post.next_attempt_at is None
+    assert handoffs == []
+    assert db.query(Job).count() == 0
+
+
+def test_last_attempt_goes_to_the_dlq(db, handoffs, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_JOB_ATTEMPTS", 2)
+    post = _post(db, publish_attempts=1)
+    assert handle_publish_retry(post, {"error": "HTTP 500"}, db) == "dlq"
+    assert post.status == "failed" and handoffs == []
+    job = db.query(Job).one()
+    assert job.status == "dlq" and job.kind == "publish" and job.payload["post_ids"] == [post.id]
+    assert job.attempts == 2 and job.last_error == "HTTP 500"
+
+
+def test_only_due_retries_are_claimed(db):
+    now = datetime.utcnow()
+    queued = _post(db, status="queued")
+    due = _post(db, status="retry", next_attempt_at=now - timedelta(seconds=1))
+    later = _post(db, status="retry", next_attempt_at=now + timedelta(hours=1))
+    draft = _post(db, status="draft")
+
+    assert sorted(claim_posts(db, limit=10)) == sorted([queued.id, due.id])
+    assert claim_posts(db, limit=10) == []  # claimed once
+    assert db.get(Post, due.id).status == "publishing"
+    assert db.get(Post, later.id).status == "retry" and db.get(Post, draft.id).status == "draft"
+
+
+def test_posts_stuck_publishing_are_retried(db, handoffs):
+    stuck = _post(db, claimed_at=datetime.utcnow() - timedelta(hours=1))
+    fresh = _post(db, claimed_at=datetime.utcnow())
+    assert release_stale_posts(db, timeout_s=600) == [stuck.id]
+    assert db.get(Post, stuck.id).status == "retry"
+    assert db.get(Post, fresh.id).status == "publishing"
@@ -0,0 +1,103 @@
+"""Render cache: what the key depends on, hits without FFmpeg, LRU eviction."""
+
+import os
+
+import pytest
+
+from app.services import render_cache as render_cache_module
+from app.services.render_cache import RenderCache, cached_render
+
+PLAN = {"segments": [{"start": 0, "end": 10}], "overlays": {"hook_text": "Hook"}, "audio_enabled": True}
+ENCODING = {"preset": "fast", "crf": 23}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "in.mp4"
+    path.write_bytes(b"video")
+    return str(path)
+
+
+def test_key_follows_content_plan_and_encoder(tmp_path, source):
+    cache = RenderCache(str(tmp_path / "cache"), 0)
+    key = cache.key(source, PLAN, ["vertical"], ENCODING)
+    same = {**PLAN, "hashtags": ["#x"], "quality_score": 0.9}  # don't change the picture
+    assert cache.key(source, same, ["vertical"], ENCODING) == key
+    assert cache.key(source, {**PLAN, "overlays": {"hook_text": "Other"}}, ["vertical"], ENCODING) != key
+    assert cache.key(source, {**PLAN, "burn_overlays": False}, ["vertical"], ENCODING) != key
+    assert cache.key(source, PLAN, ["vertical"], {"preset": "ultrafast", "crf": 28}) == key  # see fetch
+    assert cache.key(source, PLAN, ["vertical"], {"copy": True}) != key
+    assert cache.key(source, PLAN, ["tiktok", "youtube"], ENCODING) != key
+
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(b"video")  # same content, other path
+    assert cache.key(str(copy), PLAN, ["vertical"], ENCODING) == key
+    copy.write_bytes(b"other video")
+    assert cache.key(str(copy), PLAN, ["vertical"], ENCODING) != key
+
+
+def test_repeat_render_is_served_from_the_cache(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(render_cache_module, "render_cache", RenderCache(str(tmp_path / "cache"), 10 ** 6))
+    out = str(tmp_path / "out.mp4")
+    renders = []
+
+    def render():
+        renders.append(1)
+        with open(out, "wb") as f:
+            f.write(b"rendered")
+        return True
+
+    assert cached_render(source, PLAN, {"vertical": out}, render, ENCODING)
+    os.remove(out)
+    assert cached_render(source, PLAN, {"vertical": out}, render, ENCODING)
+    assert len(renders) == 1
+    with open(out, "rb") as f:
+        assert f.read() == b"rendered"
+
+
+def test_a_render_serves_retries_at_its_crf_or_coarser(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(render_cache_module, "render_cache", RenderCache(str(tmp_path / "cache"), 10 ** 6))
+    out = str(tmp_path / "out.mp4")
+    renders = []
+
+    def render(crf):
+        def run():
+            renders.append(crf)
+            with open(out, "wb") as f:
+                f.write(f"crf {crf}".encode())
+            return True
+        return run
+
+    def transform(preset, crf):
+        return cached_render(source, PLAN, {"vertical": out}, render(crf), {"preset": preset, "crf": crf})
+
+    assert transform("ultrafast", 26)  # deep backlog
+    assert transform("veryfast", 26)
+    assert transform("ultrafast", 28)
+    assert renders == [26]
+
+    assert transform("slow", 23)  # idle: finer than the cached render
+    assert transform("medium", 24)
+    assert renders == [26, 23]
+    with open(out, "rb") as f:
+        assert f.read() == b"crf 23"
+    assert render_cache_module.render_cache.quality(
+        render_cache_module.render_cache.key(source, PLAN, ["vertical"], ENCODING)) == 23
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=250)
+    files = {}
+    for i, name in enumerate("abc"):
+        path = tmp_path / f"{name}.mp4"
+        path.write_bytes(b"x" * 100)
+        files[name] = str(path)
+        cache.store(name, {"vertical": files[name]})
+        os.utime(os.path.join(cache.root, name), (1000 + i, 1000 + i))  # a oldest, c newest
+        if name == "b":
+            os.utime(os.path.join(cache.root, "a"), (2000, 2000))  # a hit: now most recent
+
+    cache.evict()
+    assert sorted(os.listdir(cache.root)) == ["a", "c"]
+    assert cache.fetch("a", {"vertical": str(tmp_path / "again.mp4")})
+    assert not cache.fetch("b", {"vertical": str(tmp_path / "again.mp4")})
@@ -0,0 +1,92 @@
+"""SerpAPI cache: single-flight fetches, stale-while-revalidate, no cached errors."""
+
+import threading
+import time
+
+from app.providers.serp_cache import SerpCache, SQLiteBackend
+
+
+def _cache(tmp_path, stale_ttl=60):
+    return SerpCache(lambda: SQLiteBackend(str(tmp_path / "serp.sqlite"), 100), stale_ttl=stale_ttl)
+
+
+def test_concurrent_misses_fetch_once(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"organic_results": [1]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("q", fetch, ttl=60)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"organic_results": [1]}] * 8
+
+
+def test_stale_entry_is_served_while_refreshing(tmp_path):
+    cache = _cache(tmp_path)
+    cache.backend.set("q", (time.time() - 90, {"v": "old"}), 600)  # past ttl, within stale_ttl
+    refreshed = threading.Event()
+
+    def fetch():
+        refreshed.set()
+        return {"v": "new"}
+
+    assert cache.get_or_fetch("q", fetch, ttl=60) == {"v": "old"}
+    assert refreshed.wait(2)
+    deadline = time.time() + 2
+    while cache.peek("q") != {"v": "new"} and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_fetch("q", lambda: {"v": "unused"}, ttl=60) == {"v": "new"}
+
+
+def test_error_responses_are_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get_or_fetch("q", lambda: {"error": "Invalid API key."}, ttl=60) == {"error": "Invalid API key."}
+    assert cache.get_or_fetch("q", lambda: {}, ttl=60) == {}
+    assert cache.peek("q") is None
+    assert cache.get_or_fetch("q", lambda: {"v": 1}, ttl=60) == {"v": 1}
+
+
+def test_waiting_on_a_foreign_lease_does_not_block_the_stripe(tmp_path, monkeypatch):
+    import app.providers.serp_cache as serp_cache_module
+
+    monkeypatch.setattr(serp_cache_module, "LOCK_STRIPES", 1)  # every key shares one lock
+    cache = _cache(tmp_path)
+    assert cache.backend.acquire("busy", 30)  # another process is fetching "busy"
+
+    waiter = threading.Thread(target=lambda: cache.get_or_fetch("busy", lambda: {"v": "late"}, ttl=60), daemon=True)
+    waiter.start()
+    time.sleep(0.3)  # waiting on the lease
+    started = time.time()
+    assert cache.get_or_fetch("other", lambda: {"v": "other"}, ttl=60) == {"v": "other"}
+    assert time.time() - started < 1
+
+    cache.backend.set("busy", (time.time(), {"v": "foreign"}), 600)
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert cache.peek("busy") == {"v": "foreign"}
+
+
+def test_only_answers_from_the_cache_count_as_saved_calls(tmp_path):
+    from prometheus_client import REGISTRY
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    cache = _cache(tmp_path)
+    saved = sample("cf_serpapi_calls_saved_total")
+    assert cache.peek("q") is None  # budget spent, nothing cached
+    assert sample("cf_serpapi_cache_total", result="degraded_miss") >= 1
+    assert sample("cf_serpapi_calls_saved_total") == saved
+
+    cache.backend.set("q", (time.time() - 10 ** 6, {"v": "old"}), 10 ** 7)
+    assert cache.peek("q") == {"v": "old"}
+    assert sample("cf_serpapi_calls_saved_total") == saved + 1
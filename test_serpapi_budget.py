@@ -0,0 +1,85 @@
+"""SerpAPI rate limit and monthly budget: token bucket, quota reserve, cache-only fallback."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import settings
+from app.providers import serpapi_provider
+from app.providers.serp_cache import SerpCache, SQLiteBackend
+from app.providers.serpapi_provider import TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_is_free_then_callers_queue_at_the_rate():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert [bucket.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]  # each waits behind the previous one
+
+
+def test_tokens_refill_up_to_the_burst():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    for _ in range(3):
+        bucket.reserve()
+    clock.now += 1  # two tokens back
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0.5]
+
+    clock.now += 3600  # idle: capped at the burst, not 7200 tokens
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+@pytest.fixture
+def budget(tmp_path, monkeypatch):
+    """A fresh usage store; 100 calls a month with a 5% reserve."""
+    cache = SerpCache(lambda: SQLiteBackend(str(tmp_path / "serp.sqlite"), 100), stale_ttl=60)
+    monkeypatch.setattr(serpapi_provider, "serp_cache", cache)
+    monkeypatch.setattr(settings, "SERPAPI_MONTHLY_QUOTA", 100)
+    monkeypatch.setattr(settings, "SERPAPI_QUOTA_RESERVE", 0.05)
+    monkeypatch.setattr(settings, "SERPAPI_KEY", "test-key")
+    return cache
+
+
+def test_reserve_cutoff(budget):
+    for _ in range(94):
+        serpapi_provider._record_call()
+    assert serpapi_provider.quota_used() == 94
+    assert not serpapi_provider.quota_exhausted()
+    serpapi_provider._record_call()
+    assert serpapi_provider.quota_exhausted()  # 95 of 100: the last 5% is kept in reserve
+
+
+def test_zero_quota_is_unlimited(budget, monkeypatch):
+    monkeypatch.setattr(settings, "SERPAPI_MONTHLY_QUOTA", 0)
+    for _ in range(10):
+        serpapi_provider._record_call()
+    assert not serpapi_provider.quota_exhausted()
+
+
+def test_usage_is_counted_per_month(budget, monkeypatch):
+    for _ in range(95):
+        serpapi_provider._record_call()
+    assert serpapi_provider.quota_exhausted()
+    monkeypatch.setattr(serpapi_provider, "utcnow", lambda: datetime(2099, 1, 1, tzinfo=timezone.utc))
+    assert serpapi_provider.quota_used() == 0 and not serpapi_provider.quota_exhausted()
+
+
+def test_spent_budget_serves_the_cache_only(budget, monkeypatch):
+    calls = []
+    monkeypatch.setattr(serpapi_provider, "_run", lambda engine, **kw: calls.append(kw) or {"fresh": True})
+    key = serpapi_provider._cache_key("google", q="old")
+    budget.backend.set(key, (0, {"cached": True}), 10 ** 10)  # long past its TTL
+    for _ in range(95):
+        serpapi_provider._record_call()
+
+    assert serpapi_provider._cached("google", 60, q="old") == {"cached": True}
+    assert serpapi_provider._cached("google", 60, q="new") == {}
+    assert calls == []
@@ -0,0 +1,48 @@
+"""Compiled source filters: trie regex, accent folding, word-start anchoring."""
+
+import random
+
+from app.models import Source
+from app.services.source_filters import SourceMatcher, compile_terms, fold, matcher_for, split_terms
+
+
+def test_accents_and_case_are_folded_both_ways():
+    matcher = SourceMatcher("securite, Éléphant", None)
+    assert matcher.matches("Guide de la Sécurité", "")
+    assert matcher.matches("", "un ELEPHANT rose")
+    assert SourceMatcher("sécurité", None).matches("securite reseau", "")
+    assert fold("Ærø Straße ﬁ") == fold("ærø strasse fi")
+
+
+def test_terms_match_at_word_start_only():
+    matcher = SourceMatcher("tech, art", None)
+    assert matcher.matches("La technologie", "")
+    assert matcher.matches("Street art", "")
+    assert not matcher.matches("Heure de départ", "")
+
+
+def test_keywords_and_categories_must_both_match():
+    matcher = SourceMatcher("vpn", "securite")
+    assert matcher.matches("Meilleur VPN", "sécurité en ligne")
+    assert not matcher.matches("Meilleur VPN", "streaming")
+    assert SourceMatcher(None, None).matches("anything", "")
+
+
+def test_trie_regex_agrees_with_a_term_scan():
+    rng = random.Random(3)
+    terms = sorted({"".join(rng.choices("abcde", k=rng.randint(1, 5))) for _ in range(200)})
+    pattern = compile_terms(terms)
+    for _ in range(500):
+        text = " ".join("".join(rng.choices("abcde", k=rng.randint(1, 7))) for _ in range(4))
+        expected = any(word.startswith(term) for word in text.split() for term in terms)
+        assert bool(pattern.search(text)) == expected
+
+
+def test_matcher_is_recompiled_when_filters_change():
+    src = Source(id=987654, keywords="alpha")
+    first = matcher_for(src)
+    assert matcher_for(src) is first
+    src.keywords = "beta"
+    assert matcher_for(src) is not first
+    assert matcher_for(src).matches("beta release", "")
+    assert split_terms(" a, ,A ,b ") == ["a", "b"]
@@ -0,0 +1,44 @@
+"""A planned trim of a vertical H.264/AAC source reaches the stream-copy path."""
+
+from app.config import settings
+from app.models import Asset
+from app.services.ai_planner import generate_plan_heuristic
+from app.services.probe import snap_segments
+from utils.ffmpeg import build_copy_command, build_vertical_command, can_stream_copy, write_overlay_texts
+
+PROBE = {
+    "duration": 42.0,
+    "keyframes": [0.0, 2.0, 4.0],
+    "streams": [
+        {"codec_type": "video", "codec": "h264", "width": 1080, "height": 1920, "pix_fmt": "yuv420p"},
+        {"codec_type": "audio", "codec": "aac"},
+    ],
+}
+
+
+def _plan(monkeypatch, burn: bool):
+    monkeypatch.setattr(settings, "TRANSFORM_BURN_OVERLAYS", burn)
+    asset = Asset(id=1, duration=42.0, meta_json='{"title": "VPN review"}', lang="fr")
+    return snap_segments(generate_plan_heuristic(asset), PROBE)
+
+
+def test_overlay_free_plan_is_stream_copied(monkeypatch):
+    plan = _plan(monkeypatch, burn=False)
+    assert plan["overlays"]["hook_text"]  # still planned for compliance and post titles
+    assert can_stream_copy(plan, PROBE)
+    cmd = build_copy_command("in.mp4", plan, "out.mp4")
+    assert cmd[cmd.index("-c") + 1] == "copy"
+    assert "-vf" not in cmd and "-filter_complex" not in cmd
+
+
+def test_burnt_overlays_need_an_encode(monkeypatch, tmp_path):
+    plan = _plan(monkeypatch, burn=True)
+    assert not can_stream_copy(plan, PROBE)
+    assert write_overlay_texts(plan, str(tmp_path))
+
+
+def test_unburnt_overlays_are_not_drawn(monkeypatch, tmp_path):
+    plan = _plan(monkeypatch, burn=False)
+    assert write_overlay_texts(plan, str(tmp_path)) == {}
+    cmd = build_vertical_command("in.mp4", plan, "out.mp4", str(tmp_path))
+    assert not any("drawtext" in arg for arg in cmd)
@@ -0,0 +1,42 @@
+"""Batched text analysis agrees with one text at a time."""
+
+from app.services.text_analysis import analyze_text, analyze_texts
+
+FRENCH = "<p>La startup lance une plateforme pour les données de santé, avec des données ouvertes.</p>"
+ENGLISH = "The robotics company ships 3 drones and the drones are tested at https://example.com today."
+OTHER = "Quantum computing research is moving forward; researchers publish benchmarks."
+
+
+def test_batch_matches_single_texts():
+    batch = analyze_texts([FRENCH, ENGLISH, OTHER])  # no keyword shared between them
+    for text, result in zip([FRENCH, ENGLISH, OTHER], batch):
+        assert result == analyze_text(text)
+    assert [r["language"] for r in batch] == ["fr", "en", "en"]
+    assert batch[1]["has_numbers"] and batch[1]["has_urls"] and not batch[0]["has_urls"]
+
+
+def test_single_text_keyword_order():
+    # tech terms first, then frequency, then longer words, then alphabetical
+    assert analyze_text(FRENCH)["keywords"] == ["startup", "données", "plateforme", "ouvertes", "lance", "santé"]
+    assert analyze_text(ENGLISH)["keywords"][:3] == ["drones", "robotics", "company"]
+    assert analyze_text(ENGLISH, max_keywords=2)["keywords"] == ["drones", "robotics"]
+
+
+def test_words_shared_by_the_batch_rank_lower():
+    site = " Daily Gazette."
+    texts = [ENGLISH + site, OTHER + site]
+    batch = analyze_texts(texts)
+    for text, result in zip(texts, batch):
+        single = analyze_text(text)
+        assert set(result["keywords"]) == set(single["keywords"])
+        assert {k: v for k, v in result.items() if k != "keywords"} == \
+            {k: v for k, v in single.items() if k != "keywords"}
+        assert result["keywords"][-2:] == ["gazette", "daily"]  # in every item: lowest idf
+    assert analyze_text(texts[1])["keywords"].index("gazette") < len(batch[1]["keywords"]) - 2
+
+
+def test_empty_and_missing_texts():
+    assert analyze_texts([]) == []
+    result = analyze_texts([None, ""])
+    assert result[0] == result[1] == {"keywords": [], "language": "fr", "word_count": 0,
+                                      "has_numbers": False, "has_urls": False}
@@ -0,0 +1,59 @@
+"""Transform claims: one owner per asset, leases renewed, stale claims released."""
+
+import threading
+from datetime import datetime, timedelta
+
+from app.models import Asset
+from app.services.transform_pool import claim_assets, release_stale_claims, renew_claims
+
+
+def _assets(db, n):
+    rows = [Asset(status="new", meta_json="{}") for _ in range(n)]
+    db.add_all(rows)
+    db.commit()
+    return [a.id for a in rows]
+
+
+def test_concurrent_claims_never_share_an_asset(session_factory):
+    setup = session_factory()
+    ids = _assets(setup, 40)
+    setup.close()
+    claimed, lock = [], threading.Lock()
+
+    def worker():
+        db = session_factory()
+        try:
+            while True:
+                got = claim_assets(db, 3)
+                if not got:
+                    return
+                with lock:
+                    claimed.extend(got)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(ids)
+
+
+def test_claim_is_limited_to_the_given_ids(db):
+    ids = _assets(db, 5)
+    assert sorted(claim_assets(db, 10, ids[:2])) == ids[:2]
+    assert claim_assets(db, 10, ids[:2]) == []
+
+
+def test_stale_claims_go_back_to_new(db):
+    stale, live = _assets(db, 2)
+    claim_assets(db, 2)
+    db.get(Asset, stale).claimed_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    assert renew_claims(db, [live]) == 1
+    assert release_stale_claims(db, lease_seconds=60) == [stale]
+    db.expire_all()
+    assert db.get(Asset, stale).status == "new" and db.get(Asset, stale).claimed_at is None
+    assert db.get(Asset, live).status == "transforming"
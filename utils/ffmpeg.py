@@ -1,19 +1,286 @@
 import os
+import re
 import subprocess
 import logging
-from typing import Dict, Any, Optional
+import tempfile
+import time
+from fractions import Fraction
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
-def make_vertical(input_path: str, plan: Dict[str, Any], output_path: str) -> bool:
+VERTICAL_WIDTH = 1080
+VERTICAL_HEIGHT = 1920
+OUTPUT_FPS = 30
+HOOK_SECONDS = 5  # hook text stays on screen for the first seconds
+CTA_SECONDS = 8  # CTA shows during the last seconds (20-28s of a 30s short)
+VIDEO_PRESET = 'fast'
+VIDEO_CRF = 23
+DEFAULT_ENCODING = {'preset': VIDEO_PRESET, 'crf': VIDEO_CRF, 'threads': 0}  # threads 0 = x264 auto
+GRAPH_VERSION = 1  # bump when the filter graph changes, invalidates the render cache
+STREAM_COPY_VIDEO_CODECS = ('h264',)
+STREAM_COPY_AUDIO_CODECS = ('aac',)
+
+_DRAWTEXT_STYLE = "fontcolor=white:box=1:boxcolor=black@0.5:boxborderw=20:expansion=none"
+
+
+def _escape_filter_value(value: str) -> str:
+    """Escape a filter option value for both option and filter-graph parsing."""
+    value = re.sub(r"([\\':])", r"\\\1", value)
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+
+
+def plan_segments(plan: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """(start, end) pairs of the plan, sorted, with empty segments dropped."""
+    segments = []
+    for segment in plan.get('segments') or [{'start': 0, 'end': 30}]:
+        start = max(0.0, float(segment.get('start', 0) or 0))
+        end = float(segment.get('end', start + 30) or 0)
+        if end > start:
+            segments.append((start, end))
+    return sorted(segments) or [(0.0, 30.0)]
+
+
+def build_filter_graph(plan: Dict[str, Any], text_files: Dict[str, str], offset: float = 0.0) -> Dict[str, str]:
+    """
+    Video (and audio) filter chains for a whole plan.
+    
+    Segments are cut with select/aselect (one decode), then the frame is
+    scaled/cropped to 1080x1920 and hook, CTA, attribution and subtitles are
+    drawn. `offset` is the input-side seek already applied (-ss), so segment
+    times are shifted by it.
+    
+    Returns {'video': ..., 'audio': ...}; 'audio' is empty when the plan has
+    a single segment (plain -t trimming is enough).
+    """
+    segments = [(start - offset, end - offset) for start, end in plan_segments(plan)]
+    duration = sum(end - start for start, end in segments)
+    video, audio = [], []
+    
+    srt = plan.get('srt')
+    subtitles = bool(srt and os.path.exists(srt))
+    # Subtitle times are relative to the source: video runs on source time
+    # while they are rendered, then is reset to start at 0
+    shift = offset if subtitles else 0.0
+    if shift:
+        video.append(f"setpts=PTS+{shift:.3f}/TB")
+    if subtitles:
+        video.append(f"subtitles=filename={_escape_filter_value(srt)}")
+    # Constant output rate first: fewer frames to scale for 50/60 fps sources,
+    # and a known rate to rebuild timestamps from after cutting
+    video.append(f"fps={OUTPUT_FPS}")
+    
+    if len(segments) > 1:
+        video_keep = "+".join(f"between(t,{start + shift:.3f},{end + shift:.3f})" for start, end in segments)
+        audio_keep = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in segments)
+        video += [f"select='{video_keep}'", f"setpts=N/{OUTPUT_FPS}/TB"]
+        audio += [f"aselect='{audio_keep}'", "asetpts=N/SR/TB"]
+    elif shift:
+        video.append("setpts=PTS-STARTPTS")
+    
+    video += [
+        f"scale={VERTICAL_WIDTH}:{VERTICAL_HEIGHT}:force_original_aspect_ratio=increase",
+        f"crop={VERTICAL_WIDTH}:{VERTICAL_HEIGHT}",
+        "setsar=1",
+    ]
+    
+    if 'hook' in text_files:
+        video.append(
+            f"drawtext=textfile={_escape_filter_value(text_files['hook'])}:{_DRAWTEXT_STYLE}"
+            f":fontsize=60:x=(w-text_w)/2:y=160:enable='lt(t,{HOOK_SECONDS})'"
+        )
+    if 'cta' in text_files:
+        cta_start = max(min(HOOK_SECONDS, duration), duration - CTA_SECONDS)
+        video.append(
+            f"drawtext=textfile={_escape_filter_value(text_files['cta'])}:{_DRAWTEXT_STYLE}"
+            f":fontsize=48:x=(w-text_w)/2:y=h-text_h-320:enable='gte(t,{cta_start:.3f})'"
+        )
+    if 'attribution' in text_files:
+        video.append(
+            f"drawtext=textfile={_escape_filter_value(text_files['attribution'])}:{_DRAWTEXT_STYLE}"
+            f":fontsize=28:x=40:y=h-text_h-80"
+        )
+    
+    video.append("format=yuv420p")
+    return {'video': ",".join(video), 'audio': ",".join(audio)}
+
+
+def burnt_overlays(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """The overlays drawn on the video: none when plan["burn_overlays"] is false."""
+    if not plan.get('burn_overlays', True):
+        return {}
+    return plan.get('overlays') or {}
+
+
+def write_overlay_texts(plan: Dict[str, Any], text_dir: str) -> Dict[str, str]:
+    """
+    Write the plan's overlay texts to files in `text_dir` (drawtext textfile=),
+    which avoids escaping quotes, colons and emoji in hooks.
+    """
+    text_files = {}
+    overlays = burnt_overlays(plan)
+    for key, field in (('hook', 'hook_text'), ('cta', 'cta_text'), ('attribution', 'attribution')):
+        text = (overlays.get(field) or "").strip()
+        if text:
+            path = os.path.join(text_dir, f"{key}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            text_files[key] = path
+    return text_files
+
+
+def _video_codec_args(encoding: Optional[Dict[str, Any]]) -> List[str]:
+    """libx264 options of an encoding profile (preset, crf, threads)."""
+    encoding = {**DEFAULT_ENCODING, **(encoding or {})}
+    args = ['-c:v', 'libx264', '-preset', str(encoding['preset']), '-crf', str(encoding['crf'])]
+    if encoding.get('threads'):
+        args += ['-threads', str(encoding['threads'])]
+    return args
+
+
+def _input_args(input_path: str, plan: Dict[str, Any]) -> List[str]:
+    segments = plan_segments(plan)
+    start, end = segments[0][0], segments[-1][1]
+    return [
+        '-ss', f"{start:.3f}",  # input-side seek: jumps to the nearest keyframe, no decode of the skipped part
+        '-t', f"{end - start:.3f}",
+        '-i', input_path,
+    ]
+
+
+def build_vertical_command(input_path: str, plan: Dict[str, Any], output_path: str, text_dir: str,
+                           encoding: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Single FFmpeg command rendering a plan: one decode, one encode.
+    """
+    graph = build_filter_graph(plan, write_overlay_texts(plan, text_dir), offset=plan_segments(plan)[0][0])
+    cmd = ['ffmpeg', '-y'] + _input_args(input_path, plan) + ['-vf', graph['video']]
+    if plan.get('audio_enabled', True):
+        if graph['audio']:
+            cmd += ['-af', graph['audio']]
+        cmd += ['-c:a', 'aac', '-b:a', '128k']
+    else:
+        cmd += ['-an']
+    cmd += [
+        '-r', str(OUTPUT_FPS),  # setpts leaves the graph's frame rate unknown; pin it for the muxer
+        *_video_codec_args(encoding),
+        '-movflags', '+faststart',
+        output_path
+    ]
+    return cmd
+
+
+# Per-platform outputs of TRANSFORM_MODE=renditions
+RENDITIONS: Dict[str, Dict[str, Any]] = {
+    'instagram': {'width': 1080, 'height': 1920, 'max_duration': 90, 'video_kbps': 5000, 'audio_kbps': 128},
+    'tiktok': {'width': 1080, 'height': 1920, 'max_duration': 180, 'video_kbps': 6000, 'audio_kbps': 128},
+    'youtube': {'width': 1080, 'height': 1920, 'max_duration': 60, 'video_kbps': 8000, 'audio_kbps': 192},
+    'reddit': {'width': 720, 'height': 1280, 'max_duration': 60, 'video_kbps': 3000, 'audio_kbps': 128},
+}
+
+
+def build_renditions_command(input_path: str, plan: Dict[str, Any], outputs: Dict[str, str], text_dir: str,
+                             encoding: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    One FFmpeg command writing a rendition per platform in `outputs`
+    ({platform: path}): the source is decoded and the plan's graph applied
+    once, then `split` feeds one scaler + encoder per rendition, and FFmpeg
+    runs the encoders side by side. Audio is decoded once and mapped to
+    every output.
+    """
+    platforms = list(outputs)
+    graph = build_filter_graph(plan, write_overlay_texts(plan, text_dir), offset=plan_segments(plan)[0][0])
+    duration = sum(end - start for start, end in plan_segments(plan))
+    
+    chains = [f"[0:v]{graph['video']},split={len(platforms)}" + "".join(f"[s{i}]" for i in range(len(platforms)))]
+    for i, platform in enumerate(platforms):
+        spec = RENDITIONS.get(platform, RENDITIONS['instagram'])
+        if (spec['width'], spec['height']) == (VERTICAL_WIDTH, VERTICAL_HEIGHT):
+            chains.append(f"[s{i}]null[v{i}]")
+        else:
+            chains.append(f"[s{i}]scale={spec['width']}:{spec['height']}[v{i}]")
+    
+    cmd = ['ffmpeg', '-y'] + _input_args(input_path, plan) + ['-filter_complex', ";".join(chains)]
+    for i, platform in enumerate(platforms):
+        spec = RENDITIONS.get(platform, RENDITIONS['instagram'])
+        cmd += ['-map', f"[v{i}]"]
+        if plan.get('audio_enabled', True):
+            cmd += ['-map', '0:a?']
+            if graph['audio']:
+                cmd += ['-af', graph['audio']]
+            cmd += ['-c:a', 'aac', '-b:a', f"{spec['audio_kbps']}k"]
+        if spec.get('max_duration') and spec['max_duration'] < duration:
+            cmd += ['-t', str(spec['max_duration'])]
+        cmd += [
+            '-r', str(OUTPUT_FPS),
+            *_video_codec_args(encoding),
+            '-maxrate', f"{spec['video_kbps']}k",  # crf quality, capped at the platform's bitrate
+            '-bufsize', f"{2 * spec['video_kbps']}k",
+            '-movflags', '+faststart',
+            outputs[platform]
+        ]
+    return cmd
+
+
+def encoder_settings(encoding: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Everything besides the input, the plan and the x264 rate settings that changes rendered output.
+
+    Part of the render cache key. Preset and crf are left out: the cache keeps
+    the crf of each render and serves it to any request of that crf or higher.
+    """
+    return {
+        'graph_version': GRAPH_VERSION,
+        'size': [VERTICAL_WIDTH, VERTICAL_HEIGHT],
+        'fps': OUTPUT_FPS,
+        'hook_seconds': HOOK_SECONDS,
+        'cta_seconds': CTA_SECONDS,
+        'drawtext_style': _DRAWTEXT_STYLE,
+        'copy': bool((encoding or {}).get('copy')),
+        'renditions': RENDITIONS,
+    }
+
+
+def _run_ffmpeg(cmd: List[str], timeout: int, done_message: str, stats: Optional[Dict[str, Any]] = None) -> bool:
+    """Run FFmpeg; fills `stats` with frames, seconds and encode fps on success."""
+    logger.info(f"Running FFmpeg: {' '.join(cmd)}")
+    started = time.perf_counter()
+    result = subprocess.run(
+        cmd, 
+        capture_output=True, 
+        text=True, 
+        timeout=timeout
+    )
+    if result.returncode == 0:
+        if stats is not None:
+            seconds = time.perf_counter() - started
+            frames = [int(n) for n in re.findall(r"frame=\s*(\d+)", result.stderr)]
+            stats.update({
+                'frames': frames[-1] if frames else None,
+                'seconds': round(seconds, 2),
+                'fps': round(frames[-1] / seconds, 1) if frames and seconds else None,
+            })
+        logger.info(done_message)
+        return True
+    logger.error(f"FFmpeg failed: {result.stderr}")
+    return False
+
+
+def make_vertical(input_path: str, plan: Dict[str, Any], output_path: str, timeout: int = 120,
+                  encoding: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> bool:
     """
     Transform video to vertical format (1080x1920) with overlays.
     
+    The whole plan (segments, scale/crop, hook, CTA, attribution, subtitles)
+    is rendered by a single FFmpeg command, see build_vertical_command.
+    
     Args:
         input_path: Path to source video
         plan: AI plan with segments, overlays, etc.
         output_path: Path for output video
+        timeout: FFmpeg timeout in seconds
+        encoding: libx264 preset / crf / threads (DEFAULT_ENCODING when omitted)
+        stats: filled with frames, seconds and encode fps
     
     Returns:
         True if successful, False otherwise
@@ -23,60 +290,119 @@ def make_vertical(input_path: str, plan: Dict[str, Any], output_path: str) -> bo
             logger.error(f"Input video not found: {input_path}")
             return False
         
-        # Extract plan parameters
-        segments = plan.get('segments', [{'start': 0, 'end': 30}])
-        overlays = plan.get('overlays', {})
-        
-        # Use first segment for demo
-        segment = segments[0] if segments else {'start': 0, 'end': 30}
-        start_time = segment.get('start', 0)
-        duration = segment.get('end', 30) - start_time
-        
-        # Build FFmpeg command for vertical transformation
-        cmd = [
-            'ffmpeg', '-y',  # Overwrite output
-            '-i', input_path,
-            '-ss', str(start_time),  # Start time
-            '-t', str(duration),     # Duration
-            '-vf', 'scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920',
-            '-c:v', 'libx264',
-            '-preset', 'fast',
-            '-crf', '23',
-            '-c:a', 'aac',
-            '-b:a', '128k',
-            output_path
-        ]
-        
-        logger.info(f"Running FFmpeg: {' '.join(cmd)}")
-        
-        # Run FFmpeg
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
-            text=True, 
-            timeout=120  # 2 minute timeout
-        )
+        with tempfile.TemporaryDirectory(prefix="cf_overlay_") as text_dir:
+            cmd = build_vertical_command(input_path, plan, output_path, text_dir, encoding)
+            return _run_ffmpeg(cmd, timeout, f"Successfully transformed video: {output_path}", stats)
         
-        if result.returncode == 0:
-            logger.info(f"Successfully transformed video: {output_path}")
-            return True
-        else:
-            logger.error(f"FFmpeg failed: {result.stderr}")
+    except subprocess.TimeoutExpired:
+        logger.error("FFmpeg timeout exceeded")
+        return False
+    except Exception as e:
+        logger.error(f"Error in video transformation: {e}")
+        return False
+
+
+def can_stream_copy(plan: Dict[str, Any], probe: Optional[Dict[str, Any]]) -> bool:
+    """
+    True when `plan` is a plain trim of an already publishable file.
+    
+    That is one keyframe-aligned segment, no burnt-in overlay text (see
+    burnt_overlays) and no subtitles,
+    from a 9:16 H.264 (yuv420p) source whose audio, if kept, is AAC. See
+    app.services.probe for `probe` and plan["keyframe_aligned"].
+    """
+    if not probe or not plan.get('keyframe_aligned') or len(plan_segments(plan)) != 1:
+        return False
+    overlays = burnt_overlays(plan)
+    if any((overlays.get(f) or "").strip() for f in ('hook_text', 'cta_text', 'attribution')) or plan.get('srt'):
+        return False
+    streams = probe.get('streams') or []
+    video = [s for s in streams if s.get('codec_type') == 'video']
+    if not video or video[0].get('codec') not in STREAM_COPY_VIDEO_CODECS:
+        return False
+    width, height = video[0].get('width') or 0, video[0].get('height') or 0
+    if not height or abs(width / height - VERTICAL_WIDTH / VERTICAL_HEIGHT) > 0.01:
+        return False
+    if video[0].get('pix_fmt') not in (None, 'yuv420p'):
+        return False
+    if plan.get('audio_enabled', True):
+        audio = [s for s in streams if s.get('codec_type') == 'audio']
+        if any(s.get('codec') not in STREAM_COPY_AUDIO_CODECS for s in audio):
+            return False
+    return True
+
+
+def build_copy_command(input_path: str, plan: Dict[str, Any], output_path: str) -> List[str]:
+    """Trim without re-encoding; the cut starts on a keyframe (see can_stream_copy)."""
+    cmd = ['ffmpeg', '-y'] + _input_args(input_path, plan) + ['-map', '0:v:0']
+    if plan.get('audio_enabled', True):
+        cmd += ['-map', '0:a:0?']
+    cmd += [
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
+        '-movflags', '+faststart',
+        output_path
+    ]
+    return cmd
+
+
+def copy_segment(input_path: str, plan: Dict[str, Any], output_path: str, timeout: int = 60,
+                 stats: Optional[Dict[str, Any]] = None) -> bool:
+    """Stream-copy the plan's segment of `input_path` to `output_path`."""
+    try:
+        if not os.path.exists(input_path):
+            logger.error(f"Input video not found: {input_path}")
+            return False
+        cmd = build_copy_command(input_path, plan, output_path)
+        return _run_ffmpeg(cmd, timeout, f"Stream-copied segment: {output_path}", stats)
+    except subprocess.TimeoutExpired:
+        logger.error("FFmpeg timeout exceeded")
+        return False
+    except Exception as e:
+        logger.error(f"Error copying segment: {e}")
+        return False
+
+
+def make_renditions(input_path: str, plan: Dict[str, Any], outputs: Dict[str, str], timeout: int = 300,
+                    encoding: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Render one file per platform from a single decode of `input_path`.
+    
+    Args:
+        input_path: Path to source video
+        plan: AI plan with segments, overlays, etc.
+        outputs: {platform: output path}; platforms are keys of RENDITIONS
+        timeout: FFmpeg timeout in seconds
+        encoding: libx264 preset / crf / threads (DEFAULT_ENCODING when omitted)
+        stats: filled with frames, seconds and encode fps
+    
+    Returns:
+        True if every rendition was written
+    """
+    try:
+        if not os.path.exists(input_path):
+            logger.error(f"Input video not found: {input_path}")
             return False
         
+        with tempfile.TemporaryDirectory(prefix="cf_overlay_") as text_dir:
+            cmd = build_renditions_command(input_path, plan, outputs, text_dir, encoding)
+            return _run_ffmpeg(cmd, timeout, f"Rendered {len(outputs)} renditions: {', '.join(outputs.values())}", stats)
+        
     except subprocess.TimeoutExpired:
         logger.error("FFmpeg timeout exceeded")
         return False
     except Exception as e:
-        logger.error(f"Error in video transformation: {e}")
+        logger.error(f"Error rendering renditions: {e}")
         return False
 
 
-def create_demo_vertical_video(output_path: str) -> bool:
+def create_demo_vertical_video(output_path: str, encoding: Optional[Dict[str, Any]] = None,
+                               stats: Optional[Dict[str, Any]] = None) -> bool:
     """
     Create a demo vertical video using FFmpeg test patterns.
     
-    This is used when no input video is available.
+    This is used when no input video is available. Without an explicit
+    `encoding` the fastest preset is used: the pattern is a placeholder.
     """
     try:
         # Create a 30-second vertical video with test pattern
@@ -86,29 +412,13 @@ def create_demo_vertical_video(output_path: str) -> bool:
             '-i', 'testsrc2=size=1080x1920:duration=30:rate=30',
             '-f', 'lavfi', 
             '-i', 'sine=frequency=440:duration=30',
-            '-c:v', 'libx264',
-            '-preset', 'ultrafast',
-            '-crf', '28',
+            *_video_codec_args(encoding or {'preset': 'ultrafast', 'crf': 28}),
             '-c:a', 'aac',
             '-shortest',
             output_path
         ]
         
-        logger.info(f"Creating demo video: {' '.join(cmd)}")
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        if result.returncode == 0:
-            logger.info(f"Created demo video: {output_path}")
-            return True
-        else:
-            logger.error(f"Demo video creation failed: {result.stderr}")
-            return False
+        return _run_ffmpeg(cmd, 60, f"Created demo video: {output_path}", stats)
             
     except subprocess.TimeoutExpired:
         logger.error("Demo video creation timeout")
@@ -122,6 +432,9 @@ def add_text_overlay(input_path: str, text: str, output_path: str, position: str
     """
     Add text overlay to video.
     
+    This re-encodes the whole clip; the transform path draws its overlays in
+    make_vertical's single pass instead.
+    
     Args:
         input_path: Source video path
         text: Text to overlay
@@ -168,43 +481,36 @@ def add_text_overlay(input_path: str, text: str, output_path: str, position: str
         return False
 
 
+def parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Frame rate from an ffprobe rational such as '30000/1001' (None if unknown)."""
+    try:
+        value = float(Fraction(str(rate)))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return round(value, 3) if value > 0 else None
+
+
 def get_video_info(video_path: str) -> Optional[Dict[str, Any]]:
     """
     Get video metadata using FFprobe.
     
-    Returns dict with duration, width, height, etc.
+    Returns dict with duration, width, height, etc. Probes are cached per
+    file (see app.services.probe).
     """
     try:
-        cmd = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            '-show_streams',
-            video_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            import json
-            data = json.loads(result.stdout)
-            
-            # Extract video stream info
-            video_stream = None
-            for stream in data.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    video_stream = stream
-                    break
-            
-            if video_stream:
-                return {
-                    'duration': float(data.get('format', {}).get('duration', 0)),
-                    'width': int(video_stream.get('width', 0)),
-                    'height': int(video_stream.get('height', 0)),
-                    'fps': eval(video_stream.get('r_frame_rate', '30/1')),
-                    'codec': video_stream.get('codec_name', 'unknown')
-                }
+        from app.services.probe import probe_file, video_stream
+
+        probe = probe_file(video_path)
+        video = video_stream(probe) if probe else None
+        if video:
+            return {
+                'duration': probe['duration'],
+                'width': video['width'],
+                'height': video['height'],
+                'fps': video['fps'] or 30.0,
+                'codec': video['codec'],
+                'keyframes': probe['keyframes'],
+            }
         
         return None
         